@@ -5,18 +5,26 @@ BASE_URL = "http://localhost:8000/books"
 
 def get_books():
     """
-    Fetch all books from the web service.
+    Fetch all books from the web service, following the X-Next-Cursor header page by page,
+    since GET /books returns one page (100 books by default) per request.
     """
-    response = requests.get(BASE_URL)
-    if response.status_code == 200:
-        books = response.json()
-        print("[GET] Books:")
-        for book in books:
-            print(f" - {book['title']}")
-        return books
-    else:
-        print(f"[GET] Failed to fetch books: {response.status_code}")
-        return None
+    books = []
+    params = {}
+    while True:
+        response = requests.get(BASE_URL, params=params)
+        if response.status_code != 200:
+            print(f"[GET] Failed to fetch books: {response.status_code}")
+            return None
+        books.extend(response.json())
+        next_cursor = response.headers.get("X-Next-Cursor")
+        if next_cursor is None:
+            break
+        params = {"after": next_cursor}
+
+    print("[GET] Books:")
+    for book in books:
+        print(f" - {book['title']}")
+    return books
 
 
 def get_book(book_id):
@@ -1,17 +1,175 @@
-from sqlalchemy import create_engine, MetaData
+import os
+import threading
+import time
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, event, MetaData
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool, StaticPool
+
+load_dotenv()
 
 # SQLAlchemy Database URL (SQLite for simplicity)
-DATABASE_URL = "sqlite:///./app.db"
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./app.db")
+# Same database through an async driver (aiosqlite; e.g. asyncpg for PostgreSQL)
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", "sqlite+aiosqlite:///./app.db")
+
+# PRAGMAs applied to every new SQLite connection. WAL lets readers run alongside a writer,
+# and synchronous=NORMAL is durable in WAL mode while fsyncing only at checkpoints.
+SQLITE_PRAGMAS = {
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    # Negative values are KiB, so this is a 64 MiB page cache per connection
+    "cache_size": int(os.getenv("SQLITE_CACHE_SIZE", "-64000")),
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+    # Off by default in SQLite; needed for the ON DELETE CASCADE from books to reviews
+    "foreign_keys": "ON",
+}
+
+# Comma-separated read replica URLs; GET routes read from these through get_read_db
+REPLICA_DATABASE_URLS = [url.strip() for url in os.getenv("REPLICA_DATABASE_URLS", "").split(",") if url.strip()]
+# How long a replica that failed to connect is skipped before it is tried again
+REPLICA_RETRY_SECONDS = float(os.getenv("REPLICA_RETRY_SECONDS", "30"))
+# How long a client that has just written keeps reading from the primary, to see its own writes
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+
+# Connection pool sizing for WAL SQLite and server databases
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+
+
+def _pool_options(url: str, pragmas: dict, is_async: bool) -> dict:
+    """
+    Pick the pool for the database behind `url`.
+
+    - In-memory SQLite: one shared connection (StaticPool), otherwise every checkout sees an empty database.
+    - File SQLite in WAL mode, or opened read-only: a sized pool, since readers really do run concurrently.
+    - File SQLite in rollback-journal mode: no pooling, as a writer locks the whole file anyway.
+    - Server databases: a sized pool with pre-ping to drop connections the server has closed.
+    """
+    queue_pool = AsyncAdaptedQueuePool if is_async else QueuePool
+    sized = {"poolclass": queue_pool, "pool_size": DB_POOL_SIZE, "max_overflow": DB_MAX_OVERFLOW}
+
+    parsed = make_url(url)
+    if parsed.get_backend_name() != "sqlite":
+        return {**sized, "pool_pre_ping": True}
+    if parsed.database in (None, "", ":memory:"):
+        return {"poolclass": StaticPool}
+    # Read-only connections never take the write lock, so they pool like WAL readers
+    if str(pragmas.get("journal_mode", "")).upper() == "WAL" or parsed.query.get("mode") == "ro":
+        return sized
+    return {"poolclass": NullPool}
+
+
+def _register_sqlite_pragmas(engine, pragmas: dict):
+    @event.listens_for(engine, "connect")
+    def apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+
+def create_db_engine(url: str = DATABASE_URL, pragmas: dict | None = None):
+    """
+    Create a sync engine for `url`, applying `pragmas` (default SQLITE_PRAGMAS) to SQLite connections.
+    """
+    pragmas = SQLITE_PRAGMAS if pragmas is None else pragmas
+    connect_args = {}
+    if make_url(url).get_backend_name() == "sqlite":
+        connect_args["check_same_thread"] = False
+
+    new_engine = create_engine(url, connect_args=connect_args, **_pool_options(url, pragmas, is_async=False))
+    if new_engine.dialect.name == "sqlite":
+        _register_sqlite_pragmas(new_engine, pragmas)
+    return new_engine
+
+
+def create_async_db_engine(url: str = ASYNC_DATABASE_URL, pragmas: dict | None = None):
+    """
+    Create an async engine for `url`, with the same PRAGMAs and pool choice as create_db_engine.
+    """
+    pragmas = SQLITE_PRAGMAS if pragmas is None else pragmas
+    new_engine = create_async_engine(url, **_pool_options(url, pragmas, is_async=True))
+    if new_engine.dialect.name == "sqlite":
+        _register_sqlite_pragmas(new_engine.sync_engine, pragmas)
+    return new_engine
+
+
+def _read_only_engine(url: str):
+    """
+    Engine for a replica. SQLite files are opened with mode=ro, so a missing file fails to connect
+    instead of being created empty, and nothing (not even a journal_mode change) writes to them;
+    query_only also makes a route that tries to write through one fail.
+    """
+    parsed = make_url(url)
+    if parsed.get_backend_name() != "sqlite" or parsed.database in (None, "", ":memory:"):
+        return create_db_engine(url)
+    read_only_url = parsed.set(database=f"file:{parsed.database}", query={**parsed.query, "mode": "ro", "uri": "true"})
+    pragmas = {name: value for name, value in SQLITE_PRAGMAS.items() if name != "journal_mode"}
+    return create_db_engine(read_only_url.render_as_string(hide_password=False), pragmas={**pragmas, "query_only": "ON"})
+
+
+class ReplicaPool:
+    """
+    Read-only session factories for the read replicas, handed out round-robin.
+
+    A replica that fails to connect, or whose query fails, is skipped for `retry_seconds`, after
+    which it is tried again.
+    """
+
+    def __init__(self, urls: list[str], retry_seconds: float = REPLICA_RETRY_SECONDS):
+        self.urls = list(urls)
+        self.retry_seconds = retry_seconds
+        self._sessionmakers = [
+            sessionmaker(autocommit=False, autoflush=False, bind=_read_only_engine(url))
+            for url in self.urls
+        ]
+        self._down_until = [0.0] * len(self.urls)
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def candidates(self) -> list[int]:
+        """Indexes of the healthy replicas, starting with the next one in round-robin order."""
+        with self._lock:
+            start = self._next
+            self._next = (self._next + 1) % max(len(self.urls), 1)
+        now = time.monotonic()
+        order = [(start + offset) % len(self.urls) for offset in range(len(self.urls))]
+        return [index for index in order if self._down_until[index] <= now]
+
+    def session(self, index: int):
+        db = self._sessionmakers[index]()
+        db.info["replica"] = self.urls[index]
+        return db
+
+    def mark_down(self, index: int):
+        self._down_until[index] = time.monotonic() + self.retry_seconds
+
+    def stats(self) -> list[dict]:
+        now = time.monotonic()
+        return [
+            {"url": make_url(url).render_as_string(hide_password=True), "healthy": self._down_until[index] <= now}
+            for index, url in enumerate(self.urls)
+        ]
+
 
 # Create engine
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+engine = create_db_engine()
+async_engine = create_async_db_engine()
 
 # Base class for ORM models
 Base = declarative_base()
 
 # Session configuration
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Objects stay usable after commit, since async sessions cannot lazy-load expired attributes
+AsyncSessionLocal = async_sessionmaker(autoflush=False, expire_on_commit=False, bind=async_engine)
+
+# Replicas for read-only routes; empty unless REPLICA_DATABASE_URLS is set
+read_replicas = ReplicaPool(REPLICA_DATABASE_URLS)
 
 # Metadata for custom queries
 metadata = MetaData()
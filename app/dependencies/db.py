@@ -1,8 +1,69 @@
-from app.db.db import SessionLocal
+import math
+import time
+from fastapi import Depends, Request, Response
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+from app.db.db import SessionLocal, AsyncSessionLocal, READ_YOUR_WRITES_SECONDS, read_replicas
+
+# Set after a successful write; while it has not expired, the client's reads go to the primary
+PRIMARY_PIN_COOKIE = "read_primary_until"
 
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+def _pinned_to_primary(request: Request) -> bool:
+    try:
+        return float(request.cookies.get(PRIMARY_PIN_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+def get_read_db(request: Request, primary: Session = Depends(get_db)):
+    """
+    Session for read-only routes: the next healthy replica, or the primary when no replica is
+    configured or reachable, or when the client has written recently (read-your-writes).
+    The primary session is lazy, so it opens no connection when a replica is used.
+    """
+    if not read_replicas.urls or _pinned_to_primary(request):
+        yield primary
+        return
+    for index in read_replicas.candidates():
+        db = read_replicas.session(index)
+        try:
+            db.connection()
+        except OperationalError:
+            db.close()
+            read_replicas.mark_down(index)
+            continue
+        try:
+            yield db
+        except OperationalError:
+            # A replica that connects but cannot answer (missing tables, corrupt or vanished file)
+            # fails this request; later ones skip it until the retry delay has passed
+            read_replicas.mark_down(index)
+            raise
+        finally:
+            db.close()
+        return
+    yield primary
+
+def pin_to_primary(request: Request, response: Response):
+    """After a successful write, pin the client to the primary for READ_YOUR_WRITES_SECONDS."""
+    if not read_replicas.urls or READ_YOUR_WRITES_SECONDS <= 0:
+        return
+    if request.method in ("GET", "HEAD", "OPTIONS") or response.status_code >= 400:
+        return
+    response.set_cookie(
+        PRIMARY_PIN_COOKIE,
+        str(time.time() + READ_YOUR_WRITES_SECONDS),
+        max_age=math.ceil(READ_YOUR_WRITES_SECONDS),
+        httponly=True,
+        samesite="lax",
+    )
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,24 @@
+import hashlib
+from fastapi import Request, Response, status
+
+def make_etag(*parts) -> str:
+    """
+    Build a strong ETag from the version numbers and query parameters that determine a response.
+    """
+    digest = hashlib.sha256(":".join(str(part) for part in parts).encode("utf-8")).hexdigest()
+    return f'"{digest[:32]}"'
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """
+    True if the request's If-None-Match header matches `etag` (weak comparison, as RFC 9110 requires).
+    """
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return etag in candidates
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
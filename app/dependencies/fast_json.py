@@ -0,0 +1,12 @@
+import orjson
+from fastapi import Response
+
+def json_bytes_response(content, response: Response) -> Response:
+    """
+    Serialize plain dicts (or a list of them) straight to JSON bytes, skipping response_model validation.
+
+    Only for content already shaped like the route's response_model (same keys, JSON-native values),
+    or a sparse subset of it, which keeps declaring the model for the OpenAPI schema. Headers set on
+    the injected `response` are carried over, since FastAPI ignores them when a Response is returned.
+    """
+    return Response(orjson.dumps(content), media_type="application/json", headers=dict(response.headers))
@@ -1,12 +1,54 @@
-from fastapi import Depends
+from fastapi import Depends, Request
 from app.services.book_service import BookService
 from app.services.review_service import ReviewService
-from app.dependencies.db import get_db
+from app.services.async_book_service import AsyncBookService
+from app.services.async_review_service import AsyncReviewService
+from app.services.cache_service import book_cache
+from app.services.introduction_service import IntroductionService
+from app.dependencies.db import get_db, get_read_db, get_async_db
 from sqlalchemy.orm import Session
+from openai import AsyncOpenAI
+from sqlalchemy.ext.asyncio import AsyncSession
 
 def get_book_service(db: Session = Depends(get_db)) -> BookService:
-    return BookService(db)
+    return BookService(db, book_cache)
 
 def get_review_service(db: Session = Depends(get_db)) -> ReviewService:
     return ReviewService(db)
 
+def _read_cache(db: Session):
+    # A lagging replica could refill the cache with a row older than the write that just
+    # invalidated it, so only primary reads use the cache
+    return None if "replica" in db.info else book_cache
+
+def get_read_book_service(db: Session = Depends(get_read_db)) -> BookService:
+    """BookService for GET routes, reading from a replica when one is configured."""
+    return BookService(db, _read_cache(db))
+
+def get_read_review_service(db: Session = Depends(get_read_db)) -> ReviewService:
+    """ReviewService for GET routes, reading from a replica when one is configured."""
+    return ReviewService(db)
+
+def get_openai_client(request: Request) -> AsyncOpenAI:
+    """The AsyncOpenAI client the app lifespan created, shared by every request."""
+    return request.app.state.openai_client
+
+def get_introduction_service(db: Session = Depends(get_db),
+                             client: AsyncOpenAI = Depends(get_openai_client)) -> IntroductionService:
+    return IntroductionService(db, client)
+
+def get_async_book_service(db: AsyncSession = Depends(get_async_db)) -> AsyncBookService:
+    return AsyncBookService(db, book_cache)
+
+def get_async_review_service(db: AsyncSession = Depends(get_async_db)) -> AsyncReviewService:
+    return AsyncReviewService(db)
+
+
+def get_review_batcher(request: Request):
+    """The running ReviewWriteBatcher, or None unless REVIEW_WRITE_BATCHING is enabled."""
+    return getattr(request.app.state, "review_batcher", None)
+
+
+def get_introduction_batch_runner(request: Request):
+    """The IntroductionBatchRunner the app lifespan created."""
+    return request.app.state.introduction_batches
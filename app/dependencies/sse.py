@@ -0,0 +1,38 @@
+from typing import AsyncGenerator, AsyncIterator
+import anyio
+import orjson
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+
+# Keep proxies (nginx in particular) from buffering or caching the event stream
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+def sse_event(data: dict, event: str | None = None) -> bytes:
+    """One Server-Sent Event; the data is a single line of JSON, so deltas with newlines stay one event."""
+    prefix = f"event: {event}\n".encode() if event else b""
+    return prefix + b"data: " + orjson.dumps(data) + b"\n\n"
+
+async def sse_deltas(request: Request, deltas: AsyncGenerator[str, None], done: dict) -> AsyncIterator[bytes]:
+    """
+    Forward text `deltas` as `data: {"delta": ...}` events, then a final `done` event.
+
+    Stops as soon as the client disconnects and closes `deltas`, so the upstream generation
+    is abandoned instead of running to the end. Errors after the response has started can
+    no longer change the status code, so they are sent as an `error` event.
+    """
+    try:
+        async for delta in deltas:
+            if await request.is_disconnected():
+                return
+            yield sse_event({"delta": delta})
+        yield sse_event(done, event="done")
+    except Exception as e:
+        yield sse_event({"detail": str(e)}, event="error")
+    finally:
+        with anyio.CancelScope(shield=True):
+            await deltas.aclose()
+
+def sse_response(request: Request, deltas: AsyncGenerator[str, None], done: dict,
+                 headers: dict | None = None) -> StreamingResponse:
+    return StreamingResponse(sse_deltas(request, deltas, done), media_type="text/event-stream",
+                             headers={**SSE_HEADERS, **(headers or {})})
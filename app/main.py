@@ -1,4 +1,5 @@
 import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.responses import JSONResponse
 from fastapi.security import HTTPBearer
@@ -7,19 +8,47 @@ from app.exceptions import ServiceException
 from app.routes import pdf_rag
 
 from app.routes import auth
+from app.routes import metrics
+from app.routes import async_books, async_reviews
+from app.dependencies.db import pin_to_primary
+from app.services.review_batcher import REVIEW_WRITE_BATCHING, ReviewWriteBatcher
+from app.services.openai_client import create_openai_client
+from app.services.introduction_batch import IntroductionBatchRunner
 
 security = HTTPBearer()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Shared clients and background workers live as long as the server process
+    app.state.openai_client = create_openai_client()
+    app.state.introduction_batches = IntroductionBatchRunner(app.state.openai_client)
+    app.state.review_batcher = ReviewWriteBatcher() if REVIEW_WRITE_BATCHING else None
+    if app.state.review_batcher is not None:
+        await app.state.review_batcher.start()
+    yield
+    if app.state.review_batcher is not None:
+        await app.state.review_batcher.stop()
+    await app.state.introduction_batches.stop()
+    await app.state.openai_client.close()
+
 app = FastAPI(
     title="Book Management API",
     description="An API for managing books and integrating with OpenAI",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Read-your-writes: a client that has just written reads from the primary for a short while
+@app.middleware("http")
+async def read_your_writes(request: Request, call_next):
+    response = await call_next(request)
+    pin_to_primary(request, response)
+    return response
+
 # Global exception handler for HTTP exceptions
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request: Request, exc: HTTPException):
@@ -54,5 +83,9 @@ app.include_router(ai.router, prefix="/ai", tags=["AI"])
 app.include_router(chroma.router, prefix="/chroma", tags=["ChromaDB"])
 app.include_router(auth.router, prefix="", tags=["Auth"])
 app.include_router(pdf_rag.router, prefix="/pdf-rag", tags=["PDF-RAG"])
+app.include_router(metrics.router, prefix="", tags=["Metrics"])
+# Async engine variants of the book and review endpoints, kept beside the sync ones for A/B testing
+app.include_router(async_books.router, prefix="/async/books", tags=["Books (async)"])
+app.include_router(async_reviews.router, prefix="/async", tags=["Reviews (async)"])
 
 
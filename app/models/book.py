@@ -1,7 +1,19 @@
-from sqlalchemy import Column, Integer, String
+from itertools import groupby
+from sqlalchemy import Column, Integer, String, Index, DDL, event, func
 from app.db.db import Base
-from pydantic import BaseModel, Field, ConfigDict
-from sqlalchemy.orm import relationship
+# Imported so the tables derived from books are always created alongside it
+from app.models.resource_version import ResourceVersion
+from app.models.title_word import TitleWord
+from app.models.book_introduction import BookIntroduction
+from app.models.review import ReviewResponse
+from pydantic import BaseModel, Field, ConfigDict, field_validator
+from sqlalchemy.orm import relationship, validates
+
+def count_title_words(title: str) -> int:
+    """
+    Number of words in a title, where a word is a maximal run of alphabetic characters.
+    """
+    return sum(1 for is_alpha, _ in groupby(title, str.isalpha) if is_alpha)
 
 class Book(Base):
     __tablename__ = "books"
@@ -10,10 +22,87 @@ class Book(Base):
     author = Column(String, nullable=False)
     year = Column(Integer, nullable=False)
     description = Column(String, nullable=True)
+    # Derived from title (see count_title_words) so the longest-title statistics can use an index
+    title_word_count = Column(Integer, nullable=False, default=0, server_default="0", index=True)
+    # Row version for ETags, bumped by trigger whenever a content column changes
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    # Version of this book's review collection, bumped by the review triggers
+    reviews_version = Column(Integer, nullable=False, default=1, server_default="1")
+    # Number of reviews of this book, maintained by the review triggers for X-Total-Count
+    review_count = Column(Integer, nullable=False, default=0, server_default="0")
+
+    # Relationship with reviews. passive_deletes leaves deleting a book's reviews to the
+    # ON DELETE CASCADE foreign key instead of loading and deleting them one by one.
+    reviews = relationship("Review", back_populates="book", cascade="all, delete-orphan", passive_deletes=True)
+
+    __table_args__ = (
+        # Titles are unique ignoring case; lower(title) lookups are answered by this index
+        Index("ux_books_title_lower", func.lower(title), unique=True),
+    )
 
-    # Relationship with reviews
-    reviews = relationship("Review", back_populates="book", cascade="all, delete-orphan")
+    @validates("title")
+    def _update_title_word_count(self, key, title):
+        # Keeps title_word_count in step for every ORM insert and update of the title
+        self.title_word_count = count_title_words(title) if title is not None else 0
+        return title
     
+# Triggers keep the ETag versions in step with every writer, including bulk Core statements
+# and the async engine. The same statements are created by the Alembic migration.
+BOOK_VERSION_TRIGGERS = [
+    """
+    CREATE TRIGGER books_version_after_insert AFTER INSERT ON books BEGIN
+        UPDATE resource_versions SET version = version + 1 WHERE name = 'books';
+    END
+    """,
+    """
+    CREATE TRIGGER books_version_after_update AFTER UPDATE OF title, author, year, description ON books BEGIN
+        UPDATE books SET version = version + 1 WHERE id = NEW.id;
+        UPDATE resource_versions SET version = version + 1 WHERE name = 'books';
+    END
+    """,
+    """
+    CREATE TRIGGER books_version_after_delete AFTER DELETE ON books BEGIN
+        UPDATE resource_versions SET version = version + 1 WHERE name = 'books';
+    END
+    """,
+]
+for trigger in BOOK_VERSION_TRIGGERS:
+    event.listen(Book.__table__, "after_create", DDL(trigger).execute_if(dialect="sqlite"))
+
+# FTS5 index over the searchable columns. It is an external-content table, so the text is
+# stored once in books and the index follows it through these triggers.
+BOOK_SEARCH_DDL = [
+    """
+    CREATE VIRTUAL TABLE books_fts USING fts5(
+        title, author, description, content='books', content_rowid='id'
+    )
+    """,
+    """
+    CREATE TRIGGER books_fts_after_insert AFTER INSERT ON books BEGIN
+        INSERT INTO books_fts (rowid, title, author, description)
+        VALUES (NEW.id, NEW.title, NEW.author, NEW.description);
+    END
+    """,
+    """
+    CREATE TRIGGER books_fts_after_update AFTER UPDATE OF title, author, description ON books BEGIN
+        INSERT INTO books_fts (books_fts, rowid, title, author, description)
+        VALUES ('delete', OLD.id, OLD.title, OLD.author, OLD.description);
+        INSERT INTO books_fts (rowid, title, author, description)
+        VALUES (NEW.id, NEW.title, NEW.author, NEW.description);
+    END
+    """,
+    """
+    CREATE TRIGGER books_fts_after_delete AFTER DELETE ON books BEGIN
+        INSERT INTO books_fts (books_fts, rowid, title, author, description)
+        VALUES ('delete', OLD.id, OLD.title, OLD.author, OLD.description);
+    END
+    """,
+]
+for statement in BOOK_SEARCH_DDL:
+    event.listen(Book.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+# books_fts is not part of the metadata, so drop_all has to remove it explicitly
+event.listen(Book.__table__, "before_drop", DDL("DROP TABLE IF EXISTS books_fts").execute_if(dialect="sqlite"))
+
 # Pydantic Models for Request/Response
 class BookBase(BaseModel):
     title: str = Field(..., min_length=3, max_length=100, description="The title of the book (3-100 characters)")
@@ -24,6 +113,21 @@ class BookBase(BaseModel):
 class BookInfo(BookBase):
     pass
 
+class BookPatch(BaseModel):
+    """Partial update for PATCH: omitted fields are left unchanged."""
+    title: str | None = Field(None, min_length=3, max_length=100, description="The title of the book (3-100 characters)")
+    author: str | None = Field(None, min_length=3, max_length=50, description="The author of the book (3-50 characters)")
+    year: int | None = Field(None, gt=0, description="The publication year of the book (must be positive)")
+    description: str | None = Field(None, min_length=10, max_length=1000, description="The description of the book (10-1000 characters)")
+
+    @field_validator("*")
+    @classmethod
+    def _not_null(cls, value):
+        # Defaults are not validated, so this only rejects an explicit null
+        if value is None:
+            raise ValueError("may be omitted but not set to null")
+        return value
+
 class ChromaBookInfo(BaseModel):
     id: str
     title: str
@@ -31,4 +135,29 @@ class ChromaBookInfo(BaseModel):
 
 class BookResponse(BookBase):
     model_config = ConfigDict(from_attributes=True)
-    id: int
\ No newline at end of file
+    id: int
+
+class BookListResponse(BookResponse):
+    # Only present when requested with ?include=, so plain listings keep their shape
+    review_count: int | None = None
+    reviews: list[ReviewResponse] | None = None
+
+class BookSearchResult(BookResponse):
+    rank: float = Field(..., description="BM25 score; lower is a better match")
+    snippet: str = Field(..., description="Best-matching fragment, HTML-escaped, with matched terms wrapped in <b></b>")
+
+class BookDeleteReport(BaseModel):
+    deleted: list[int]
+    not_found: list[int]
+
+class BookImportResult(BaseModel):
+    index: int = Field(..., description="Position of the row in the submitted array or NDJSON stream")
+    status: str = Field(..., description="created, conflict or invalid")
+    id: int | None = None
+    detail: str | None = None
+
+class BookImportReport(BaseModel):
+    created: int
+    conflicts: int
+    invalid: int
+    results: list[BookImportResult]
@@ -0,0 +1,49 @@
+from datetime import datetime
+from pydantic import BaseModel, Field
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, String, DDL, event, func
+from app.db.db import Base
+
+class BookIntroduction(Base):
+    """
+    Generated /ai/introduction texts, keyed by a hash of the book content, model and prompt version
+    (see app/services/introduction_service.py), so a repeat request needs no model call.
+    """
+    __tablename__ = "book_introductions"
+    cache_key = Column(String, primary_key=True)
+    book_id = Column(Integer, ForeignKey("books.id", ondelete="CASCADE"), nullable=False, index=True)
+    model = Column(String, nullable=False)
+    prompt_version = Column(String, nullable=False)
+    introduction = Column(String, nullable=False)
+    created_at = Column(DateTime, nullable=False, server_default=func.now())
+
+# A changed book hashes to a new key anyway; the trigger removes the entries it can no longer hit,
+# for every writer (PUT, PATCH, bulk Core updates). Deleted books go through ON DELETE CASCADE.
+# The same statement is created by the Alembic migration.
+BOOK_INTRODUCTION_TRIGGER = """
+CREATE TRIGGER book_introductions_after_book_update AFTER UPDATE OF title, author, year, description ON books BEGIN
+    DELETE FROM book_introductions WHERE book_id = NEW.id;
+END
+"""
+event.listen(BookIntroduction.__table__, "after_create", DDL(BOOK_INTRODUCTION_TRIGGER).execute_if(dialect="sqlite"))
+
+class IntroductionBatchRequest(BaseModel):
+    """Books to pre-generate introductions for: the listed ids and/or a filter; neither means every book."""
+    book_ids: list[int] | None = Field(None, min_length=1, description="Only these books")
+    author: str | None = Field(None, description="Only books by this author")
+    year: int | None = Field(None, gt=0, description="Only books published in this year")
+    missing_only: bool = Field(True, description="Skip books whose introduction is already stored")
+
+class IntroductionBatchStatus(BaseModel):
+    job_id: str
+    status: str = Field(..., description="queued, running, completed, failed or cancelled")
+    total: int = Field(..., description="Books selected for the job")
+    generated: int = Field(..., description="Introductions generated so far")
+    stored: int = Field(..., description="Generated introductions written to book_introductions")
+    skipped: int = Field(..., description="Books whose introduction was already stored")
+    failed: int = Field(..., description="Books whose generation failed after all retries")
+    pending: int
+    not_found: list[int] = Field(..., description="Requested book ids that do not exist")
+    errors: dict[int, str] = Field(..., description="Failure per book id (the first few only)")
+    error: str | None = Field(None, description="Why the whole job failed")
+    created_at: datetime
+    finished_at: datetime | None
@@ -0,0 +1,17 @@
+from sqlalchemy import Column, Integer, String, DDL, event
+from app.db.db import Base
+
+class ResourceVersion(Base):
+    """
+    Collection-level version counters ("books", "reviews"), bumped by database triggers on
+    every write to the collection, so a list ETag costs one primary-key lookup.
+    """
+    __tablename__ = "resource_versions"
+    name = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=1)
+
+event.listen(
+    ResourceVersion.__table__,
+    "after_create",
+    DDL("INSERT INTO resource_versions (name, version) VALUES ('books', 1), ('reviews', 1)"),
+)
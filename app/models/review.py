@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey
+from sqlalchemy import Column, Integer, String, ForeignKey, Index, DDL, event
 from pydantic import BaseModel, ConfigDict
 from sqlalchemy.orm import relationship
 from app.db.db import Base
@@ -8,10 +8,63 @@ class Review(Base):
     id = Column(Integer, primary_key=True, index=True)
     review = Column(String, nullable=False)
     book_id = Column(Integer, ForeignKey("books.id", ondelete="CASCADE"), nullable=False)
+    # Row version for ETags, bumped by trigger whenever the review changes
+    version = Column(Integer, nullable=False, default=1, server_default="1")
 
     # Relationship with the Book model
     book = relationship("Book", back_populates="reviews")
 
+    __table_args__ = (
+        # Serves WHERE book_id = ? AND id > ? ORDER BY id, the keyset page of one book's reviews
+        Index("ix_reviews_book_id_id", book_id, id),
+    )
+
+# Triggers bump the review's own version, the book's reviews_version and the "reviews"
+# collection version. The same statements are created by the Alembic migration.
+REVIEW_VERSION_TRIGGERS = [
+    """
+    CREATE TRIGGER reviews_version_after_insert AFTER INSERT ON reviews BEGIN
+        UPDATE books SET reviews_version = reviews_version + 1 WHERE id = NEW.book_id;
+        UPDATE resource_versions SET version = version + 1 WHERE name = 'reviews';
+    END
+    """,
+    """
+    CREATE TRIGGER reviews_version_after_update AFTER UPDATE OF review, book_id ON reviews BEGIN
+        UPDATE reviews SET version = version + 1 WHERE id = NEW.id;
+        UPDATE books SET reviews_version = reviews_version + 1 WHERE id IN (OLD.book_id, NEW.book_id);
+        UPDATE resource_versions SET version = version + 1 WHERE name = 'reviews';
+    END
+    """,
+    """
+    CREATE TRIGGER reviews_version_after_delete AFTER DELETE ON reviews BEGIN
+        UPDATE books SET reviews_version = reviews_version + 1 WHERE id = OLD.book_id;
+        UPDATE resource_versions SET version = version + 1 WHERE name = 'reviews';
+    END
+    """,
+]
+# Triggers keep books.review_count equal to the number of reviews pointing at each book
+REVIEW_COUNT_TRIGGERS = [
+    """
+    CREATE TRIGGER reviews_count_after_insert AFTER INSERT ON reviews BEGIN
+        UPDATE books SET review_count = review_count + 1 WHERE id = NEW.book_id;
+    END
+    """,
+    """
+    CREATE TRIGGER reviews_count_after_update AFTER UPDATE OF book_id ON reviews
+    WHEN OLD.book_id <> NEW.book_id BEGIN
+        UPDATE books SET review_count = review_count - 1 WHERE id = OLD.book_id;
+        UPDATE books SET review_count = review_count + 1 WHERE id = NEW.book_id;
+    END
+    """,
+    """
+    CREATE TRIGGER reviews_count_after_delete AFTER DELETE ON reviews BEGIN
+        UPDATE books SET review_count = review_count - 1 WHERE id = OLD.book_id;
+    END
+    """,
+]
+for trigger in REVIEW_VERSION_TRIGGERS + REVIEW_COUNT_TRIGGERS:
+    event.listen(Review.__table__, "after_create", DDL(trigger).execute_if(dialect="sqlite"))
+
 class ReviewBase(BaseModel):
     review: str
 
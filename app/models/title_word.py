@@ -0,0 +1,44 @@
+from collections import Counter
+from sqlalchemy import Column, Integer, String, Index, delete
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from app.db.db import Base
+
+class TitleWord(Base):
+    """
+    How many times each lower-cased, whitespace-separated word occurs across all book titles.
+    Maintained incrementally by the book services, so top-k queries never scan the books table.
+    """
+    __tablename__ = "title_words"
+    word = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        # Serves ORDER BY count DESC, word ASC LIMIT k without sorting the vocabulary
+        Index("ix_title_words_count_word", count.desc(), word),
+    )
+
+def title_words(title: str) -> Counter:
+    """Words of a title as counted by get_most_common_words_in_titles."""
+    return Counter(title.lower().split())
+
+def title_word_changes(old_title: str | None, new_title: str | None) -> Counter:
+    """Per-word count changes for a title going from `old_title` to `new_title` (None: no book)."""
+    deltas = title_words(new_title or "")
+    deltas.subtract(title_words(old_title or ""))
+    return deltas
+
+def title_word_delta_statements(deltas: Counter) -> list:
+    """
+    Statements that add `deltas` to title_words, to run in the same transaction as the book write.
+    Words whose count drops to zero are removed.
+    """
+    deltas = {word: delta for word, delta in deltas.items() if delta}
+    if not deltas:
+        return []
+    upsert = sqlite_insert(TitleWord).values([{"word": word, "count": delta} for word, delta in deltas.items()])
+    upsert = upsert.on_conflict_do_update(
+        index_elements=[TitleWord.word],
+        set_={"count": TitleWord.count + upsert.excluded["count"]},
+    )
+    prune = delete(TitleWord).where(TitleWord.word.in_(list(deltas)), TitleWord.count <= 0)
+    return [upsert, prune]
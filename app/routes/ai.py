@@ -1,8 +1,13 @@
-from fastapi import APIRouter, HTTPException, Path, Depends
+from fastapi import APIRouter, HTTPException, Path, Depends, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from dotenv import load_dotenv
 from app.services.book_service import BookService
-from app.dependencies.services import get_book_service
-import openai
+from app.services.introduction_service import IntroductionService
+from app.services.introduction_batch import IntroductionBatchRunner
+from app.models.book_introduction import IntroductionBatchRequest, IntroductionBatchStatus
+from app.dependencies.auth import required_admin_role
+from app.dependencies.services import get_book_service, get_introduction_service, get_introduction_batch_runner
+from app.dependencies.sse import sse_response
 import os
 
 load_dotenv()
@@ -14,41 +19,68 @@ if not openai_api_key:
 
 router = APIRouter()
 
+# Cache-Status values (RFC 9211) for the persisted introduction cache
+INTRODUCTION_CACHE_HIT = "book-api; hit"
+INTRODUCTION_CACHE_MISS = "book-api; fwd=miss; stored"
+# A streamed miss is only stored if the client stays until the end, so "stored" cannot be promised
+INTRODUCTION_CACHE_STREAMED_MISS = "book-api; fwd=miss"
+
+async def _single_delta(text: str):
+    yield text
+
 @router.get("/introduction/{book_id}", response_model=dict)
-def introduce_book(book_id: int = Path(..., title="The ID of the book to introduce"), 
-                   book_service: BookService = Depends(get_book_service),):
+async def introduce_book(request: Request, response: Response,
+                   book_id: int = Path(..., title="The ID of the book to introduce"), 
+                   stream: bool = Query(False, description="Stream the introduction as Server-Sent Events"),
+                   book_service: BookService = Depends(get_book_service),
+                   introduction_service: IntroductionService = Depends(get_introduction_service),):
     """
     Generate an introduction for a book using OpenAI's text-generation API.
+    Introductions are persisted per book content, model and prompt version, so repeats skip the API;
+    the Cache-Status header (RFC 9211) says whether this one was a hit.
+
+    With stream=true the text arrives as `data: {"delta": ...}` events followed by a `done` event;
+    disconnecting stops the generation, and only completed streams are persisted.
     """
     # Get the book details from the database
-    book = book_service.get_book(book_id)
+    book = await run_in_threadpool(book_service.get_book, book_id)
     if not book:
         raise HTTPException(status_code=404, detail="Book not found")
 
-    # Construct a prompt for OpenAI
-    prompt = (
-        f"Introduce the book '{book.title}' by {book.author}, published in {book.year}. "
-        f"Here is the description: {book.description or 'No description available'}."
-    )
-    
-    # Call OpenAI API
+    if stream:
+        cached = await run_in_threadpool(introduction_service.get_cached, book)
+        if cached is not None:
+            return sse_response(request, _single_delta(cached), {"book_id": book_id},
+                                headers={"Cache-Status": INTRODUCTION_CACHE_HIT})
+        return sse_response(request, introduction_service.shared_stream(book), {"book_id": book_id},
+                            headers={"Cache-Status": INTRODUCTION_CACHE_STREAMED_MISS})
+
     try:
-        openai.api_key = os.getenv("OPENAI_API_KEY")
-        client = openai.Client()
- 
-        completion = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "You are a book reviewer."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=1,
-            max_completion_tokens=2048,
-            top_p=1,
-            frequency_penalty=0,
-            presence_penalty=0,
-        )
-        introduction = completion.choices[0].message.content
-        return {"book_id": book_id, "introduction": introduction}
+        introduction, hit = await introduction_service.introduce(book)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"OpenAI API error: {str(e)}")
+    response.headers["Cache-Status"] = INTRODUCTION_CACHE_HIT if hit else INTRODUCTION_CACHE_MISS
+    return {"book_id": book_id, "introduction": introduction}
+
+# Pre-generate introductions for many books, which can spend a lot of tokens, so admin only
+@router.post("/introductions/batch", response_model=IntroductionBatchStatus, status_code=202,
+             dependencies=[Depends(required_admin_role)])
+async def start_introduction_batch(batch: IntroductionBatchRequest, response: Response,
+                                   runner: IntroductionBatchRunner = Depends(get_introduction_batch_runner)):
+    """
+    Start generating introductions for the selected books in the background, within the configured
+    requests- and tokens-per-minute limits. Poll the URL in the Location header for progress.
+    """
+    job = runner.submit(batch)
+    response.headers["Location"] = f"/ai/introductions/batch/{job.job_id}"
+    return job.to_dict()
+
+@router.get("/introductions/batch/{job_id}", response_model=IntroductionBatchStatus)
+def get_introduction_batch(job_id: str, runner: IntroductionBatchRunner = Depends(get_introduction_batch_runner)):
+    """
+    Progress of an introduction batch job.
+    """
+    job = runner.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Batch job not found")
+    return job.to_dict()
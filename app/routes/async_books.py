@@ -0,0 +1,54 @@
+from fastapi import APIRouter, HTTPException, Depends, Query, Response, status
+from app.exceptions import ServiceException
+from app.models.book import BookInfo, BookResponse
+from app.services.async_book_service import AsyncBookService
+from app.dependencies.services import get_async_book_service
+from app.dependencies.auth import required_admin_role
+from app.routes.books import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+
+# Same endpoints as app/routes/books.py, served by native coroutines on the async engine
+# instead of the threadpool, so the two paths can be compared side by side.
+router = APIRouter()
+
+@router.get("/", response_model=list[BookResponse])
+async def get_books(
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Maximum number of books to return"),
+    after: int | None = Query(None, description="Cursor: only return books with an ID greater than this"),
+    service: AsyncBookService = Depends(get_async_book_service),
+):
+    books = await service.get_books_page(limit, after)
+    if len(books) == limit:
+        response.headers["X-Next-Cursor"] = str(books[-1].id)
+    return books
+
+@router.get("/{book_id}", response_model=BookResponse)
+async def get_book(book_id: int, service: AsyncBookService = Depends(get_async_book_service)):
+    book = await service.get_book(book_id)
+    if not book:
+        raise HTTPException(status_code=404, detail="Book not found")
+    return book
+
+@router.post("/", response_model=BookResponse, status_code=status.HTTP_201_CREATED)
+async def add_book(book: BookInfo, service: AsyncBookService = Depends(get_async_book_service)):
+    try:
+        return await service.add_book(book)
+    except ServiceException as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+@router.put("/{book_id}", response_model=BookResponse, dependencies=[Depends(required_admin_role)])
+async def update_book(book_id: int, updated_book: BookInfo, service: AsyncBookService = Depends(get_async_book_service)):
+    try:
+        book = await service.update_book(book_id, updated_book)
+    except ServiceException as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    if not book:
+        raise HTTPException(status_code=404, detail="Book not found")
+    return book
+
+@router.delete("/{book_id}")
+async def delete_book(book_id: int, service: AsyncBookService = Depends(get_async_book_service)):
+    success = await service.delete_book(book_id)
+    if not success:
+        raise HTTPException(status_code=404, detail="Book not found")
+    return {"message": "Book deleted successfully"}
@@ -0,0 +1,73 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from app.models.review import ReviewInfo, ReviewResponse
+from app.services.async_review_service import AsyncReviewService
+from app.dependencies.services import get_async_review_service
+from app.dependencies.auth import required_user_role
+from app.routes.reviews import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+
+# Same endpoints as app/routes/reviews.py, served by native coroutines on the async engine
+router = APIRouter()
+
+@router.get("/books/{book_id}/reviews", response_model=list[ReviewResponse])
+async def get_reviews(
+    book_id: int,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Maximum number of reviews to return"),
+    after: int | None = Query(None, description="Cursor: only return reviews with an ID greater than this"),
+    service: AsyncReviewService = Depends(get_async_review_service)
+):
+    reviews = await service.get_reviews_page(book_id, limit, after)
+    if not reviews and after is None:
+        raise HTTPException(status_code=404, detail=f"No reviews found for book {book_id}")
+    response.headers["X-Total-Count"] = str(await service.get_review_count(book_id) or 0)
+    if len(reviews) == limit:
+        response.headers["X-Next-Cursor"] = str(reviews[-1].id)
+    return reviews
+
+@router.get("/books/{book_id}/reviews/{review_id}", response_model=ReviewResponse)
+async def get_review(
+    review_id: int,
+    service: AsyncReviewService = Depends(get_async_review_service)
+):
+    review = await service.get_review_by_id(review_id)
+    if not review:
+        raise HTTPException(status_code=404, detail=f"No review found with id {review_id}")
+    return review
+
+@router.post("/books/{book_id}/reviews",
+             response_model=ReviewResponse,
+             status_code=status.HTTP_201_CREATED,
+             dependencies=[Depends(required_user_role)],
+             )
+async def add_review(
+    book_id: int,
+    review: ReviewInfo,
+    service: AsyncReviewService = Depends(get_async_review_service),
+):
+    new_review = await service.add_review(book_id, review)
+    if not new_review:
+        raise HTTPException(status_code=404, detail=f"Book with id {book_id} not found")
+    return new_review
+
+@router.put("/books/{book_id}/reviews/{review_id}", response_model=ReviewResponse)
+async def update_review(
+    book_id: int,
+    review_id: int,
+    new_review: ReviewInfo,
+    service: AsyncReviewService = Depends(get_async_review_service),
+):
+    updated_review = await service.update_review(book_id, review_id, new_review)
+    if not updated_review:
+        raise HTTPException(status_code=404, detail=f"Review with id {review_id} for book {book_id} not found")
+    return updated_review
+
+@router.delete("/books/{book_id}/reviews/{review_id}")
+async def delete_review(
+    book_id: int,
+    review_id: int,
+    service: AsyncReviewService = Depends(get_async_review_service),
+):
+    success = await service.delete_review(book_id, review_id)
+    if not success:
+        raise HTTPException(status_code=404, detail=f"Review with id {review_id} for book {book_id} not found")
+    return {"message": "Review deleted successfully"}
@@ -1,9 +1,9 @@
 from fastapi import APIRouter, HTTPException, status
-from app.services.cognito_service import CognitoService
+from app.services.cognito_service import get_cognito_service
 from app.exceptions import ServiceException
 
 router = APIRouter()
-cognito_service = CognitoService()
+cognito_service = get_cognito_service()
 
 @router.post("/login")
 def login(username: str, password: str):
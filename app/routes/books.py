@@ -1,21 +1,159 @@
-from fastapi import APIRouter, HTTPException, Depends, status
+import json
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from app.exceptions import ServiceException
-from app.models.book import Book, BookInfo, BookResponse
-from app.services.book_service import BookService
-from app.dependencies.services import get_book_service
+from app.models.book import Book, BookInfo, BookPatch, BookResponse, BookListResponse, BookImportReport, BookSearchResult, BookDeleteReport
+from app.services.book_service import BookService, book_field_names
+from app.dependencies.services import get_book_service, get_read_book_service
 from app.dependencies.auth import required_admin_role
+from app.dependencies.etag import make_etag, etag_matches, not_modified
+from app.dependencies.fast_json import json_bytes_response
 
 router = APIRouter()
 
-@router.get("/", response_model=list[BookResponse])
-def get_books(service: BookService = Depends(get_book_service)):
-    return service.get_books()
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+STREAM_BATCH_SIZE = 500
+MAX_SEARCH_RESULTS = 100
+MAX_BULK_DELETE = 1000
+DEFAULT_REVIEWS_PER_BOOK = 5
+MAX_REVIEWS_PER_BOOK = 50
+INCLUDE_OPTIONS = {"reviews", "review_count"}
+
+def _parse_include(include: str | None) -> set[str]:
+    options = {option.strip() for option in include.split(",") if option.strip()} if include else set()
+    unknown = options - INCLUDE_OPTIONS
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown include option(s): {', '.join(sorted(unknown))}; expected {', '.join(sorted(INCLUDE_OPTIONS))}",
+        )
+    return options
+
+def _parse_fields(fields: str | None) -> tuple[str, ...] | None:
+    """Validate a comma-separated ?fields= list; None when absent, meaning every field."""
+    if fields is None:
+        return None
+    try:
+        return book_field_names(name.strip() for name in fields.split(",") if name.strip())
+    except ServiceException as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+FIELDS_DESCRIPTION = "Comma-separated subset of book fields to return (id is always included), e.g. fields=id,title"
+
+def _stream_books_ndjson(service: BookService, after: int | None):
+    """
+    Yield one JSON line per book, reading rows in fixed-size batches so memory stays constant.
+    """
+    try:
+        for book in service.iter_books(after=after, batch_size=STREAM_BATCH_SIZE):
+            yield BookResponse.model_validate(book).model_dump_json() + "\n"
+    finally:
+        service.db.close()
+
+@router.get("/", response_model=list[BookListResponse])
+def get_books(
+    request: Request,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Maximum number of books to return"),
+    after: int | None = Query(None, description="Cursor: only return books with an ID greater than this"),
+    stream: bool = Query(False, description="Stream every book after the cursor as NDJSON, ignoring limit"),
+    include: str | None = Query(None, description="Comma-separated extras per book: reviews, review_count"),
+    reviews_limit: int = Query(DEFAULT_REVIEWS_PER_BOOK, ge=1, le=MAX_REVIEWS_PER_BOOK,
+                               description="With include=reviews, the most reviews returned per book"),
+    fields: str | None = Query(None, description=FIELDS_DESCRIPTION),
+    service: BookService = Depends(get_read_book_service),
+):
+    if stream:
+        return StreamingResponse(_stream_books_ndjson(service, after), media_type="application/x-ndjson")
+    options = _parse_include(include)
+    field_names = _parse_fields(fields)
+
+    # The version is read before the rows, so a concurrent write can only make the ETag older than the body.
+    # Review extras change with the reviews collection, so its version joins the ETag when they are included.
+    reviews_version = service.get_collection_version("reviews") if options else None
+    etag = make_etag("books", service.get_collection_version(), reviews_version, limit, after,
+                     sorted(options), reviews_limit if "reviews" in options else None, field_names)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
+
+    if options:
+        books = service.get_books_page_including(
+            limit, after,
+            reviews_per_book=reviews_limit if "reviews" in options else None,
+            review_count="review_count" in options,
+            fields=field_names,
+        )
+    else:
+        books = service.get_books_page_rows(limit, after, fields=field_names)
+    # A full page means there may be more rows; hand the client the cursor for the next one
+    if len(books) == limit:
+        response.headers["X-Next-Cursor"] = str(books[-1]["id"])
+    # Rows are already BookListResponse-shaped dicts (or a sparse subset), so they skip per-row model validation
+    return json_bytes_response(books, response)
+
+@router.delete("/", response_model=BookDeleteReport, dependencies=[Depends(required_admin_role)])
+def delete_books(
+    ids: str = Query(..., description=f"Comma-separated IDs of the books to delete (at most {MAX_BULK_DELETE})"),
+    service: BookService = Depends(get_book_service),
+):
+    """
+    Delete many books, and their reviews, in one statement. IDs that do not exist are reported, not an error.
+    """
+    try:
+        book_ids = list(dict.fromkeys(int(part) for part in ids.split(",") if part.strip()))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be a comma-separated list of integers")
+    if not book_ids or len(book_ids) > MAX_BULK_DELETE:
+        raise HTTPException(status_code=400, detail=f"Give between 1 and {MAX_BULK_DELETE} ids")
+
+    deleted = service.delete_books(book_ids)
+    deleted_set = set(deleted)
+    return {"deleted": sorted(deleted), "not_found": [book_id for book_id in book_ids if book_id not in deleted_set]}
+
+# Declared before /{book_id} so "search" is not parsed as a book ID
+@router.get("/search", response_model=list[BookSearchResult])
+def search_books(
+    q: str = Query(..., min_length=1, max_length=200, description="Words to look for in titles, authors and descriptions"),
+    limit: int = Query(20, ge=1, le=MAX_SEARCH_RESULTS, description="Maximum number of results"),
+    service: BookService = Depends(get_read_book_service),
+):
+    """
+    Keyword search backed by the books_fts index, ranked by BM25 with a highlighted snippet.
+    Every word must match; there is no call to an external service.
+    """
+    try:
+        return service.search_books(q, limit)
+    except ServiceException as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
 
 @router.get("/{book_id}", response_model=BookResponse)
-def get_book(book_id: int, service: BookService = Depends(get_book_service)):
-    book = service.get_book(book_id)
+def get_book(
+    book_id: int,
+    request: Request,
+    response: Response,
+    fields: str | None = Query(None, description=FIELDS_DESCRIPTION),
+    service: BookService = Depends(get_read_book_service),
+):
+    field_names = _parse_fields(fields)
+    version = service.get_book_version(book_id)
+    if version is None:
+        raise HTTPException(status_code=404, detail="Book not found")
+    etag = make_etag("book", book_id, version, field_names)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    if field_names is not None:
+        book = service.get_book_fields(book_id, field_names)
+    else:
+        book = service.get_book(book_id)
     if not book:
         raise HTTPException(status_code=404, detail="Book not found")
+    response.headers["ETag"] = etag
+    if field_names is not None:
+        return json_bytes_response(book, response)
     return book
 
 @router.post("/", response_model=BookResponse, status_code=status.HTTP_201_CREATED)
@@ -25,6 +163,45 @@ def add_book(book: BookInfo, service: BookService = Depends(get_book_service)):
     except ServiceException as e:
         raise HTTPException(status_code=e.status_code, detail=e.detail)
 
+def _parse_bulk_body(body: bytes, content_type: str) -> list:
+    """
+    Decode a bulk import body: NDJSON (one book per line) or a JSON array of books.
+    An NDJSON line that is not valid JSON is kept as a string and reported as invalid.
+    """
+    if content_type.startswith(("application/x-ndjson", "application/ndjson")):
+        rows = []
+        for line in body.decode("utf-8").splitlines():
+            if not line.strip():
+                continue
+            try:
+                rows.append(json.loads(line))
+            except json.JSONDecodeError:
+                rows.append(line)
+        return rows
+
+    try:
+        rows = json.loads(body)
+    except json.JSONDecodeError:
+        raise HTTPException(status_code=400, detail="Request body must be a JSON array or NDJSON")
+    if not isinstance(rows, list):
+        raise HTTPException(status_code=400, detail="Request body must be a JSON array or NDJSON")
+    return rows
+
+@router.post("/bulk", response_model=BookImportReport)
+async def add_books_bulk(request: Request, service: BookService = Depends(get_book_service)):
+    """
+    Import many books at once from a JSON array or an NDJSON body (Content-Type: application/x-ndjson).
+    Returns a per-row status report; rows that fail validation or clash on title are skipped.
+    """
+    rows = _parse_bulk_body(await request.body(), request.headers.get("content-type", ""))
+    results = await run_in_threadpool(service.add_books_bulk, rows)
+    return {
+        "created": sum(1 for r in results if r["status"] == "created"),
+        "conflicts": sum(1 for r in results if r["status"] == "conflict"),
+        "invalid": sum(1 for r in results if r["status"] == "invalid"),
+        "results": results,
+    }
+
 # Update a book, which requires admin role now
 @router.put("/{book_id}", response_model=BookResponse, dependencies=[Depends(required_admin_role)])
 def update_book(book_id: int, updated_book: BookInfo, service: BookService = Depends(get_book_service)):
@@ -36,6 +213,19 @@ def update_book(book_id: int, updated_book: BookInfo, service: BookService = Dep
         raise HTTPException(status_code=404, detail="Book not found")
     return book
 
+@router.patch("/{book_id}", response_model=BookResponse, dependencies=[Depends(required_admin_role)])
+def patch_book(book_id: int, changes: BookPatch, service: BookService = Depends(get_book_service)):
+    """
+    Change only the fields present in the body, in a single UPDATE ... RETURNING.
+    """
+    try:
+        book = service.patch_book(book_id, changes.model_dump(exclude_unset=True))
+    except ServiceException as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    if not book:
+        raise HTTPException(status_code=404, detail="Book not found")
+    return book
+
 @router.delete("/{book_id}")
 def delete_book(book_id: int, service: BookService = Depends(get_book_service)):
     success = service.delete_book(book_id)
@@ -1,6 +1,9 @@
-from fastapi import APIRouter, HTTPException, status
+import openai
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
 from app.services.chroma_service import ChromaService
 from app.models.book import ChromaBookInfo
+from app.dependencies.services import get_openai_client
+from app.dependencies.sse import sse_response
 
 
 router = APIRouter()
@@ -27,16 +30,24 @@ def search_books_in_chromadb(query: str, distance_threshold: float = 1.0):
 
 
 @router.get("/summary")
-def ai_search_books_in_chromadb(query: str, distance_threshold: float = 1.0):
+async def ai_search_books_in_chromadb(request: Request, query: str, distance_threshold: float = 1.0,
+                                      stream: bool = Query(False, description="Stream the summary as Server-Sent Events"),
+                                      client: openai.AsyncOpenAI = Depends(get_openai_client)):
     """
     Search for similar books in ChromaDB based on a query and return a natural language summary using OpenAI.
+    With stream=true the summary arrives as Server-Sent Events, and disconnecting stops the generation.
     """
-    results = chroma_service.search_books(query, distance_threshold=distance_threshold)
+    # The Chroma query (and its embedding call) is blocking, so it runs in the threadpool
+    results = await chroma_service.search_books_shared(query, distance_threshold=distance_threshold)
     if not results:
         raise HTTPException(status_code=404, detail=f"No similar books found for the query: '{query}'.")
 
+    if stream:
+        deltas = chroma_service.stream_natural_language_response(query, results, client)
+        return sse_response(request, deltas, {"query": query})
+
     # Generate a natural language response using OpenAI
-    response = chroma_service.generate_natural_language_response(query, results)
+    response = await chroma_service.generate_natural_language_response(query, results, client)
     return {"query": query, "response": response}
 
 @router.delete("/{book_id}")
@@ -0,0 +1,34 @@
+from fastapi import APIRouter, Request
+from fastapi.concurrency import run_in_threadpool
+from app.services.cognito_service import get_cognito_service
+from app.services.cache_service import book_cache
+from app.db.db import read_replicas
+from app.services.chroma_service import chroma_flights, chroma_stream_flights
+from app.services.introduction_service import introduction_flights, introduction_stream_flights
+
+router = APIRouter()
+
+@router.get("/metrics")
+async def get_metrics(request: Request):
+    """
+    Expose the hit/miss counters of the in-process caches so they can be sized, replica health,
+    and how many callers are waiting on each coalesced OpenAI call.
+
+    Async so the single-flight tables are read on the event loop that mutates them; only the
+    Redis INFO call behind book_cache.stats() goes to the threadpool.
+    """
+    review_batcher = getattr(request.app.state, "review_batcher", None)
+    introduction_batches = getattr(request.app.state, "introduction_batches", None)
+    return {
+        "token_cache": get_cognito_service().token_cache.stats(),
+        "book_cache": await run_in_threadpool(book_cache.stats) if book_cache is not None else None,
+        "replicas": read_replicas.stats(),
+        "review_batcher": review_batcher.stats() if review_batcher is not None else None,
+        "introduction_batches": introduction_batches.stats() if introduction_batches is not None else None,
+        "single_flight": {
+            "introductions": introduction_flights.stats(),
+            "introduction_streams": introduction_stream_flights.stats(),
+            "chroma": chroma_flights.stats(),
+            "chroma_streams": chroma_stream_flights.stats(),
+        },
+    }
@@ -1,28 +1,50 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from app.models.review import ReviewInfo, ReviewResponse
 from app.services.review_service import ReviewService
-from app.dependencies.services import get_review_service
+from fastapi.concurrency import run_in_threadpool
+from app.dependencies.services import get_review_service, get_read_review_service, get_review_batcher
 from app.models.book import Book
 from app.models.review import Review
 
 from app.dependencies.auth import required_user_role
+from app.dependencies.etag import make_etag, etag_matches, not_modified
+from app.dependencies.fast_json import json_bytes_response
 
 router = APIRouter()
 
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
 @router.get("/books/{book_id}/reviews", response_model=list[ReviewResponse])
 def get_reviews(
     book_id: int,
-    service: ReviewService = Depends(get_review_service)
+    request: Request,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Maximum number of reviews to return"),
+    after: int | None = Query(None, description="Cursor: only return reviews with an ID greater than this"),
+    service: ReviewService = Depends(get_read_review_service)
 ):
-    reviews = service.get_reviews_by_book_id(book_id)
-    if not reviews:
+    version = service.get_reviews_version(book_id)
+    if version is not None:
+        etag = make_etag("reviews", book_id, version, limit, after)
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        response.headers["ETag"] = etag
+
+    reviews = service.get_reviews_page_rows(book_id, limit, after)
+    # Only the first page 404s; an exhausted cursor is just an empty page
+    if not reviews and after is None:
         raise HTTPException(status_code=404, detail=f"No reviews found for book {book_id}")
-    return reviews
+    response.headers["X-Total-Count"] = str(service.get_review_count(book_id) or 0)
+    if len(reviews) == limit:
+        response.headers["X-Next-Cursor"] = str(reviews[-1]["id"])
+    # Rows are already ReviewResponse-shaped dicts, so they skip per-row model validation
+    return json_bytes_response(reviews, response)
 
 @router.get("/books/{book_id}/reviews/{review_id}", response_model=ReviewResponse)
 def get_review(
     review_id: int,
-    service: ReviewService = Depends(get_review_service)
+    service: ReviewService = Depends(get_read_review_service)
 ):
     review = service.get_review_by_id(review_id)
     if not review:
@@ -34,13 +56,17 @@ def get_review(
              status_code=status.HTTP_201_CREATED,
              dependencies=[Depends(required_user_role)],
              )  
-def add_review(
+async def add_review(
     book_id: int,
     review: ReviewInfo,
     service: ReviewService = Depends(get_review_service),
+    batcher = Depends(get_review_batcher),
 ):
-    
-    new_review = service.add_review(book_id, review)
+    # With batching on, this review shares a transaction with those arriving in the same few ms
+    if batcher is not None:
+        new_review = await batcher.add_review(book_id, review)
+    else:
+        new_review = await run_in_threadpool(service.add_review, book_id, review)
     if not new_review:
         raise HTTPException(status_code=404, detail=f"Book with id {book_id} not found")
     return new_review
@@ -57,6 +83,18 @@ def update_review(
         raise HTTPException(status_code=404, detail=f"Review with id {review_id} for book {book_id} not found")
     return updated_review
 
+@router.patch("/books/{book_id}/reviews/{review_id}", response_model=ReviewResponse)
+def patch_review(
+    book_id: int,
+    review_id: int,
+    new_review: ReviewInfo,
+    service: ReviewService = Depends(get_review_service),
+):
+    updated_review = service.patch_review(book_id, review_id, new_review)
+    if not updated_review:
+        raise HTTPException(status_code=404, detail=f"Review with id {review_id} for book {book_id} not found")
+    return updated_review
+
 @router.delete("/books/{book_id}/reviews/{review_id}")
 def delete_review(
     book_id: int,
@@ -0,0 +1,111 @@
+from sqlalchemy import delete, select, func, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.exceptions import ServiceException
+from app.models.book import Book, BookInfo, count_title_words
+from app.models.title_word import title_word_changes, title_word_delta_statements
+from app.services.book_service import book_cache_key
+
+class AsyncBookService:
+    """
+    Async counterpart of BookService, used by the routes mounted under /async.
+    """
+    def __init__(self, db: AsyncSession, cache=None):
+        self.db = db
+        # Reads are not cached on this path, but writes must still evict what the sync path cached
+        self.cache = cache
+
+    def _invalidate(self, book_id: int):
+        if self.cache is not None:
+            self.cache.delete(book_cache_key(book_id))
+
+    async def get_books_page(self, limit: int, after: int | None = None):
+        """Retrieve up to `limit` books ordered by ID, starting after the `after` cursor."""
+        query = select(Book)
+        if after is not None:
+            query = query.where(Book.id > after)
+        result = await self.db.scalars(query.order_by(Book.id).limit(limit))
+        return result.all()
+
+    async def get_book(self, book_id: int):
+        """Retrieve a book by ID."""
+        return await self.db.get(Book, book_id)
+
+    async def _find_by_title(self, title: str):
+        result = await self.db.scalars(select(Book).where(func.lower(Book.title) == func.lower(title)))
+        return result.first()
+
+    async def _apply_title_word_deltas(self, deltas):
+        for statement in title_word_delta_statements(deltas):
+            await self.db.execute(statement)
+
+    async def _commit_or_conflict(self):
+        """Commit, turning a violation of the unique lower(title) index into a 409."""
+        try:
+            await self.db.commit()
+        except IntegrityError:
+            await self.db.rollback()
+            raise ServiceException(status_code=409, detail="Book with this title already exists")
+
+    async def add_book(self, book_data: BookInfo):
+        """Add a new book."""
+        new_book = Book(**book_data.model_dump())
+
+        # check if book already exists
+        if await self._find_by_title(new_book.title):
+            raise ServiceException(status_code=409, detail="Book with this title already exists")
+
+        self.db.add(new_book)
+        await self._apply_title_word_deltas(title_word_changes(None, new_book.title))
+        await self._commit_or_conflict()
+        await self.db.refresh(new_book)
+        return new_book
+
+    async def update_book(self, book_id: int, updated_data: BookInfo):
+        """Update an existing book; like BookService.update_book, a concurrent rename is a 409."""
+        book = await self.get_book(book_id)
+        if not book:
+            return None
+        old_title = book.title
+
+        existing_book = await self._find_by_title(updated_data.title)
+        if existing_book and existing_book.id != book_id:
+            raise ServiceException(status_code=409, detail="Book with this title already exists")
+
+        deltas = title_word_changes(old_title, updated_data.title)
+        values = updated_data.model_dump()
+        values["title_word_count"] = count_title_words(values["title"])
+        try:
+            result = await self.db.execute(
+                update(Book)
+                .where(Book.id == book_id, Book.title == old_title)
+                .values(**values)
+                .execution_options(synchronize_session=False)
+            )
+        except IntegrityError:
+            await self.db.rollback()
+            raise ServiceException(status_code=409, detail="Book with this title already exists")
+        if result.rowcount == 0:
+            await self.db.rollback()
+            raise ServiceException(status_code=409, detail="Book was renamed by another request; retry the update")
+        await self._apply_title_word_deltas(deltas)
+        await self._commit_or_conflict()
+        self._invalidate(book_id)
+        await self.db.refresh(book)
+        return book
+
+    async def delete_book(self, book_id: int):
+        """Delete a book by ID, leaving its reviews to the ON DELETE CASCADE foreign key."""
+        title = await self.db.scalar(
+            delete(Book)
+            .where(Book.id == book_id)
+            .returning(Book.title)
+            .execution_options(synchronize_session=False)
+        )
+        if title is None:
+            await self.db.rollback()
+            return False
+        await self._apply_title_word_deltas(title_word_changes(title, None))
+        await self.db.commit()
+        self._invalidate(book_id)
+        return True
@@ -0,0 +1,63 @@
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.review import Review, ReviewInfo
+from app.models.book import Book
+
+class AsyncReviewService:
+    """
+    Async counterpart of ReviewService, used by the routes mounted under /async.
+    """
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def get_reviews_by_book_id(self, book_id: int):
+        result = await self.db.scalars(select(Review).where(Review.book_id == book_id))
+        return result.all()
+
+    async def get_review_count(self, book_id: int) -> int | None:
+        """Number of reviews of a book, from its maintained counter, or None if the book does not exist."""
+        return await self.db.scalar(select(Book.review_count).where(Book.id == book_id))
+
+    async def get_reviews_page(self, book_id: int, limit: int, after: int | None = None):
+        """Up to `limit` reviews of a book ordered by ID, starting after the `after` cursor."""
+        query = select(Review).where(Review.book_id == book_id)
+        if after is not None:
+            query = query.where(Review.id > after)
+        result = await self.db.scalars(query.order_by(Review.id).limit(limit))
+        return result.all()
+
+    async def get_review_by_id(self, review_id: int):
+        return await self.db.get(Review, review_id)
+
+    async def add_review(self, book_id: int, review_data: ReviewInfo):
+        # Check if the book exists
+        if not await self.db.get(Book, book_id):
+            return None
+        # Add the review
+        new_review = Review(book_id=book_id, **review_data.model_dump())
+        self.db.add(new_review)
+        await self.db.commit()
+        await self.db.refresh(new_review)
+        return new_review
+
+    async def update_review(self, book_id: int, review_id: int, new_review_data: ReviewInfo):
+        # Check if the book exists
+        if not await self.db.get(Book, book_id):
+            return None
+        # Update the review
+        result = await self.db.scalars(select(Review).where(Review.id == review_id, Review.book_id == book_id))
+        review = result.first()
+        if not review:
+            return None
+        review.review = new_review_data.review
+        await self.db.commit()
+        return review
+
+    async def delete_review(self, book_id: int, review_id: int):
+        result = await self.db.scalars(select(Review).where(Review.id == review_id, Review.book_id == book_id))
+        review = result.first()
+        if not review:
+            return None
+        await self.db.delete(review)
+        await self.db.commit()
+        return True
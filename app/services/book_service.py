@@ -1,21 +1,264 @@
-from typing import Counter, Dict, OrderedDict
+import heapq
+import html
+from typing import Any, Counter, Dict, Iterable
+from pydantic import ValidationError
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import delete, func, insert, select, text, update
+from sqlalchemy.exc import IntegrityError, OperationalError
 from app.exceptions import ServiceException
-from app.models.book import Book, BookInfo
+from app.models.book import Book, BookInfo, BookResponse, count_title_words
+from app.models.review import Review, ReviewResponse
+from app.models.resource_version import ResourceVersion
+from app.models.title_word import TitleWord, title_words, title_word_changes, title_word_delta_statements
+
+def top_title_words(titles: Iterable[str], top_k: int) -> Dict[str, int]:
+    """
+    In-memory top-k of title words: frequency desc, then alphabetically asc.
+    A heap keeps only k candidates instead of sorting the whole vocabulary.
+    """
+    word_counter = Counter()
+    for title in titles:
+        word_counter.update(title_words(title))
+    return dict(heapq.nsmallest(top_k, word_counter.items(), key=lambda x: (-x[1], x[0])))
+
+# BM25 column weights for books_fts: a hit in the title outranks one in the author or description
+SEARCH_WEIGHTS = (10.0, 5.0, 1.0)
+# snippet() marks matches with private-use characters rather than tags, so the book text can be
+# HTML-escaped before the markers become <b></b> (see highlight_snippet)
+SNIPPET_START, SNIPPET_END = "\ue000", "\ue001"
+SEARCH_QUERY = text(f"""
+    SELECT books.id, books.title, books.author, books.year, books.description,
+           bm25(books_fts, {", ".join(map(str, SEARCH_WEIGHTS))}) AS rank,
+           snippet(books_fts, -1, '{SNIPPET_START}', '{SNIPPET_END}', '...', 12) AS snippet
+    FROM books_fts JOIN books ON books.id = books_fts.rowid
+    WHERE books_fts MATCH :match
+    ORDER BY rank
+    LIMIT :limit
+""")
+
+def highlight_snippet(snippet: str) -> str:
+    """HTML-escape a raw FTS5 snippet, then wrap its matched terms in <b></b>."""
+    return html.escape(snippet).replace(SNIPPET_START, "<b>").replace(SNIPPET_END, "</b>")
+
+def fts_match_expression(query: str) -> str:
+    """
+    Turn free text into an FTS5 query that matches books containing every word.
+    Each word is quoted, so FTS5 operators and syntax characters in user input are taken literally.
+    """
+    return " ".join('"' + word.replace('"', '""') + '"' for word in query.split())
+
+# Book columns behind BookResponse, in its field order; also the fields a client may select
+BOOK_RESPONSE_FIELDS = tuple(BookResponse.model_fields)
+
+def book_field_names(fields: Iterable[str] | None = None) -> tuple[str, ...]:
+    """
+    The BookResponse fields to select, in response order. `id` is always kept, as it is the
+    pagination cursor and the key every consumer needs; None selects all of them.
+    """
+    if fields is None:
+        return BOOK_RESPONSE_FIELDS
+    fields = set(fields)
+    unknown = fields - set(BOOK_RESPONSE_FIELDS)
+    if unknown:
+        raise ServiceException(
+            status_code=400,
+            detail=f"Unknown field(s): {', '.join(sorted(unknown))}; expected {', '.join(BOOK_RESPONSE_FIELDS)}",
+        )
+    return tuple(name for name in BOOK_RESPONSE_FIELDS if name in fields or name == "id")
+
+def book_cache_key(book_id: int) -> str:
+    return f"book:{book_id}"
+
+def book_to_dict(book: Book) -> dict:
+    """Plain column values of a book, as stored in the book cache."""
+    return {column.key: getattr(book, column.key) for column in Book.__table__.columns}
 
 class BookService:
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, cache=None):
         self.db = db
+        # Optional read-through cache for get_book (see app/services/cache_service.py)
+        self.cache = cache
 
     def get_books(self):
         """Retrieve all books."""
         return self.db.query(Book).all()
 
+    def get_books_page(self, limit: int, after: int | None = None):
+        """Retrieve up to `limit` books ordered by ID, starting after the `after` cursor."""
+        query = self.db.query(Book)
+        if after is not None:
+            query = query.filter(Book.id > after)
+        return query.order_by(Book.id).limit(limit).all()
+
+    def get_books_page_rows(self, limit: int, after: int | None = None, fields: Iterable[str] | None = None) -> list[dict]:
+        """
+        Same page as get_books_page, as plain dicts of the BookResponse columns (or just `fields`).
+        Selecting column tuples skips building an ORM object (and later a Pydantic model) for every
+        row, and leaving out unrequested columns such as description shrinks the rows read.
+        """
+        names = book_field_names(fields)
+        query = select(*(getattr(Book, name) for name in names))
+        if after is not None:
+            query = query.where(Book.id > after)
+        rows = self.db.execute(query.order_by(Book.id).limit(limit))
+        return [dict(zip(names, row)) for row in rows]
+
+    def get_books_page_including(
+        self,
+        limit: int,
+        after: int | None = None,
+        reviews_per_book: int | None = None,
+        review_count: bool = False,
+        fields: Iterable[str] | None = None,
+    ) -> list[dict]:
+        """
+        A page of books as dicts, optionally with each book's first `reviews_per_book` reviews
+        and its review_count. Costs two queries whatever the page size, instead of one lazy
+        load of Book.reviews per book.
+        """
+        names = book_field_names(fields) + (("review_count",) if review_count else ())
+        query = select(*(getattr(Book, name) for name in names))
+        if after is not None:
+            query = query.where(Book.id > after)
+        page = [dict(zip(names, row)) for row in self.db.execute(query.order_by(Book.id).limit(limit))]
+
+        if reviews_per_book is not None:
+            by_book = {}
+            for item in page:
+                item["reviews"] = by_book[item["id"]] = []
+            if page:
+                for review in self._first_reviews(list(by_book), reviews_per_book):
+                    by_book[review["book_id"]].append(review)
+        return page
+
+    def _first_reviews(self, book_ids: list[int], per_book: int) -> list[dict]:
+        """
+        The first `per_book` reviews (by ID) of each book as ReviewResponse-shaped dicts, in one
+        windowed query over ix_reviews_book_id_id.
+        """
+        ranked = (
+            select(
+                Review.id,
+                Review.review,
+                Review.book_id,
+                func.row_number().over(partition_by=Review.book_id, order_by=Review.id).label("position"),
+            )
+            .where(Review.book_id.in_(book_ids))
+            .subquery()
+        )
+        names = tuple(ReviewResponse.model_fields)
+        rows = self.db.execute(
+            select(*(ranked.c[name] for name in names))
+            .where(ranked.c.position <= per_book)
+            .order_by(ranked.c.book_id, ranked.c.id)
+        )
+        return [dict(zip(names, row)) for row in rows]
+
+    def iter_books(self, after: int | None = None, batch_size: int = 500):
+        """Yield books ordered by ID, fetching `batch_size` rows at a time from a server-side cursor."""
+        query = self.db.query(Book)
+        if after is not None:
+            query = query.filter(Book.id > after)
+        return query.order_by(Book.id).yield_per(batch_size)
+
+    def get_books_matching(self, ids: list[int] | None = None, author: str | None = None,
+                           year: int | None = None) -> list[Book]:
+        """Every book matching all of the given conditions, in one query ordered by ID."""
+        query = self.db.query(Book)
+        if ids is not None:
+            query = query.filter(Book.id.in_(ids))
+        if author is not None:
+            query = query.filter(Book.author == author)
+        if year is not None:
+            query = query.filter(Book.year == year)
+        return query.order_by(Book.id).all()
+
     def get_book(self, book_id: int):
-        """Retrieve a book by ID."""
+        """
+        Retrieve a book by ID, through the read-through cache when one is configured.
+        A cache hit returns a detached Book built from the cached columns, so it must not be
+        modified or added to the session; writes use _get_book_row instead.
+        """
+        if self.cache is None:
+            return self._get_book_row(book_id)
+
+        cached = self.cache.get(book_cache_key(book_id))
+        if cached is not None:
+            return Book(**cached)
+        book = self._get_book_row(book_id)
+        # Misses are not cached, so newly inserted books need no invalidation
+        if book is not None:
+            self.cache.set(book_cache_key(book_id), book_to_dict(book))
+        return book
+
+    def get_book_fields(self, book_id: int, fields: Iterable[str] | None = None) -> dict | None:
+        """
+        A book as a dict of `fields` (see book_field_names), or None if it does not exist.
+        A cached row is reused; otherwise only the requested columns are read.
+        """
+        names = book_field_names(fields)
+        if self.cache is not None:
+            cached = self.cache.get(book_cache_key(book_id))
+            if cached is not None:
+                return {name: cached[name] for name in names}
+        row = self.db.execute(select(*(getattr(Book, name) for name in names)).where(Book.id == book_id)).first()
+        return dict(zip(names, row)) if row is not None else None
+
+    def get_collection_version(self, name: str = "books") -> int:
+        """
+        Version of a whole collection ("books" or "reviews"), bumped by trigger on every insert,
+        update and delete.
+        """
+        return self.db.scalar(select(ResourceVersion.version).where(ResourceVersion.name == name)) or 0
+
+    def get_book_version(self, book_id: int) -> int | None:
+        """Row version of a book for its ETag, or None if the book does not exist."""
+        if self.cache is not None:
+            cached = self.cache.get(book_cache_key(book_id))
+            if cached is not None:
+                return cached["version"]
+        return self.db.scalar(select(Book.version).where(Book.id == book_id))
+
+    def search_books(self, query: str, limit: int) -> list[dict]:
+        """Full-text search over title, author and description, best BM25 match first."""
+        match = fts_match_expression(query)
+        if not match:
+            raise ServiceException(status_code=400, detail="Search query must contain at least one word")
+        try:
+            rows = self.db.execute(SEARCH_QUERY, {"match": match, "limit": limit}).mappings().all()
+        except OperationalError:
+            self.db.rollback()
+            raise ServiceException(status_code=503, detail="Search index is not available")
+        return [{**row, "snippet": highlight_snippet(row["snippet"])} for row in rows]
+
+    def _get_book_row(self, book_id: int):
+        """Retrieve the session-attached book row by ID, bypassing the cache."""
         return self.db.query(Book).filter(Book.id == book_id).first()
+
+    def _invalidate(self, *book_ids: int):
+        if self.cache is not None and book_ids:
+            self.cache.delete(*(book_cache_key(book_id) for book_id in book_ids))
     
+    def _apply_title_word_deltas(self, deltas: Counter):
+        """Update title_words within the current transaction, so it commits or rolls back with the book."""
+        for statement in title_word_delta_statements(deltas):
+            self.db.execute(statement)
+
+    @staticmethod
+    def _renamed_concurrently() -> ServiceException:
+        return ServiceException(status_code=409, detail="Book was renamed by another request; retry the update")
+
+    def _commit_or_conflict(self):
+        """
+        Commit, turning a violation of the unique lower(title) index into a 409.
+        The pre-checks are index lookups, but a concurrent writer can still win the race.
+        """
+        try:
+            self.db.commit()
+        except IntegrityError:
+            self.db.rollback()
+            raise ServiceException(status_code=409, detail="Book with this title already exists")
+
     def add_book(self, book_data: BookInfo):
         """Add a new book."""
         new_book = Book(**book_data.model_dump())
@@ -26,116 +269,218 @@ class BookService:
             raise ServiceException(status_code=409, detail="Book with this title already exists")
         
         self.db.add(new_book)
-        self.db.commit()
+        self._apply_title_word_deltas(title_words(new_book.title))
+        self._commit_or_conflict()
         self.db.refresh(new_book)
         return new_book
 
+    def add_books_bulk(self, rows: Iterable[Any], chunk_size: int = 500) -> list[dict]:
+        """
+        Import many books, returning one status dict per input row, in input order.
+
+        Rows are validated and inserted in chunks: one IN query per chunk finds title
+        conflicts, one executemany INSERT adds the rest, and each chunk is committed once.
+        """
+        results = []
+        chunk = []
+        for index, row in enumerate(rows):
+            chunk.append((index, row))
+            if len(chunk) == chunk_size:
+                results.extend(self._import_chunk(chunk))
+                chunk = []
+        if chunk:
+            results.extend(self._import_chunk(chunk))
+        return results
+
+    def _import_chunk(self, chunk: list) -> list[dict]:
+        results = {}
+        candidates = {}
+        for index, row in chunk:
+            try:
+                book_data = BookInfo.model_validate(row)
+            except ValidationError as e:
+                detail = "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+                results[index] = {"index": index, "status": "invalid", "detail": detail}
+                continue
+            # Within one import the first row with a given title wins
+            title_key = book_data.title.lower()
+            if title_key in candidates:
+                results[index] = {"index": index, "status": "conflict", "detail": "Duplicate title in import"}
+            else:
+                candidates[title_key] = (index, book_data)
+
+        if candidates:
+            existing_titles = set(self.db.scalars(
+                select(func.lower(Book.title)).where(func.lower(Book.title).in_(list(candidates)))
+            ))
+            pending = []
+            for title_key, (index, book_data) in candidates.items():
+                if title_key in existing_titles:
+                    results[index] = {"index": index, "status": "conflict", "detail": "Book with this title already exists"}
+                else:
+                    pending.append((index, book_data))
+            if pending:
+                results.update(self._insert_chunk(pending))
+
+        return [results[index] for index, _ in chunk]
+
+    def _insert_chunk(self, pending: list) -> dict:
+        deltas = Counter()
+        for _, book_data in pending:
+            deltas.update(title_words(book_data.title))
+        try:
+            new_ids = self.db.scalars(
+                insert(Book).returning(Book.id, sort_by_parameter_order=True),
+                # Core inserts bypass the Book.title validator, so the word count is set here
+                [
+                    {**book_data.model_dump(), "title_word_count": count_title_words(book_data.title)}
+                    for _, book_data in pending
+                ],
+            ).all()
+            self._apply_title_word_deltas(deltas)
+            self.db.commit()
+        except IntegrityError:
+            # A concurrent writer took one of the titles; retry row by row to isolate it
+            self.db.rollback()
+            return self._insert_rows_individually(pending)
+        return {
+            index: {"index": index, "status": "created", "id": new_id}
+            for (index, _), new_id in zip(pending, new_ids)
+        }
+
+    def _insert_rows_individually(self, pending: list) -> dict:
+        results = {}
+        for index, book_data in pending:
+            try:
+                results[index] = {"index": index, "status": "created", "id": self.add_book(book_data).id}
+            except ServiceException as e:
+                results[index] = {"index": index, "status": "conflict", "detail": e.detail}
+        return results
+
     def update_book(self, book_id: int, updated_data: BookInfo):
-        """Update an existing book."""
-        book = self.get_book(book_id)
+        """
+        Update an existing book. The UPDATE only matches while the title is still the one the
+        title_words deltas were computed from, so a concurrent rename is a 409, not drift.
+        """
+        book = self._get_book_row(book_id)
         if not book:
             return None
+        old_title = book.title
                 
         existing_book = self.db.query(Book).filter(func.lower(Book.title) == func.lower(updated_data.title)).first()
         if existing_book and existing_book.id != book_id:
             raise ServiceException(status_code=409, detail="Book with this title already exists")
         
-        for key, value in updated_data.model_dump().items():
-            setattr(book, key, value)
-        self.db.commit()
+        deltas = title_word_changes(old_title, updated_data.title)
+        values = updated_data.model_dump()
+        # Core UPDATEs bypass the ORM validator that normally keeps this column in step
+        values["title_word_count"] = count_title_words(values["title"])
+        try:
+            result = self.db.execute(
+                update(Book)
+                .where(Book.id == book_id, Book.title == old_title)
+                .values(**values)
+                .execution_options(synchronize_session=False)
+            )
+        except IntegrityError:
+            self.db.rollback()
+            raise ServiceException(status_code=409, detail="Book with this title already exists")
+        if result.rowcount == 0:
+            self.db.rollback()
+            raise self._renamed_concurrently()
+        self._apply_title_word_deltas(deltas)
+        self._commit_or_conflict()
+        self._invalidate(book_id)
         self.db.refresh(book)
         return book
 
+    def patch_book(self, book_id: int, changes: dict) -> dict | None:
+        """
+        Apply a partial update with one UPDATE ... RETURNING, or return None if the book does not exist.
+
+        There are no pre-check queries: a title clash is caught by ux_books_title_lower on the
+        UPDATE itself. Only a title change reads the row first, since title_words needs the old
+        title and SQLite's RETURNING can only report the new values. The UPDATE then only matches
+        while the title is still the one read, so a concurrent rename is a 409 instead of
+        title_words deltas computed from the wrong title.
+        """
+        if not changes:
+            return self.get_book_fields(book_id)
+        values = dict(changes)
+        deltas = None
+        condition = Book.id == book_id
+        if "title" in values:
+            old_title = self.db.scalar(select(Book.title).where(Book.id == book_id))
+            if old_title is None:
+                return None
+            # Core UPDATEs bypass the ORM validator that normally keeps this column in step
+            values["title_word_count"] = count_title_words(values["title"])
+            deltas = title_word_changes(old_title, values["title"])
+            condition = condition & (Book.title == old_title)
+
+        try:
+            row = self.db.execute(
+                update(Book)
+                .where(condition)
+                .values(**values)
+                .returning(*(getattr(Book, name) for name in BOOK_RESPONSE_FIELDS))
+                .execution_options(synchronize_session=False)
+            ).first()
+        except IntegrityError:
+            self.db.rollback()
+            raise ServiceException(status_code=409, detail="Book with this title already exists")
+        if row is None:
+            self.db.rollback()
+            if deltas is not None and self._get_book_row(book_id) is not None:
+                raise self._renamed_concurrently()
+            return None
+        if deltas:
+            self._apply_title_word_deltas(deltas)
+        self._commit_or_conflict()
+        self._invalidate(book_id)
+        return dict(zip(BOOK_RESPONSE_FIELDS, row))
+
     def delete_book(self, book_id: int):
         """Delete a book by ID."""
-        book = self.get_book(book_id)
-        if not book:
-            return False
-        self.db.delete(book)
+        return bool(self.delete_books([book_id]))
+
+    def delete_books(self, book_ids: Iterable[int]) -> list[int]:
+        """
+        Delete books with one DELETE ... RETURNING and return the IDs that existed.
+        Their reviews are removed by the ON DELETE CASCADE foreign key, never loaded into Python.
+        """
+        book_ids = list(book_ids)
+        if not book_ids:
+            return []
+        rows = self.db.execute(
+            delete(Book)
+            .where(Book.id.in_(book_ids))
+            .returning(Book.id, Book.title)
+            .execution_options(synchronize_session=False)
+        ).all()
+        if not rows:
+            self.db.rollback()
+            return []
+        deltas = Counter()
+        for _, title in rows:
+            deltas.update(title_word_changes(title, None))
+        self._apply_title_word_deltas(deltas)
         self.db.commit()
-        return True
+        deleted = [book_id for book_id, _ in rows]
+        self._invalidate(*deleted)
+        return deleted
     
     def count_longest_book_titles(self) -> int:
-        # Assume that book titles contain only alphabets and whitespaces
-        all_books = self.get_books()
-        selected_books = []
-        
-        count=0
-        longest_title = 0
-        # First pass: find the maximum word count
-        for book in all_books:
-            s = book.title
-            charcount = len(s)
-
-            count = 0
-            found = False
-            eol = len(s) - 1
-
-            for i in range(len(s)):
-                if i != eol and s[i].isalpha():
-                    found = True
-                elif (not s[i].isalpha()) and found:
-                    count += 1
-                    found = False
-                elif s[i].isalpha() and i == eol:
-                    count += 1
-            
-            print(charcount)
-            if count > longest_title:
-                longest_title = count
-
-        count1 = 0
-        # Second pass: count how many match that longest word count
-        for book in all_books:
-            s = book.title
-
-            count = 0
-            found = False
-            eol = len(s) - 1
-
-            for i in range(len(s)):
-                if i != eol and s[i].isalpha():
-                    found = True
-                elif (not s[i].isalpha()) and found:
-                    count += 1
-                    found = False
-                elif s[i].isalpha() and i == eol:
-                    count += 1
-
-            if count == longest_title:
-                count1 += 1
-
-        return count1
-
-    # def _count_words_in_title(self, title: str) -> int:
-    #     """
-    #     Private helper: returns the word count for a given title.
-    #     """
-    #     return len(title.split())
-    
-    # def _get_longest_title_length(self, books: list) -> int:
-    #     """
-    #     Private helper: determines the max word count among all titles in `books`.
-    #     """
-    #     return max((self._count_words_in_title(book.title) for book in books), default=0)
-
-    # def _count_books_with_word_count(self, books: list, word_count: int) -> int:
-    #     """
-    #     Private helper: counts how many books in `books` have the specified `word_count`.
-    #     """
-    #     return sum(1 for book in books if self._count_words_in_title(book.title) == word_count)
-
-    # def count_longest_book_titles(self) -> int:
-    #     books = self.get_books()
-    #     """
-    #     Public method:
-    #         1) Determine the word-count of the longest title.
-    #         2) Count how many books match that word-count.
-    #         3) Return that count.
-    #     """
-    #     longest_title_length = self._get_longest_title_length(books)
-    #     return self._count_books_with_word_count(books, longest_title_length)
-    
+        """
+        Count the books whose title has the highest word count, where a word is a maximal
+        run of alphabetic characters (see count_title_words). Both the MAX and the COUNT
+        are answered by the index on title_word_count instead of scanning every title.
+        """
+        longest = select(func.max(Book.title_word_count)).scalar_subquery()
+        return self.db.scalar(
+            select(func.count()).select_from(Book).where(Book.title_word_count == longest)
+        ) or 0
+
     def get_most_common_words_in_titles(self, top_k: int) -> Dict[str, int]:
         """
         Example:
@@ -155,52 +500,17 @@ class BookService:
         if top_k <= 0:
             return {}
 
-        # 2) Fetch all books
-        all_books = self.db.query(Book).all()
-
-        # 3) Build a frequency map of all words, ignoring case
-        #    We'll use a Counter from the collections module
-        word_counter = Counter()
-
-        for book in all_books:
-            # Split on whitespace, convert each word to lowercase
-            # You may want to strip punctuation or do more advanced logic as needed
-            words = book.title.lower().split()
-            word_counter.update(words)
-
-        if not word_counter:
-            # If no words found at all
-            return {}
-
-        # 4) Sort the words by:
-        #    (1) frequency (descending), 
-        #    (2) alphabetical (ascending)
-        # Counter.most_common() only sorts by frequency desc, so we need a custom sort
-        sorted_items = sorted(
-            word_counter.items(),
-            key=lambda x: (-x[1], x[0])  # -x[1] = descending freq, x[0] = alpha asc
-        )
-
-        # 5) Take the top_k items from the sorted list
-        top_items = sorted_items[:top_k]
-
-        # 6) Convert to a dict, preserving sorted order (use OrderedDict if needed)
-        returned_dict = OrderedDict(top_items)
-
-        return dict(returned_dict)
-
-
-"""
-Count the number of books in the database having the longest title length.
-A title is a sequence of words separated by whitespace.
-The length is the number of words in the title.
-"""
-def count_longest_book_titles(self) -> int:
-    # Fetch all books
-    books = self.get_books()# 
+        # 2) Read the top k from title_words, which add/update/delete_book maintain;
+        #    ix_title_words_count_word returns rows already in (count desc, word asc) order
+        try:
+            rows = self.db.execute(
+                select(TitleWord.word, TitleWord.count)
+                .order_by(TitleWord.count.desc(), TitleWord.word.asc())
+                .limit(top_k)
+            ).all()
+        except OperationalError:
+            # 3) Database not migrated yet: count the titles in memory instead
+            self.db.rollback()
+            return top_title_words(self.db.scalars(select(Book.title)), top_k)
 
-    # get the longest title length
-    longest_title_length = 0
-    for book in books:
-        title_length = len(book.title.split())
-        longest_title_length = max(longest_title_length, title_length)
+        return {word: count for word, count in rows}
@@ -0,0 +1,162 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+import redis
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# "memory" (per process), "redis" (shared by all uvicorn workers) or "none"
+BOOK_CACHE_BACKEND = os.getenv("BOOK_CACHE_BACKEND", "memory")
+BOOK_CACHE_REDIS_URL = os.getenv("BOOK_CACHE_REDIS_URL", "redis://localhost:6379/0")
+BOOK_CACHE_MAX_SIZE = int(os.getenv("BOOK_CACHE_MAX_SIZE", "10000"))
+BOOK_CACHE_TTL_SECONDS = int(os.getenv("BOOK_CACHE_TTL_SECONDS", "60"))
+
+
+class InMemoryCache:
+    """
+    Bounded LRU cache with a per-entry TTL, local to one process.
+
+    Other workers do not see its invalidations, so the TTL bounds how stale a row can get
+    when several uvicorn workers run; use RedisCache when that matters.
+    """
+
+    def __init__(self, max_size: int = BOOK_CACHE_MAX_SIZE, ttl_seconds: int = BOOK_CACHE_TTL_SECONDS):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: str, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, *keys: str):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        return {
+            "backend": "memory",
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class RedisCache:
+    """
+    Cache shared by every uvicorn worker, stored in Redis as JSON with a TTL.
+
+    Size bounds and LRU eviction are left to the server (maxmemory / allkeys-lru), so
+    evictions are read from Redis itself; hits and misses are counted per process.
+    Redis being unreachable is counted as an error and otherwise ignored: reads miss and
+    writes are skipped, so requests fall back to the database.
+    """
+
+    def __init__(self, url: str = BOOK_CACHE_REDIS_URL, ttl_seconds: int = BOOK_CACHE_TTL_SECONDS,
+                 prefix: str = "book-api:"):
+        self.client = redis.Redis.from_url(url)
+        self.ttl_seconds = ttl_seconds
+        self.prefix = prefix
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def _failed(self, operation: str, error: redis.RedisError):
+        self.errors += 1
+        logger.warning(f"Book cache {operation} failed, using the database: {error}")
+
+    def get(self, key: str):
+        try:
+            raw = self.client.get(self.prefix + key)
+        except redis.RedisError as e:
+            self._failed("get", e)
+            raw = None
+        if raw is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(raw)
+
+    def set(self, key: str, value):
+        try:
+            self.client.set(self.prefix + key, json.dumps(value), ex=self.ttl_seconds)
+        except redis.RedisError as e:
+            self._failed("set", e)
+
+    def delete(self, *keys: str):
+        if not keys:
+            return
+        try:
+            self.client.delete(*(self.prefix + key for key in keys))
+        except redis.RedisError as e:
+            # The entries now outlive the write by up to the TTL, as with the memory backend
+            self._failed("delete", e)
+
+    def clear(self):
+        try:
+            keys = list(self.client.scan_iter(match=self.prefix + "*"))
+            if keys:
+                self.client.delete(*keys)
+        except redis.RedisError as e:
+            self._failed("clear", e)
+
+    def stats(self) -> dict:
+        try:
+            evictions = self.client.info("stats").get("evicted_keys", 0)
+        except redis.RedisError:
+            evictions = None
+        return {
+            "backend": "redis",
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "evictions": evictions,
+        }
+
+
+def create_book_cache():
+    """
+    Build the book cache selected by BOOK_CACHE_BACKEND, or None when caching is disabled.
+    """
+    if BOOK_CACHE_BACKEND == "redis":
+        return RedisCache()
+    if BOOK_CACHE_BACKEND == "memory":
+        return InMemoryCache()
+    return None
+
+
+# Process-wide cache shared by every BookService
+book_cache = create_book_cache()
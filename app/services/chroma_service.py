@@ -1,12 +1,37 @@
 import chromadb
 import chromadb.utils.embedding_functions as embedding_functions
-from typing import List
+from typing import AsyncIterator, List
+import anyio
+import hashlib
+import json
 import openai
 import os
 from dotenv import load_dotenv
+from fastapi.concurrency import run_in_threadpool
+from app.services.single_flight import SingleFlight, StreamFlight
 
 load_dotenv()
 
+# Process-wide, so identical concurrent searches and summaries share one embedding / chat call
+chroma_flights = SingleFlight()
+chroma_stream_flights = StreamFlight()
+
+def normalize_query(query: str) -> str:
+    """
+    Surrounding and repeated whitespace does not change what a search means, so it does not split
+    coalescing keys. The normalized text is also what is searched and summarized, so coalesced
+    callers all get the answer to the same question. Case is kept: the embedding can differ with
+    it, and /chroma/similarities searches the text as given.
+    """
+    return " ".join(query.split())
+
+def query_key(query: str) -> str:
+    """
+    Coalescing-key part for a user query: a hash of its normalized text, since the keys are
+    reported by the unauthenticated /metrics endpoint.
+    """
+    return hashlib.sha256(normalize_query(query).encode("utf-8")).hexdigest()[:16]
+
 class ChromaService:
     def __init__(self):
         # Initialize ChromaDB Persistent Client
@@ -61,30 +86,77 @@ class ChromaService:
 
         return filtered_results
 
-    def generate_natural_language_response(self, query: str, search_results: List[dict]) -> str:
+    async def search_books_shared(self, query: str, distance_threshold: float = 0.8) -> List[dict]:
+        """
+        search_books run in the threadpool, with identical concurrent searches sharing one query
+        (and one embedding call).
+        """
+        # Coalesced callers share the result, so the search runs on the normalized text they all match
+        query = normalize_query(query)
+        return await chroma_flights.do(
+            f"search:{distance_threshold}:{query_key(query)}",
+            lambda: run_in_threadpool(self.search_books, query, distance_threshold=distance_threshold))
+
+    async def generate_natural_language_response(self, query: str, search_results: List[dict],
+                                                 client: openai.AsyncOpenAI) -> str:
         """
-        Use GPT-4o-mini-2024-07-18 to generate a concise natural language summary of the search results.
+        Use GPT-4o-mini-2024-07-18 to generate a concise natural language summary of the search results,
+        through the shared AsyncOpenAI `client`.
         """
         if not search_results:
             return f"No similar books found for the query: '{query}'."
 
+        # Concurrent callers with the same query and results share one completion
+        return await chroma_flights.do(self._summary_key(query, search_results),
+                                       lambda: self._summarize(query, search_results, client))
+
+    @staticmethod
+    def _summary_key(query: str, search_results: List[dict]) -> str:
+        results_hash = hashlib.sha256(json.dumps(search_results, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+        return f"summary:{query_key(query)}:{results_hash}"
+
+    async def _summarize(self, query: str, search_results: List[dict], client: openai.AsyncOpenAI) -> str:
+        response = await client.chat.completions.create(**self._summary_options(query, search_results))
+        return response.choices[0].message.content
+
+    def stream_natural_language_response(self, query: str, search_results: List[dict],
+                                         client: openai.AsyncOpenAI) -> AsyncIterator[str]:
+        """
+        Same summary as generate_natural_language_response, yielded piece by piece as OpenAI streams it.
+        Concurrent streams of the same summary follow one generation; once every reader has closed
+        its generator, the upstream response is closed, which stops the generation.
+        """
+        return chroma_stream_flights.subscribe(self._summary_key(query, search_results),
+                                               lambda: self._stream_summary(query, search_results, client))
+
+    async def _stream_summary(self, query: str, search_results: List[dict],
+                              client: openai.AsyncOpenAI) -> AsyncIterator[str]:
+        stream = await client.chat.completions.create(**self._summary_options(query, search_results), stream=True)
+        try:
+            async for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    yield delta
+        finally:
+            with anyio.CancelScope(shield=True):
+                await stream.close()
+
+    def _summary_options(self, query: str, search_results: List[dict]) -> dict:
+        # The summary is shared by every caller whose query normalizes the same (see _summary_key),
+        # so the model gets that normalized text rather than whichever caller came first
+        query = normalize_query(query)
         # Construct a concise OpenAI prompt
         prompt = (
             f"Summarize the following books based on the query '{query}'. Include the number of books found and a brief description of each:\n\n"
             f"{search_results}\n\n"
             "Generate a concise summary."
         )
-
-        # Call OpenAI API
-        openai.api_key = os.getenv("OPENAI_API_KEY")
-        client = openai.Client()
-        response = client.chat.completions.create(
-            model="gpt-4o-mini-2024-07-18",
-            messages=[
+        return {
+            "model": "gpt-4o-mini-2024-07-18",
+            "messages": [
                 {"role": "system", "content": "You are an assistant whose job is to summarize book search results."},
                 {"role": "user", "content": prompt},
             ],
-            max_tokens=150,  # Reduce max tokens for a concise response
-            temperature=0.2  # Low temperature for deterministic results
-        )
-        return response.choices[0].message.content
\ No newline at end of file
+            "max_tokens": 150,  # Reduce max tokens for a concise response
+            "temperature": 0.2,  # Low temperature for deterministic results
+        }
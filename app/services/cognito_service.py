@@ -1,9 +1,14 @@
 import os
+import logging
+import threading
+import time
+from functools import lru_cache
 from jose import jwt
 import boto3
 import hmac
 import hashlib
 import base64
+from collections import OrderedDict
 from fastapi import Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 import requests
@@ -12,11 +17,159 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
 
 CognitoUserRole = os.getenv("COGNITO_USER_ROLE", "Users")
 CognitoAdminRole = os.getenv("COGNITO_ADMIN_ROLE", "Admins")
 bearer_scheme = HTTPBearer(auto_error=False)
 
+# How long fetched signing keys are trusted before a background refresh is started
+JWKS_TTL_SECONDS = int(os.getenv("COGNITO_JWKS_TTL_SECONDS", "3600"))
+# Minimum age of the key set before an unknown "kid" may trigger another fetch
+JWKS_MIN_REFETCH_SECONDS = int(os.getenv("COGNITO_JWKS_MIN_REFETCH_SECONDS", "30"))
+# Maximum number of verified bearer tokens kept in memory
+TOKEN_CACHE_MAX_SIZE = int(os.getenv("COGNITO_TOKEN_CACHE_SIZE", "10000"))
+
+
+class JwksCache:
+    """
+    Process-wide store of Cognito signing keys indexed by "kid".
+
+    The key set is fetched once and served from memory. After the TTL the stale keys
+    keep being served while a background thread refreshes them, so request latency
+    never waits on AWS. An unknown "kid" (key rotation) forces a synchronous refetch,
+    at most once per JWKS_MIN_REFETCH_SECONDS so forged tokens cannot hammer the endpoint.
+    """
+
+    def __init__(self, jwks_url: str, ttl_seconds: int = JWKS_TTL_SECONDS,
+                 min_refetch_seconds: int = JWKS_MIN_REFETCH_SECONDS):
+        self.jwks_url = jwks_url
+        self.ttl_seconds = ttl_seconds
+        self.min_refetch_seconds = min_refetch_seconds
+        # Incremented every time the fetched key set differs from the previous one
+        self.version = 0
+        self._keys = {}
+        self._fetched_at = 0.0
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+    def get_key(self, kid: str):
+        """
+        Return the JWK for the given "kid", or None if Cognito does not know it.
+        """
+        if not self._keys:
+            # First use: nothing to serve yet, so this fetch has to block
+            self.refresh(min_age=self.ttl_seconds)
+        elif time.monotonic() - self._fetched_at >= self.ttl_seconds:
+            self._refresh_in_background()
+
+        key = self._keys.get(kid)
+        if key is None:
+            self.refresh(min_age=self.min_refetch_seconds)
+            key = self._keys.get(kid)
+        return key
+
+    def refresh(self, min_age: float = 0):
+        """
+        Fetch the key set unless it was fetched less than `min_age` seconds ago.
+        Concurrent callers wait on the lock and then reuse the result of the first fetch.
+        """
+        with self._lock:
+            if self._keys and time.monotonic() - self._fetched_at < min_age:
+                return
+            response = requests.get(self.jwks_url, timeout=5)
+            if response.status_code != 200:
+                raise ServiceException(status_code=500, detail="Unable to fetch JWKS for token validation.")
+            keys = {k["kid"]: k for k in response.json()["keys"]}
+            if keys != self._keys:
+                self.version += 1
+            self._keys = keys
+            self._fetched_at = time.monotonic()
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._background_refresh, daemon=True).start()
+
+    def _background_refresh(self):
+        try:
+            self.refresh(min_age=self.ttl_seconds)
+        except Exception as e:
+            # Keep serving the stale keys; the next request past the TTL retries
+            logger.warning(f"Background JWKS refresh failed: {str(e)}")
+        finally:
+            self._refreshing = False
+
+
+class TokenCache:
+    """
+    Bounded LRU of verified token claims, keyed by a SHA-256 digest of the bearer token.
+
+    An entry lives until the token's own "exp", and the whole cache is flushed when the
+    JWKS version changes, so a repeat token skips the RS256 verification but a rotated
+    or expired one is always verified again.
+    """
+
+    def __init__(self, max_size: int = TOKEN_CACHE_MAX_SIZE):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._jwks_version = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _digest(token: str) -> str:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def get(self, token: str, jwks_version: int):
+        """
+        Return the cached claims for the token, or None on a miss.
+        """
+        digest = self._digest(token)
+        with self._lock:
+            self._flush_if_rotated(jwks_version)
+            entry = self._entries.get(digest)
+            if entry is None or entry[0] <= time.time():
+                if entry is not None:
+                    del self._entries[digest]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(digest)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, token: str, claims: dict, jwks_version: int):
+        """
+        Cache verified claims until the token expires. Tokens without "exp" are not cached.
+        """
+        expires_at = claims.get("exp")
+        if not expires_at:
+            return
+        digest = self._digest(token)
+        with self._lock:
+            self._flush_if_rotated(jwks_version)
+            self._entries[digest] = (expires_at, claims)
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    def _flush_if_rotated(self, jwks_version: int):
+        if jwks_version != self._jwks_version:
+            self._entries.clear()
+            self._jwks_version = jwks_version
+
+
 class CognitoService:
     def __init__(self):
         self.region = os.getenv("COGNITO_REGION")
@@ -26,20 +179,20 @@ class CognitoService:
 
         # JSON Web Key Set (JWKS) is a collection of public cryptographic keys used to verify JSON Web Tokens
         self.jwks_url = f"https://cognito-idp.{self.region}.amazonaws.com/{self.user_pool_id}/.well-known/jwks.json"
-        self.jwks_keys = self._get_cognito_jwks()
+        # Keys are fetched lazily on the first token validation, not at construction
+        self.jwks = JwksCache(self.jwks_url)
+        self.token_cache = TokenCache()
         self.bearer = bearer_scheme
+        self._client = None
 
-        # Initialize Boto3 Cognito client
-        self.client = boto3.client("cognito-idp", region_name=self.region)
-
-    def _get_cognito_jwks(self):
+    @property
+    def client(self):
         """
-        Retrieve JWKS (JSON Web Key Set) for token validation from AWS Cognito.
+        Boto3 Cognito client, created on first use and reused afterwards.
         """
-        response = requests.get(self.jwks_url)
-        if response.status_code != 200:
-            raise ServiceException(status_code=500, detail="Unable to fetch JWKS for token validation.")
-        return response.json()["keys"]
+        if self._client is None:
+            self._client = boto3.client("cognito-idp", region_name=self.region)
+        return self._client
 
     def validate_token(self, auth: HTTPAuthorizationCredentials):
         """
@@ -48,14 +201,19 @@ class CognitoService:
         :param credentials: HTTPAuthorizationCredentials (token from the Authorization header).
         :return: The decoded token payload.
         """
+        token = auth.credentials
+        # Repeat tokens are answered from memory without verifying the signature again
+        claims = self.token_cache.get(token, self.jwks.version)
+        if claims is not None:
+            return claims
+
         try:
             # Decode token using Cognito's JWKS
-            token = auth.credentials
             headers = jwt.get_unverified_header(token)
             
             # Finding a specific JSON Web Key (JWK) from a JWKS using the "kid" (Key ID) parameter
             kid = headers.get("kid")
-            key = next((k for k in self.jwks_keys if k["kid"] == kid), None)
+            key = self.jwks.get_key(kid)
             if not key:
                 raise ServiceException(status_code=401, detail="Invalid token signature.")
             
@@ -66,6 +224,7 @@ class CognitoService:
                 audience=self.client_id,
                 issuer=f"https://cognito-idp.{self.region}.amazonaws.com/{self.user_pool_id}",
             )
+            self.token_cache.put(token, payload, self.jwks.version)
             return payload
         except jwt.ExpiredSignatureError:
             raise ServiceException(status_code=401, detail="Token has expired.")
@@ -186,12 +345,19 @@ class CognitoService:
         except Exception as e:
             raise ServiceException(status_code=500, detail=f"Confirmation failed: {str(e)}")
 
+@lru_cache(maxsize=1)
+def get_cognito_service() -> CognitoService:
+    """
+    Return the process-wide CognitoService, so its JWKS cache and boto3 client are shared.
+    """
+    return CognitoService()
+
 class RoleChecker:
     def __init__(self, allowed_role: str):
         self.allowed_role = allowed_role
 
     def __call__(self, auth: HTTPAuthorizationCredentials = Depends(bearer_scheme), 
-                 cognito_service: CognitoService = Depends(CognitoService)):
+                 cognito_service: CognitoService = Depends(get_cognito_service)):
         # Validate the token and check the user's role
         if not auth:
             raise ServiceException(status_code=401, detail="Not authenticated")
@@ -0,0 +1,314 @@
+import asyncio
+import logging
+import os
+import random
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+import openai
+from dotenv import load_dotenv
+from fastapi.concurrency import run_in_threadpool
+from app.db.db import SessionLocal
+from app.models.book import Book
+from app.models.book_introduction import IntroductionBatchRequest
+from app.services.book_service import BookService
+from app.services.introduction_service import IntroductionService
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Account limits for the introduction model; every batch job shares one budget
+INTRODUCTION_BATCH_RPM = int(os.getenv("INTRODUCTION_BATCH_RPM", "500"))
+INTRODUCTION_BATCH_TPM = int(os.getenv("INTRODUCTION_BATCH_TPM", "200000"))
+# OpenAI calls in flight per job
+INTRODUCTION_BATCH_CONCURRENCY = int(os.getenv("INTRODUCTION_BATCH_CONCURRENCY", "8"))
+# Generated introductions are written once this many are waiting
+INTRODUCTION_BATCH_WRITE_SIZE = int(os.getenv("INTRODUCTION_BATCH_WRITE_SIZE", "50"))
+INTRODUCTION_BATCH_MAX_ATTEMPTS = int(os.getenv("INTRODUCTION_BATCH_MAX_ATTEMPTS", "5"))
+INTRODUCTION_BATCH_BACKOFF_SECONDS = float(os.getenv("INTRODUCTION_BATCH_BACKOFF_SECONDS", "1"))
+INTRODUCTION_BATCH_MAX_BACKOFF_SECONDS = float(os.getenv("INTRODUCTION_BATCH_MAX_BACKOFF_SECONDS", "60"))
+# Finished jobs kept for the status endpoint, oldest dropped first
+INTRODUCTION_BATCH_KEEP_JOBS = int(os.getenv("INTRODUCTION_BATCH_KEEP_JOBS", "100"))
+# Per-book failures reported in a job's status
+MAX_REPORTED_ERRORS = 20
+
+
+def estimate_tokens(options: dict) -> int:
+    """
+    Tokens a chat completion counts against the TPM limit: OpenAI reserves the prompt (about four
+    characters per token) plus the full max_completion_tokens when the request is accepted.
+    """
+    prompt_chars = sum(len(message["content"]) for message in options["messages"])
+    completion_tokens = options.get("max_completion_tokens") or options.get("max_tokens") or 0
+    return prompt_chars // 4 + completion_tokens
+
+
+class TokenBucket:
+    """`per_minute` units, refilled continuously; starts full so a burst of one minute's budget goes out at once."""
+
+    def __init__(self, per_minute: float, clock=time.monotonic):
+        self.capacity = per_minute
+        self.rate = per_minute / 60
+        self.clock = clock
+        self.available = per_minute
+        self.updated = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.available = min(self.capacity, self.available + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` units are available; a request larger than the bucket waits for a full one."""
+        self._refill()
+        missing = min(amount, self.capacity) - self.available
+        return max(missing, 0) / self.rate
+
+    def take(self, amount: float):
+        self._refill()
+        self.available -= min(amount, self.capacity)
+
+
+class RateLimiter:
+    """
+    Requests-per-minute and tokens-per-minute buckets in front of the OpenAI API.
+
+    Callers are served one at a time in arrival order, so a large request is not starved by
+    smaller ones. pause() holds everyone back after a 429, since the server's view of the
+    budget is what counts.
+    """
+
+    def __init__(self, rpm: int = INTRODUCTION_BATCH_RPM, tpm: int = INTRODUCTION_BATCH_TPM, clock=time.monotonic):
+        self.requests = TokenBucket(rpm, clock)
+        self.tokens = TokenBucket(tpm, clock)
+        self.clock = clock
+        self.paused_until = 0.0
+        self.waited_seconds = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, tokens: int):
+        async with self._lock:
+            while True:
+                wait = max(
+                    self.paused_until - self.clock(),
+                    self.requests.wait_time(1),
+                    self.tokens.wait_time(tokens),
+                )
+                if wait <= 0:
+                    self.requests.take(1)
+                    self.tokens.take(tokens)
+                    return
+                self.waited_seconds += wait
+                await asyncio.sleep(wait)
+
+    def pause(self, seconds: float):
+        self.paused_until = max(self.paused_until, self.clock() + seconds)
+
+    def stats(self) -> dict:
+        return {
+            "requests_available": int(self.requests.available),
+            "tokens_available": int(self.tokens.available),
+            "waited_seconds": round(self.waited_seconds, 3),
+        }
+
+
+def retry_delay(error: openai.RateLimitError, attempt: int,
+                base: float = INTRODUCTION_BATCH_BACKOFF_SECONDS,
+                maximum: float = INTRODUCTION_BATCH_MAX_BACKOFF_SECONDS) -> float:
+    """The server's retry-after when it sent one, otherwise exponential backoff with full jitter."""
+    headers = error.response.headers if error.response is not None else {}
+    for header, scale in (("retry-after-ms", 1000), ("retry-after", 1)):
+        try:
+            return min(float(headers[header]) / scale, maximum)
+        except (KeyError, ValueError):
+            continue
+    return random.uniform(0, min(base * 2 ** attempt, maximum))
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class IntroductionBatchJob:
+    """Progress of one batch, as reported by the job-status endpoint."""
+
+    def __init__(self):
+        self.job_id = uuid.uuid4().hex
+        self.status = "queued"
+        self.total = 0
+        self.generated = 0
+        self.stored = 0
+        self.skipped = 0
+        self.failed = 0
+        self.not_found: list[int] = []
+        self.errors: dict[int, str] = {}
+        self.error: str | None = None
+        self.created_at = _utcnow()
+        self.finished_at: datetime | None = None
+        self.task: asyncio.Task | None = None
+
+    def finish(self, status: str, error: str | None = None):
+        self.status = status
+        self.error = error
+        self.finished_at = _utcnow()
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "total": self.total,
+            "generated": self.generated,
+            "stored": self.stored,
+            "skipped": self.skipped,
+            "failed": self.failed,
+            "pending": self.total - self.generated - self.skipped - self.failed,
+            "not_found": self.not_found,
+            "errors": self.errors,
+            "error": self.error,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class IntroductionBatchRunner:
+    """
+    Runs introduction batch jobs in the background of the server process.
+
+    A job loads its books in one query, skips those already stored, and fans the rest out to
+    `concurrency` workers. Each call first takes its request and estimated tokens from the
+    shared RateLimiter; a 429 pauses the limiter and is retried with backoff, so retries are
+    scheduled here rather than by the client. Results are written `write_size` at a time with
+    IntroductionService.store_many. Jobs live in memory: a restart cancels them, and the
+    introductions already stored stay stored.
+    """
+
+    def __init__(
+        self,
+        client: openai.AsyncOpenAI,
+        session_factory=SessionLocal,
+        limiter: RateLimiter | None = None,
+        concurrency: int = INTRODUCTION_BATCH_CONCURRENCY,
+        write_size: int = INTRODUCTION_BATCH_WRITE_SIZE,
+        max_attempts: int = INTRODUCTION_BATCH_MAX_ATTEMPTS,
+        keep_jobs: int = INTRODUCTION_BATCH_KEEP_JOBS,
+    ):
+        self.client = client.with_options(max_retries=0)
+        self.session_factory = session_factory
+        self.limiter = limiter or RateLimiter()
+        self.concurrency = concurrency
+        self.write_size = write_size
+        self.max_attempts = max_attempts
+        self.keep_jobs = keep_jobs
+        self.jobs: OrderedDict[str, IntroductionBatchJob] = OrderedDict()
+
+    def submit(self, batch: IntroductionBatchRequest) -> IntroductionBatchJob:
+        job = IntroductionBatchJob()
+        self.jobs[job.job_id] = job
+        self._forget_finished_jobs()
+        job.task = asyncio.create_task(self._run(job, batch))
+        return job
+
+    def get(self, job_id: str) -> IntroductionBatchJob | None:
+        return self.jobs.get(job_id)
+
+    async def stop(self):
+        """Cancel the running jobs; what they already stored stays stored."""
+        tasks = [job.task for job in self.jobs.values() if job.task is not None and not job.task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "running": sum(1 for job in self.jobs.values() if job.status in ("queued", "running")),
+            "limiter": self.limiter.stats(),
+        }
+
+    def _forget_finished_jobs(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job.finished_at is not None]
+        for job_id in finished[:max(len(self.jobs) - self.keep_jobs, 0)]:
+            del self.jobs[job_id]
+
+    async def _run(self, job: IntroductionBatchJob, batch: IntroductionBatchRequest):
+        db = self.session_factory()
+        service = IntroductionService(db, self.client)
+        try:
+            job.status = "running"
+            books = await run_in_threadpool(self._load, db, service, job, batch)
+            await self._generate_all(service, job, books)
+            job.finish("completed")
+        except asyncio.CancelledError:
+            job.finish("cancelled")
+            raise
+        except Exception as e:
+            logger.error(f"Introduction batch {job.job_id} failed: {e}")
+            job.finish("failed", str(e))
+        finally:
+            await run_in_threadpool(db.close)
+
+    def _load(self, db, service: IntroductionService, job: IntroductionBatchJob,
+              batch: IntroductionBatchRequest) -> list[Book]:
+        books = BookService(db).get_books_matching(batch.book_ids, batch.author, batch.year)
+        if batch.book_ids is not None:
+            found = {book.id for book in books}
+            job.not_found = sorted(set(batch.book_ids) - found)
+        job.total = len(books)
+        if batch.missing_only and books:
+            cached = service.cached_keys([service.cache_key(book) for book in books])
+            books = [book for book in books if service.cache_key(book) not in cached]
+            job.skipped = job.total - len(books)
+        # Detached, so the commits of store_many do not expire them while the workers read them
+        db.expunge_all()
+        return books
+
+    async def _generate_all(self, service: IntroductionService, job: IntroductionBatchJob, books: list[Book]):
+        todo = iter(books)
+        pending: list[tuple[Book, str]] = []
+        write_lock = asyncio.Lock()
+
+        async def flush(force: bool = False):
+            async with write_lock:
+                if not pending or (len(pending) < self.write_size and not force):
+                    return
+                introductions = pending[:]
+                pending.clear()
+                job.stored += await run_in_threadpool(service.store_many, introductions)
+
+        async def worker():
+            # Workers share one iterator, so each book is taken exactly once
+            for book in todo:
+                try:
+                    introduction = await self._generate(service, book)
+                except Exception as e:
+                    job.failed += 1
+                    if len(job.errors) < MAX_REPORTED_ERRORS:
+                        job.errors[book.id] = str(e)
+                    continue
+                job.generated += 1
+                pending.append((book, introduction))
+                await flush()
+
+        # A worker that fails (a write, not a per-book call) cancels the others, so none of them
+        # keeps using the session after _run has closed it
+        try:
+            async with asyncio.TaskGroup() as workers:
+                for _ in range(min(self.concurrency, len(books))):
+                    workers.create_task(worker())
+        except ExceptionGroup as group:
+            raise group.exceptions[0]
+        await flush(force=True)
+
+    async def _generate(self, service: IntroductionService, book: Book) -> str:
+        tokens = estimate_tokens(service.completion_options(book))
+        for attempt in range(self.max_attempts):
+            await self.limiter.acquire(tokens)
+            try:
+                return await service.generate(book)
+            except openai.RateLimitError as e:
+                if attempt == self.max_attempts - 1:
+                    raise
+                delay = retry_delay(e, attempt)
+                logger.warning(f"Rate limited generating book {book.id}; retrying in {delay:.2f}s")
+                self.limiter.pause(delay)
@@ -0,0 +1,197 @@
+import hashlib
+import json
+from typing import AsyncIterator
+import anyio
+import openai
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.orm import Session
+from app.models.book import Book
+from app.models.book_introduction import BookIntroduction
+from app.services.single_flight import SingleFlight, StreamFlight
+
+INTRODUCTION_MODEL = "gpt-4o-mini"
+# Bump whenever introduction_messages changes, so introductions from the old prompt stop matching
+INTRODUCTION_PROMPT_VERSION = "1"
+
+# Process-wide, so concurrent misses for the same introduction share one OpenAI call
+introduction_flights = SingleFlight()
+# Same for streamed misses: concurrent stream=true requests follow one generation
+introduction_stream_flights = StreamFlight()
+
+def introduction_messages(book: Book) -> list[dict]:
+    prompt = (
+        f"Introduce the book '{book.title}' by {book.author}, published in {book.year}. "
+        f"Here is the description: {book.description or 'No description available'}."
+    )
+    return [
+        {"role": "system", "content": "You are a book reviewer."},
+        {"role": "user", "content": prompt},
+    ]
+
+def introduction_cache_key(book: Book, model: str = INTRODUCTION_MODEL,
+                           prompt_version: str = INTRODUCTION_PROMPT_VERSION) -> str:
+    """Hash of everything that determines an introduction: the book content, the model and the prompt."""
+    content = json.dumps([book.title, book.author, book.year, book.description, model, prompt_version])
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+def is_missing_table(error: OperationalError) -> bool:
+    """
+    Only an unmigrated book_introductions table reads as an empty cache. Any other error
+    ("database is locked", I/O) would otherwise turn into a paid generation and a wrong Cache-Status.
+    """
+    return "no such table" in str(error.orig)
+
+class IntroductionService:
+    """
+    Book introductions from the OpenAI chat API, persisted in book_introductions so each
+    (book content, model, prompt version) is only generated once.
+
+    `client` is the shared AsyncOpenAI client; the database work runs in the threadpool, since
+    the session is synchronous.
+    """
+    def __init__(self, db: Session, client: openai.AsyncOpenAI, model: str = INTRODUCTION_MODEL,
+                 prompt_version: str = INTRODUCTION_PROMPT_VERSION):
+        self.db = db
+        self.client = client
+        self.model = model
+        self.prompt_version = prompt_version
+
+    def cache_key(self, book: Book) -> str:
+        return introduction_cache_key(book, self.model, self.prompt_version)
+
+    def get_cached(self, book: Book) -> str | None:
+        try:
+            return self.db.scalar(
+                select(BookIntroduction.introduction).where(BookIntroduction.cache_key == self.cache_key(book))
+            )
+        except OperationalError as e:
+            # Table not migrated yet: behave as an empty cache
+            self.db.rollback()
+            if not is_missing_table(e):
+                raise
+            return None
+
+    def cached_keys(self, keys: list[str]) -> set[str]:
+        """Which of `keys` already have a stored introduction."""
+        try:
+            return set(self.db.scalars(select(BookIntroduction.cache_key).where(BookIntroduction.cache_key.in_(keys))))
+        except OperationalError as e:
+            self.db.rollback()
+            if not is_missing_table(e):
+                raise
+            return set()
+
+    def store(self, book: Book, introduction: str):
+        """Persist a generated introduction; losing a race with another writer or a book delete is harmless."""
+        try:
+            self.db.execute(
+                sqlite_insert(BookIntroduction)
+                .values(
+                    cache_key=self.cache_key(book),
+                    book_id=book.id,
+                    model=self.model,
+                    prompt_version=self.prompt_version,
+                    introduction=introduction,
+                )
+                .on_conflict_do_nothing(index_elements=[BookIntroduction.cache_key])
+            )
+            self.db.commit()
+        except (IntegrityError, OperationalError):
+            self.db.rollback()
+
+    def completion_options(self, book: Book) -> dict:
+        return {
+            "model": self.model,
+            "messages": introduction_messages(book),
+            "temperature": 1,
+            "max_completion_tokens": 2048,
+            "top_p": 1,
+            "frequency_penalty": 0,
+            "presence_penalty": 0,
+        }
+
+    def store_many(self, introductions: list[tuple[Book, str]]) -> int:
+        """
+        Persist many generated introductions in one transaction and return how many rows were written.
+        An introduction already stored under the same key is replaced, since the batch job only
+        generates one again when asked to (missing_only=False). If a book was deleted meanwhile the
+        whole statement fails on its foreign key, so the rows are then written one by one and the
+        orphan is dropped.
+        """
+        if not introductions:
+            return 0
+        rows = [
+            {
+                "cache_key": self.cache_key(book),
+                "book_id": book.id,
+                "model": self.model,
+                "prompt_version": self.prompt_version,
+                "introduction": introduction,
+            }
+            for book, introduction in introductions
+        ]
+        statement = sqlite_insert(BookIntroduction)
+        statement = statement.on_conflict_do_update(
+            index_elements=[BookIntroduction.cache_key],
+            set_={"introduction": statement.excluded.introduction, "created_at": func.now()},
+        )
+        # Core execution on the session's connection, as the ORM result of a bulk insert has no rowcount
+        try:
+            written = self.db.connection().execute(statement, rows).rowcount
+            self.db.commit()
+            return written
+        except IntegrityError:
+            self.db.rollback()
+        written = 0
+        for row in rows:
+            try:
+                written += self.db.connection().execute(statement, row).rowcount
+                self.db.commit()
+            except IntegrityError:
+                self.db.rollback()
+        return written
+
+    async def generate(self, book: Book) -> str:
+        completion = await self.client.chat.completions.create(**self.completion_options(book))
+        return completion.choices[0].message.content
+
+    def shared_stream(self, book: Book) -> AsyncIterator[str]:
+        """generate_stream, shared by every concurrent streaming request for the same introduction."""
+        return introduction_stream_flights.subscribe(self.cache_key(book), lambda: self.generate_stream(book))
+
+    async def generate_stream(self, book: Book) -> AsyncIterator[str]:
+        """
+        Yield the introduction as the API streams it, and store it once the stream completes.
+
+        Closing this generator early (the client went away) closes the upstream response, which
+        stops the generation; the partial introduction is not stored.
+        """
+        stream = await self.client.chat.completions.create(**self.completion_options(book), stream=True)
+        parts = []
+        try:
+            async for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    parts.append(delta)
+                    yield delta
+        finally:
+            # Shielded so the upstream connection is released even when the request task is cancelled
+            with anyio.CancelScope(shield=True):
+                await stream.close()
+        await run_in_threadpool(self.store, book, "".join(parts))
+
+    async def introduce(self, book: Book) -> tuple[str, bool]:
+        """The introduction of `book` and whether it came from the cache."""
+        cached = await run_in_threadpool(self.get_cached, book)
+        if cached is not None:
+            return cached, True
+        introduction = await introduction_flights.do(self.cache_key(book), lambda: self._generate_and_store(book))
+        return introduction, False
+
+    async def _generate_and_store(self, book: Book) -> str:
+        introduction = await self.generate(book)
+        await run_in_threadpool(self.store, book, introduction)
+        return introduction
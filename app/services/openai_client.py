@@ -0,0 +1,39 @@
+import os
+import httpx
+import openai
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Connection pool and timeouts of the shared OpenAI client. Connections are kept alive between
+# calls, so only the first request on each socket pays for the TLS handshake.
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "100"))
+OPENAI_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("OPENAI_MAX_KEEPALIVE_CONNECTIONS", "20"))
+OPENAI_KEEPALIVE_EXPIRY_SECONDS = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY_SECONDS", "30"))
+OPENAI_CONNECT_TIMEOUT_SECONDS = float(os.getenv("OPENAI_CONNECT_TIMEOUT_SECONDS", "5"))
+# Generations can take a while; this bounds each read, not the whole completion
+OPENAI_READ_TIMEOUT_SECONDS = float(os.getenv("OPENAI_READ_TIMEOUT_SECONDS", "60"))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "2"))
+
+
+def create_openai_client() -> openai.AsyncOpenAI:
+    """
+    Build the process-wide AsyncOpenAI client. Created and closed by the app lifespan and handed to
+    routes through get_openai_client, so every LLM call shares one connection pool.
+    """
+    http_client = openai.DefaultAsyncHttpxClient(
+        limits=httpx.Limits(
+            max_connections=OPENAI_MAX_CONNECTIONS,
+            max_keepalive_connections=OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY_SECONDS,
+        ),
+        timeout=httpx.Timeout(
+            OPENAI_READ_TIMEOUT_SECONDS,
+            connect=OPENAI_CONNECT_TIMEOUT_SECONDS,
+        ),
+    )
+    return openai.AsyncOpenAI(
+        api_key=os.getenv("OPENAI_API_KEY"),
+        http_client=http_client,
+        max_retries=OPENAI_MAX_RETRIES,
+    )
@@ -0,0 +1,137 @@
+import asyncio
+import logging
+import os
+from dotenv import load_dotenv
+from fastapi.concurrency import run_in_threadpool
+from app.db.db import SessionLocal
+from app.models.review import ReviewInfo
+from app.services.review_service import ReviewService
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Opt-in group commit for POST /books/{book_id}/reviews
+REVIEW_WRITE_BATCHING = os.getenv("REVIEW_WRITE_BATCHING", "false").lower() in ("1", "true", "yes")
+# How long the first queued review waits for others to share its transaction
+REVIEW_BATCH_MAX_DELAY_MS = float(os.getenv("REVIEW_BATCH_MAX_DELAY_MS", "5"))
+REVIEW_BATCH_MAX_SIZE = int(os.getenv("REVIEW_BATCH_MAX_SIZE", "500"))
+
+# Queued by stop(): the background task writes what it holds and what is queued, then returns
+_STOP = object()
+
+
+class ReviewWriteBatcher:
+    """
+    Group commit for new reviews.
+
+    Callers queue a review and await a future. One background task collects whatever arrives
+    within max_delay of the first queued review (up to max_batch_size), writes the batch with
+    ReviewService.add_reviews_batch in a single transaction, and resolves each caller's future
+    with its new review, or None when its book does not exist. Batches are written one at a
+    time, which matches SQLite's single writer.
+    """
+
+    def __init__(
+        self,
+        session_factory=SessionLocal,
+        max_delay_ms: float = REVIEW_BATCH_MAX_DELAY_MS,
+        max_batch_size: int = REVIEW_BATCH_MAX_SIZE,
+    ):
+        self.session_factory = session_factory
+        self.max_delay = max_delay_ms / 1000
+        self.max_batch_size = max_batch_size
+        self.batches = 0
+        self.reviews = 0
+        self._queue: asyncio.Queue | None = None
+        self._task: asyncio.Task | None = None
+        self._stopping = False
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """
+        Write every queued review, including the batch still being collected or written, then
+        let the background task finish.
+        """
+        if self._task is None:
+            return
+        self._stopping = True
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+
+    async def add_review(self, book_id: int, review_data: ReviewInfo) -> dict | None:
+        """Queue a review and wait for the batch that writes it."""
+        if self._task is None or self._stopping:
+            raise RuntimeError("ReviewWriteBatcher is not running")
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((book_id, review_data, future))
+        return await future
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "reviews": self.reviews,
+            "average_batch_size": self.reviews / self.batches if self.batches else 0,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+        }
+
+    def _drain(self) -> list:
+        batch = []
+        while len(batch) < self.max_batch_size and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = loop.time() + self.max_delay
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._write(batch)
+        # Reviews queued behind the stop marker, by callers that were already waiting on put()
+        while not self._queue.empty():
+            batch = [item for item in self._drain() if item is not _STOP]
+            if batch:
+                await self._write(batch)
+
+    async def _write(self, batch: list):
+        try:
+            results = await run_in_threadpool(self._write_batch, [(book_id, data) for book_id, data, _ in batch])
+        except Exception as exc:
+            logger.error(f"Review batch of {len(batch)} failed: {exc}")
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        self.batches += 1
+        self.reviews += len(batch)
+        for (_, _, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    def _write_batch(self, items: list) -> list:
+        db = self.session_factory()
+        try:
+            return ReviewService(db).add_reviews_batch(items)
+        finally:
+            db.close()
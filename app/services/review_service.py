@@ -1,33 +1,100 @@
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from app.models.review import Review, ReviewInfo
 from app.models.book import Book
+from app.models.review import Review, ReviewInfo, ReviewResponse
+
+# Columns behind ReviewResponse, in its field order, for the listing that skips the ORM
+REVIEW_RESPONSE_FIELDS = tuple(ReviewResponse.model_fields)
+REVIEW_RESPONSE_COLUMNS = tuple(getattr(Review, field) for field in REVIEW_RESPONSE_FIELDS)
 
 class ReviewService:
     def __init__(self, db: Session):
         self.db = db
 
+    def _book_exists(self, book_id: int) -> bool:
+        # Writes check the database rather than the book cache: a book deleted by another worker
+        # can stay cached for the TTL, and the INSERT would then fail its foreign key
+        return self.db.scalar(select(Book.id).where(Book.id == book_id)) is not None
+
+    def get_reviews_version(self, book_id: int) -> int | None:
+        """Version of a book's review collection for its ETag, or None if the book does not exist."""
+        return self.db.scalar(select(Book.reviews_version).where(Book.id == book_id))
+
+    def get_review_count(self, book_id: int) -> int | None:
+        """Number of reviews of a book, from its maintained counter, or None if the book does not exist."""
+        return self.db.scalar(select(Book.review_count).where(Book.id == book_id))
+
     def get_reviews_by_book_id(self, book_id: int):
         return self.db.query(Review).filter(Review.book_id == book_id).all()
+
+    def get_reviews_page(self, book_id: int, limit: int, after: int | None = None):
+        """Up to `limit` reviews of a book ordered by ID, starting after the `after` cursor."""
+        query = self.db.query(Review).filter(Review.book_id == book_id)
+        if after is not None:
+            query = query.filter(Review.id > after)
+        return query.order_by(Review.id).limit(limit).all()
+    
+    def get_reviews_page_rows(self, book_id: int, limit: int, after: int | None = None) -> list[dict]:
+        """Same page as get_reviews_page, as plain dicts of the ReviewResponse columns."""
+        query = select(*REVIEW_RESPONSE_COLUMNS).where(Review.book_id == book_id)
+        if after is not None:
+            query = query.where(Review.id > after)
+        rows = self.db.execute(query.order_by(Review.id).limit(limit))
+        return [dict(zip(REVIEW_RESPONSE_FIELDS, row)) for row in rows]
     
     def get_review_by_id(self, review_id: int):
         return self.db.query(Review).filter(Review.id == review_id).first()
 
     def add_review(self, book_id: int, review_data: ReviewInfo):
         # Check if the book exists
-        book = self.db.query(Book).filter(Book.id == book_id).first()
-        if not book:
+        if not self._book_exists(book_id):
             return None
         # Add the review
         new_review = Review(book_id=book_id, **review_data.model_dump())
         self.db.add(new_review)
-        self.db.commit()
+        try:
+            self.db.commit()
+        except IntegrityError:
+            # The book was deleted between the check and the INSERT
+            self.db.rollback()
+            return None
         self.db.refresh(new_review)
         return new_review
 
+    def add_reviews_batch(self, items: list[tuple[int, ReviewInfo]]) -> list[dict | None]:
+        """
+        Insert many reviews in one transaction (a single commit, so a single fsync on SQLite).
+        Returns, in input order, each new review as a ReviewResponse-shaped dict, or None where
+        the book does not exist.
+        """
+        # A book deleted between the existence check and the INSERT fails the foreign key;
+        # the second attempt sees the deletion and leaves that review out
+        for attempt in range(2):
+            book_ids = {book_id for book_id, _ in items}
+            existing = set(self.db.scalars(select(Book.id).where(Book.id.in_(book_ids))))
+            accepted = [(book_id, review_data) for book_id, review_data in items if book_id in existing]
+            try:
+                new_ids = self.db.scalars(
+                    insert(Review).returning(Review.id, sort_by_parameter_order=True),
+                    [{"book_id": book_id, "review": review_data.review} for book_id, review_data in accepted],
+                ).all() if accepted else []
+                self.db.commit()
+                break
+            except IntegrityError:
+                self.db.rollback()
+                if attempt == 1:
+                    raise
+
+        new_id_iter = iter(new_ids)
+        return [
+            {"review": review_data.review, "id": next(new_id_iter), "book_id": book_id} if book_id in existing else None
+            for book_id, review_data in items
+        ]
+
     def update_review(self, book_id: int, review_id: int, new_review_data: ReviewInfo):
         # Check if the book exists
-        book = self.db.query(Book).filter(Book.id == book_id).first()
-        if not book:
+        if not self._book_exists(book_id):
             return None
         # Update the review
         review = self.db.query(Review).filter(Review.id == review_id, Review.book_id == book_id).first()
@@ -38,6 +105,24 @@ class ReviewService:
         return review
 
  
+    def patch_review(self, book_id: int, review_id: int, review_data: ReviewInfo) -> dict | None:
+        """
+        Update a review with one UPDATE ... RETURNING, or return None if the book has no such review.
+        Matching on both IDs makes a separate existence check of the book unnecessary.
+        """
+        row = self.db.execute(
+            update(Review)
+            .where(Review.id == review_id, Review.book_id == book_id)
+            .values(review=review_data.review)
+            .returning(*REVIEW_RESPONSE_COLUMNS)
+            .execution_options(synchronize_session=False)
+        ).first()
+        if row is None:
+            self.db.rollback()
+            return None
+        self.db.commit()
+        return dict(zip(REVIEW_RESPONSE_FIELDS, row))
+
     def delete_review(self, book_id: int, review_id: int):
         review = self.db.query(Review).filter(Review.id == review_id, Review.book_id == book_id).first()
         if not review:
@@ -0,0 +1,139 @@
+import asyncio
+from typing import AsyncIterator, Awaitable, Callable, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key into one in-flight call whose result (or
+    exception) every caller shares. Once it finishes the key is forgotten, so this is not a
+    cache: a later call with the same key runs again.
+
+    The call runs as its own task, so a caller that is cancelled (its client went away)
+    stops waiting without cancelling the call for the others. Keys are local to one process
+    and its event loop.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.coalesced = 0
+        self._tasks: dict[str, asyncio.Task] = {}
+        self._waiters: dict[str, int] = {}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._tasks[key] = task
+            self._waiters[key] = 0
+            task.add_done_callback(lambda _: self._forget(key, task))
+            self.calls += 1
+        else:
+            self.coalesced += 1
+        self._waiters[key] += 1
+        try:
+            return await asyncio.shield(task)
+        finally:
+            if key in self._waiters and self._tasks.get(key) is task:
+                self._waiters[key] -= 1
+
+    def _forget(self, key: str, task: asyncio.Task):
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+            del self._waiters[key]
+        if not task.cancelled():
+            # Mark the exception as retrieved when every waiter was cancelled before it arrived
+            task.exception()
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._tasks),
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "waiters": dict(self._waiters),
+        }
+
+
+class _SharedStream:
+    def __init__(self):
+        self.chunks = []
+        self.done = False
+        self.error: Exception | None = None
+        self.subscribers = 0
+        self.changed = asyncio.Event()
+        self.task: asyncio.Task | None = None
+
+
+class StreamFlight:
+    """
+    SingleFlight for streams: concurrent subscribers with the same key share one upstream
+    stream. A subscriber that joins late first replays the chunks produced so far, then follows
+    along live. When the last subscriber leaves early, the upstream is cancelled and closed, so
+    an abandoned generation still stops.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.coalesced = 0
+        self._streams: dict[str, _SharedStream] = {}
+
+    async def subscribe(self, key: str, fn: Callable[[], AsyncIterator[T]]) -> AsyncIterator[T]:
+        shared = self._streams.get(key)
+        if shared is None:
+            shared = _SharedStream()
+            self._streams[key] = shared
+            shared.task = asyncio.ensure_future(self._produce(key, shared, fn))
+            self.calls += 1
+        else:
+            self.coalesced += 1
+        shared.subscribers += 1
+        try:
+            position = 0
+            while True:
+                while position < len(shared.chunks):
+                    yield shared.chunks[position]
+                    position += 1
+                if shared.done:
+                    if shared.error is not None:
+                        raise shared.error
+                    return
+                await shared.changed.wait()
+        finally:
+            shared.subscribers -= 1
+            if shared.subscribers == 0 and not shared.done:
+                self._forget(key, shared)
+                shared.task.cancel()
+
+    async def _produce(self, key: str, shared: _SharedStream, fn: Callable[[], AsyncIterator[T]]):
+        source = fn()
+        try:
+            async for chunk in source:
+                shared.chunks.append(chunk)
+                self._notify(shared)
+        except Exception as e:
+            shared.error = e
+        finally:
+            # Closing the source releases the upstream connection when the stream was cancelled
+            await source.aclose()
+            shared.done = True
+            self._forget(key, shared)
+            self._notify(shared)
+
+    @staticmethod
+    def _notify(shared: _SharedStream):
+        # A fresh event per chunk, so a subscriber never clears a wake-up meant for another
+        changed, shared.changed = shared.changed, asyncio.Event()
+        changed.set()
+
+    def _forget(self, key: str, shared: _SharedStream):
+        if self._streams.get(key) is shared:
+            del self._streams[key]
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._streams),
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "waiters": {key: shared.subscribers for key, shared in self._streams.items()},
+        }
@@ -0,0 +1,75 @@
+"""
+Per-row cost of serializing a page of books: response_model path versus the fast path.
+
+Usage: python -m benchmarks.bench_list_serialization [--rows 1000] [--repeat 20]
+
+"model" is what GET /books did before: load ORM rows, validate a BookResponse from each one
+(from_attributes), then encode the list as FastAPI does for a response_model.
+"fast" is BookService.get_books_page_rows plus json_bytes_response: column tuples, one dict
+per row, and orjson straight to bytes. Both include the query, so the numbers are end to end.
+"""
+import argparse
+import time
+from fastapi import Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+from app.dependencies.fast_json import json_bytes_response
+from app.models.book import Base, Book, BookResponse
+from app.services.book_service import BookService
+
+PAGE_ADAPTER = TypeAdapter(list[BookResponse])
+
+
+def seed(db, rows: int):
+    db.execute(insert(Book), [
+        {"title": f"Book Number {i}", "author": "Author Name", "year": 2000 + i % 25,
+         "description": "A description long enough to look like a real one. " * 3}
+        for i in range(rows)
+    ])
+    db.commit()
+
+
+def model_path(service: BookService, rows: int) -> bytes:
+    books = service.get_books_page(rows)
+    # serialize_response validates against the response_model, then JSONResponse encodes the result
+    content = PAGE_ADAPTER.dump_python(PAGE_ADAPTER.validate_python(books, from_attributes=True), mode="json")
+    return JSONResponse(jsonable_encoder(content)).body
+
+
+def fast_path(service: BookService, rows: int) -> bytes:
+    return json_bytes_response(service.get_books_page_rows(rows), Response()).body
+
+
+def timed(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    seed(db, args.rows)
+    service = BookService(db)
+
+    assert model_path(service, args.rows) == fast_path(service, args.rows)
+    for name, fn in (("model", model_path), ("fast", fast_path)):
+        # Expire the identity map so each model run really builds new ORM objects
+        seconds = timed(lambda: (db.expire_all(), fn(service, args.rows)), args.repeat)
+        print(f"{name:>6}: {seconds * 1000:8.2f} ms/page {seconds / args.rows * 1e6:8.2f} us/row")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Compare read/write throughput of the default SQLite engine against the production profile.
+
+Usage: python -m benchmarks.bench_sqlite_profile [--seconds 5] [--readers 4] [--rows 10000]
+
+Each run seeds a fresh database file, then lets reader threads fetch random books by id
+while one writer thread inserts reviews (one transaction per insert, like ReviewService).
+"""
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+from sqlalchemy import create_engine, text
+from app.db.db import SQLITE_PRAGMAS, create_db_engine
+
+
+def seed(engine, rows: int):
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE books (id INTEGER PRIMARY KEY, title VARCHAR NOT NULL, author VARCHAR NOT NULL, "
+            "year INTEGER NOT NULL, description VARCHAR)"
+        ))
+        conn.execute(text(
+            "CREATE TABLE reviews (id INTEGER PRIMARY KEY, review VARCHAR NOT NULL, book_id INTEGER NOT NULL)"
+        ))
+        conn.execute(
+            text("INSERT INTO books (title, author, year, description) VALUES (:title, 'Author', 2000, :description)"),
+            [{"title": f"Book {i}", "description": "x" * 500} for i in range(rows)],
+        )
+
+
+def run(engine, seconds: float, readers: int, rows: int) -> tuple[float, float]:
+    stop = threading.Event()
+    counts = {"reads": 0, "writes": 0}
+    lock = threading.Lock()
+
+    def reader():
+        done = 0
+        while not stop.is_set():
+            with engine.connect() as conn:
+                conn.execute(text("SELECT * FROM books WHERE id = :id"), {"id": random.randint(1, rows)}).fetchone()
+            done += 1
+        with lock:
+            counts["reads"] += done
+
+    def writer():
+        done = 0
+        while not stop.is_set():
+            with engine.begin() as conn:
+                conn.execute(
+                    text("INSERT INTO reviews (review, book_id) VALUES ('Great read', :id)"),
+                    {"id": random.randint(1, rows)},
+                )
+            done += 1
+        with lock:
+            counts["writes"] += done
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)] + [threading.Thread(target=writer)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return counts["reads"] / seconds, counts["writes"] / seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--rows", type=int, default=10000)
+    args = parser.parse_args()
+
+    profiles = {
+        # What app/db/db.py used to build: default journal, synchronous=FULL, no mmap
+        "default": lambda url: create_engine(url, connect_args={"check_same_thread": False}),
+        "production": lambda url: create_db_engine(url, pragmas=SQLITE_PRAGMAS),
+    }
+    for name, factory in profiles.items():
+        with tempfile.TemporaryDirectory() as tmp:
+            engine = factory(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+            seed(engine, args.rows)
+            reads, writes = run(engine, args.seconds, args.readers, args.rows)
+            engine.dispose()
+        print(f"{name:>10}: {reads:10.0f} reads/s {writes:10.0f} writes/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Time count_longest_book_titles before and after the indexed title_word_count column.
+
+Usage: python -m benchmarks.bench_title_stats [--sizes 1000 10000 100000 1000000]
+
+"before" is the old implementation: load every Book and walk each title twice in Python.
+"after" is BookService.count_longest_book_titles: a MAX and a COUNT on ix_books_title_word_count.
+"""
+import argparse
+import random
+import time
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+from app.models.book import Base, Book, count_title_words
+from app.models.review import Review
+from app.services.book_service import BookService
+
+WORDS = ["the", "art", "of", "python", "data", "web", "guide", "modern", "advanced", "practical"]
+
+
+def legacy_word_count(s: str) -> int:
+    count = 0
+    found = False
+    eol = len(s) - 1
+    for i in range(len(s)):
+        if i != eol and s[i].isalpha():
+            found = True
+        elif (not s[i].isalpha()) and found:
+            count += 1
+            found = False
+        elif s[i].isalpha() and i == eol:
+            count += 1
+    return count
+
+
+def legacy_count_longest_book_titles(db) -> int:
+    # Two passes over every loaded title, as the old implementation did (minus its print)
+    all_books = db.query(Book).all()
+    longest = max((legacy_word_count(book.title) for book in all_books), default=0)
+    return sum(1 for book in all_books if legacy_word_count(book.title) == longest)
+
+
+def seed(db, size: int):
+    rows = []
+    for i in range(size):
+        title = " ".join(random.choices(WORDS, k=random.randint(1, 8))) + f" {i:x}"
+        rows.append({
+            "title": title,
+            "author": "Author",
+            "year": 2000,
+            "description": "Description",
+            "title_word_count": count_title_words(title),
+        })
+    db.execute(insert(Book), rows)
+    db.commit()
+
+
+def timed(fn, repeat: int = 3) -> tuple[float, int]:
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000, 1000000])
+    args = parser.parse_args()
+
+    print(f"{'rows':>9} {'before (ms)':>12} {'after (ms)':>11} {'result':>7}")
+    for size in args.sizes:
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(bind=engine)
+        db = sessionmaker(bind=engine)()
+        seed(db, size)
+
+        before, expected = timed(lambda: legacy_count_longest_book_titles(db), repeat=1 if size >= 100000 else 3)
+        after, result = timed(lambda: BookService(db).count_longest_book_titles())
+        assert result == expected, (result, expected)
+        print(f"{size:>9} {before * 1000:>12.1f} {after * 1000:>11.3f} {result:>7}")
+        db.close()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
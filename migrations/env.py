@@ -3,13 +3,15 @@ from sqlalchemy import engine_from_config, pool
 from alembic import context
 
 # Import your SQLAlchemy models
-from app.db.db import Base
+from app.db.db import Base, DATABASE_URL
 from app.models.book import Book  # Import Book model
 from app.models.review import Review  # Import Review model
 
 # Set up Alembic Config
 config = context.config
 fileConfig(config.config_file_name)
+# Migrate the same database the app uses (DATABASE_URL env var, default from app/db/db.py)
+config.set_main_option("sqlalchemy.url", DATABASE_URL)
 
 # Set the target metadata to Base.metadata
 target_metadata = Base.metadata
@@ -0,0 +1,47 @@
+"""Add book_introductions cache for /ai/introduction
+
+Revision ID: 0c92be9440e5
+Revises: 6733308fa730
+Create Date: 2026-10-17 01:05:28.114159
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0c92be9440e5'
+down_revision: Union[str, None] = '6733308fa730'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+TRIGGER = """
+    CREATE TRIGGER book_introductions_after_book_update AFTER UPDATE OF title, author, year, description ON books BEGIN
+        DELETE FROM book_introductions WHERE book_id = NEW.id;
+    END
+"""
+
+
+def upgrade() -> None:
+    op.create_table(
+        'book_introductions',
+        sa.Column('cache_key', sa.String(), nullable=False),
+        sa.Column('book_id', sa.Integer(), nullable=False),
+        sa.Column('model', sa.String(), nullable=False),
+        sa.Column('prompt_version', sa.String(), nullable=False),
+        sa.Column('introduction', sa.String(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+        sa.ForeignKeyConstraint(['book_id'], ['books.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('cache_key'),
+    )
+    op.create_index(op.f('ix_book_introductions_book_id'), 'book_introductions', ['book_id'], unique=False)
+    op.execute(TRIGGER)
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS book_introductions_after_book_update")
+    op.drop_index(op.f('ix_book_introductions_book_id'), table_name='book_introductions')
+    op.drop_table('book_introductions')
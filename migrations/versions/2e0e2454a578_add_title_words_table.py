@@ -0,0 +1,56 @@
+"""Add title_words frequency table
+
+Revision ID: 2e0e2454a578
+Revises: cda5c7b4737d
+Create Date: 2026-10-17 00:52:24.817226
+
+"""
+from collections import Counter
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2e0e2454a578'
+down_revision: Union[str, None] = 'cda5c7b4737d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+BATCH_SIZE = 1000
+
+
+def upgrade() -> None:
+    title_words = op.create_table(
+        'title_words',
+        sa.Column('word', sa.String(), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('word'),
+    )
+
+    # Count every title in keyset batches; the vocabulary is far smaller than the books table
+    conn = op.get_bind()
+    counts = Counter()
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            sa.text("SELECT id, title FROM books WHERE id > :last_id ORDER BY id LIMIT :limit"),
+            {"last_id": last_id, "limit": BATCH_SIZE},
+        ).fetchall()
+        if not rows:
+            break
+        for _, title in rows:
+            # Same tokenisation as app.models.title_word.title_words
+            counts.update(title.lower().split())
+        last_id = rows[-1][0]
+    if counts:
+        op.bulk_insert(title_words, [{"word": word, "count": count} for word, count in counts.items()])
+
+    op.create_index('ix_title_words_count_word', 'title_words', [sa.text('count DESC'), 'word'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_title_words_count_word', table_name='title_words')
+    op.drop_table('title_words')
@@ -0,0 +1,80 @@
+"""Add row versions and resource_versions for ETags
+
+Revision ID: 44cd0a8f37a4
+Revises: 6fe8c659347c
+Create Date: 2026-10-17 00:46:55.325095
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '44cd0a8f37a4'
+down_revision: Union[str, None] = '6fe8c659347c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+TRIGGERS = {
+    'books_version_after_insert': """
+        CREATE TRIGGER books_version_after_insert AFTER INSERT ON books BEGIN
+            UPDATE resource_versions SET version = version + 1 WHERE name = 'books';
+        END
+    """,
+    'books_version_after_update': """
+        CREATE TRIGGER books_version_after_update AFTER UPDATE OF title, author, year, description ON books BEGIN
+            UPDATE books SET version = version + 1 WHERE id = NEW.id;
+            UPDATE resource_versions SET version = version + 1 WHERE name = 'books';
+        END
+    """,
+    'books_version_after_delete': """
+        CREATE TRIGGER books_version_after_delete AFTER DELETE ON books BEGIN
+            UPDATE resource_versions SET version = version + 1 WHERE name = 'books';
+        END
+    """,
+    'reviews_version_after_insert': """
+        CREATE TRIGGER reviews_version_after_insert AFTER INSERT ON reviews BEGIN
+            UPDATE books SET reviews_version = reviews_version + 1 WHERE id = NEW.book_id;
+            UPDATE resource_versions SET version = version + 1 WHERE name = 'reviews';
+        END
+    """,
+    'reviews_version_after_update': """
+        CREATE TRIGGER reviews_version_after_update AFTER UPDATE OF review, book_id ON reviews BEGIN
+            UPDATE reviews SET version = version + 1 WHERE id = NEW.id;
+            UPDATE books SET reviews_version = reviews_version + 1 WHERE id IN (OLD.book_id, NEW.book_id);
+            UPDATE resource_versions SET version = version + 1 WHERE name = 'reviews';
+        END
+    """,
+    'reviews_version_after_delete': """
+        CREATE TRIGGER reviews_version_after_delete AFTER DELETE ON reviews BEGIN
+            UPDATE books SET reviews_version = reviews_version + 1 WHERE id = OLD.book_id;
+            UPDATE resource_versions SET version = version + 1 WHERE name = 'reviews';
+        END
+    """,
+}
+
+
+def upgrade() -> None:
+    op.add_column('books', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+    op.add_column('books', sa.Column('reviews_version', sa.Integer(), server_default='1', nullable=False))
+    op.add_column('reviews', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+    resource_versions = op.create_table('resource_versions',
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    op.bulk_insert(resource_versions, [{'name': 'books', 'version': 1}, {'name': 'reviews', 'version': 1}])
+    for trigger in TRIGGERS.values():
+        op.execute(trigger)
+
+
+def downgrade() -> None:
+    for name in TRIGGERS:
+        op.execute(f'DROP TRIGGER IF EXISTS {name}')
+    op.drop_table('resource_versions')
+    op.drop_column('reviews', 'version')
+    op.drop_column('books', 'reviews_version')
+    op.drop_column('books', 'version')
@@ -0,0 +1,60 @@
+"""Index reviews by book and maintain books.review_count
+
+Revision ID: 6733308fa730
+Revises: d0ee4ed70d88
+Create Date: 2026-10-17 00:58:12.402911
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6733308fa730'
+down_revision: Union[str, None] = 'd0ee4ed70d88'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+TRIGGERS = {
+    'reviews_count_after_insert': """
+        CREATE TRIGGER reviews_count_after_insert AFTER INSERT ON reviews BEGIN
+            UPDATE books SET review_count = review_count + 1 WHERE id = NEW.book_id;
+        END
+    """,
+    'reviews_count_after_update': """
+        CREATE TRIGGER reviews_count_after_update AFTER UPDATE OF book_id ON reviews
+        WHEN OLD.book_id <> NEW.book_id BEGIN
+            UPDATE books SET review_count = review_count - 1 WHERE id = OLD.book_id;
+            UPDATE books SET review_count = review_count + 1 WHERE id = NEW.book_id;
+        END
+    """,
+    'reviews_count_after_delete': """
+        CREATE TRIGGER reviews_count_after_delete AFTER DELETE ON reviews BEGIN
+            UPDATE books SET review_count = review_count - 1 WHERE id = OLD.book_id;
+        END
+    """,
+}
+
+
+def upgrade() -> None:
+    op.create_index('ix_reviews_book_id_id', 'reviews', ['book_id', 'id'], unique=False)
+
+    op.add_column('books', sa.Column('review_count', sa.Integer(), server_default='0', nullable=False))
+    # One grouped pass over the new index instead of a correlated count per book
+    op.execute("""
+        UPDATE books SET review_count = counts.n
+        FROM (SELECT book_id, count(*) AS n FROM reviews GROUP BY book_id) AS counts
+        WHERE books.id = counts.book_id
+    """)
+    for statement in TRIGGERS.values():
+        op.execute(statement)
+
+
+def downgrade() -> None:
+    for name in TRIGGERS:
+        op.execute(f"DROP TRIGGER IF EXISTS {name}")
+    op.drop_column('books', 'review_count')
+    op.drop_index('ix_reviews_book_id_id', table_name='reviews')
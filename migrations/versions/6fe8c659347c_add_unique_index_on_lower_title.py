@@ -0,0 +1,73 @@
+"""Add unique index on lower(title)
+
+Revision ID: 6fe8c659347c
+Revises: 13faae009231
+Create Date: 2026-10-17 00:42:03.295351
+
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6fe8c659347c'
+down_revision: Union[str, None] = '13faae009231'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Duplicate groups listed in the error before it is cut short
+MAX_REPORTED_DUPLICATES = 50
+
+
+def _dedupe_title(conn, book_id: int, title: str) -> str:
+    """Suffix the id, then a counter, until the title no longer clashes with any other book."""
+    candidate = f"{title} ({book_id})"
+    attempt = 1
+    while conn.execute(
+        sa.text("SELECT 1 FROM books WHERE lower(title) = lower(:title) AND id != :id"),
+        {"title": candidate, "id": book_id},
+    ).first() is not None:
+        attempt += 1
+        candidate = f"{title} ({book_id}-{attempt})"
+    return candidate
+
+
+def upgrade() -> None:
+    # Rows added before the duplicate check existed may clash. Renaming them rewrites user data,
+    # so it only happens when asked for: alembic -x dedupe_titles=true upgrade head
+    conn = op.get_bind()
+    groups = conn.execute(sa.text(
+        "SELECT lower(title), group_concat(id) FROM books GROUP BY lower(title) HAVING count(*) > 1"
+    )).fetchall()
+    if groups:
+        dedupe = context.get_x_argument(as_dictionary=True).get("dedupe_titles", "").lower() in ("1", "true", "yes")
+        if not dedupe:
+            listed = "\n".join(f"  {title!r}: book ids {ids}" for title, ids in groups[:MAX_REPORTED_DUPLICATES])
+            more = f"\n  ... and {len(groups) - MAX_REPORTED_DUPLICATES} more" if len(groups) > MAX_REPORTED_DUPLICATES else ""
+            raise RuntimeError(
+                f"Cannot add the unique index on lower(title): {len(groups)} title(s) are used by several books.\n"
+                f"{listed}{more}\n"
+                "Rename or delete the duplicates, or rerun with `alembic -x dedupe_titles=true upgrade head` "
+                "to keep the oldest book's title and suffix the others with their id."
+            )
+        # Keep the oldest title as is and suffix the later copies
+        duplicates = conn.execute(sa.text(
+            "SELECT id, title FROM books AS b WHERE EXISTS "
+            "(SELECT 1 FROM books AS o WHERE lower(o.title) = lower(b.title) AND o.id < b.id) ORDER BY id"
+        )).fetchall()
+        for book_id, title in duplicates:
+            conn.execute(
+                sa.text("UPDATE books SET title = :title WHERE id = :id"),
+                {"title": _dedupe_title(conn, book_id, title), "id": book_id},
+            )
+
+    # Case-insensitive unique titles: the lower(title) duplicate checks in BookService
+    # become index lookups, and concurrent inserts of the same title fail with IntegrityError
+    op.create_index('ux_books_title_lower', 'books', [sa.text('lower(title)')], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ux_books_title_lower', table_name='books')
@@ -0,0 +1,54 @@
+"""Add indexed title_word_count to books
+
+Revision ID: cda5c7b4737d
+Revises: 44cd0a8f37a4
+Create Date: 2026-10-17 00:48:27.153629
+
+"""
+from itertools import groupby
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'cda5c7b4737d'
+down_revision: Union[str, None] = '44cd0a8f37a4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+BATCH_SIZE = 1000
+
+
+def count_title_words(title: str) -> int:
+    # Frozen copy of app.models.book.count_title_words, so this revision never changes meaning
+    return sum(1 for is_alpha, _ in groupby(title, str.isalpha) if is_alpha)
+
+
+def upgrade() -> None:
+    op.add_column('books', sa.Column('title_word_count', sa.Integer(), server_default='0', nullable=False))
+
+    # Backfill in keyset batches so large tables are never loaded at once
+    conn = op.get_bind()
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            sa.text("SELECT id, title FROM books WHERE id > :last_id ORDER BY id LIMIT :limit"),
+            {"last_id": last_id, "limit": BATCH_SIZE},
+        ).fetchall()
+        if not rows:
+            break
+        conn.execute(
+            sa.text("UPDATE books SET title_word_count = :count WHERE id = :id"),
+            [{"id": book_id, "count": count_title_words(title)} for book_id, title in rows],
+        )
+        last_id = rows[-1][0]
+
+    op.create_index(op.f('ix_books_title_word_count'), 'books', ['title_word_count'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_books_title_word_count'), table_name='books')
+    op.drop_column('books', 'title_word_count')
@@ -0,0 +1,59 @@
+"""Add books_fts full-text search index
+
+Revision ID: d0ee4ed70d88
+Revises: 2e0e2454a578
+Create Date: 2026-10-17 00:53:43.431735
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd0ee4ed70d88'
+down_revision: Union[str, None] = '2e0e2454a578'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+TRIGGERS = {
+    'books_fts_after_insert': """
+        CREATE TRIGGER books_fts_after_insert AFTER INSERT ON books BEGIN
+            INSERT INTO books_fts (rowid, title, author, description)
+            VALUES (NEW.id, NEW.title, NEW.author, NEW.description);
+        END
+    """,
+    'books_fts_after_update': """
+        CREATE TRIGGER books_fts_after_update AFTER UPDATE OF title, author, description ON books BEGIN
+            INSERT INTO books_fts (books_fts, rowid, title, author, description)
+            VALUES ('delete', OLD.id, OLD.title, OLD.author, OLD.description);
+            INSERT INTO books_fts (rowid, title, author, description)
+            VALUES (NEW.id, NEW.title, NEW.author, NEW.description);
+        END
+    """,
+    'books_fts_after_delete': """
+        CREATE TRIGGER books_fts_after_delete AFTER DELETE ON books BEGIN
+            INSERT INTO books_fts (books_fts, rowid, title, author, description)
+            VALUES ('delete', OLD.id, OLD.title, OLD.author, OLD.description);
+        END
+    """,
+}
+
+
+def upgrade() -> None:
+    op.execute("""
+        CREATE VIRTUAL TABLE books_fts USING fts5(
+            title, author, description, content='books', content_rowid='id'
+        )
+    """)
+    # Index the rows that already exist; the triggers take over from here
+    op.execute("INSERT INTO books_fts (books_fts) VALUES ('rebuild')")
+    for statement in TRIGGERS.values():
+        op.execute(statement)
+
+
+def downgrade() -> None:
+    for name in TRIGGERS:
+        op.execute(f"DROP TRIGGER IF EXISTS {name}")
+    op.execute("DROP TABLE IF EXISTS books_fts")
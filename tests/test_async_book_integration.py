@@ -0,0 +1,109 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from app.main import app
+from app.services.cache_service import book_cache
+from app.models.book import Base
+from app.dependencies.db import get_async_db
+from app.dependencies.auth import required_admin_role, required_user_role
+
+# Setup the database for testing; tables are managed through the sync engine
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
+ASYNC_SQLALCHEMY_DATABASE_URL = "sqlite+aiosqlite:///./test.db"
+engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+
+# Dependency override to use the test database
+async def override_get_async_db():
+    # A fresh engine per request keeps aiosqlite connections on the TestClient's event loop
+    async_engine = create_async_engine(ASYNC_SQLALCHEMY_DATABASE_URL)
+    TestingAsyncSessionLocal = async_sessionmaker(autoflush=False, expire_on_commit=False, bind=async_engine)
+    async with TestingAsyncSessionLocal() as db:
+        yield db
+    await async_engine.dispose()
+
+# Mock security dependency
+def mock_required_role():
+    pass
+
+@pytest.fixture()
+def client():
+    with TestClient(app) as c:
+        yield c
+
+@pytest.fixture(autouse=True)
+def dependency_overrides():
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    app.dependency_overrides[required_admin_role] = mock_required_role
+    app.dependency_overrides[required_user_role] = mock_required_role
+    yield
+    app.dependency_overrides = {}
+
+@pytest.fixture(autouse=True)
+def setup_and_teardown_db():
+    Base.metadata.create_all(bind=engine)
+    # Book ids are reused after drop_all, so cached rows from earlier tests must go
+    book_cache.clear()
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+def test_async_book_crud(client):
+    response = client.post("/async/books/", json={
+        "title": "Async Book",
+        "author": "Async Author",
+        "year": 2024,
+        "description": "Async Description"
+    })
+    assert response.status_code == 201
+    book_id = response.json()["id"]
+
+    response = client.get(f"/async/books/{book_id}")
+    assert response.status_code == 200
+    assert response.json()["title"] == "Async Book"
+
+    response = client.put(f"/async/books/{book_id}", json={
+        "title": "Updated Async Book",
+        "author": "Async Author",
+        "year": 2024,
+        "description": "Async Description"
+    })
+    assert response.status_code == 200
+    assert response.json()["title"] == "Updated Async Book"
+
+    response = client.get("/async/books/")
+    assert [b["id"] for b in response.json()] == [book_id]
+
+    response = client.delete(f"/async/books/{book_id}")
+    assert response.status_code == 200
+    response = client.get(f"/async/books/{book_id}")
+    assert response.status_code == 404
+
+def test_async_duplicate_title_conflict(client):
+    book = {"title": "Same Title", "author": "Author", "year": 2024, "description": "Description"}
+    client.post("/async/books/", json=book)
+
+    response = client.post("/async/books/", json={**book, "title": "SAME TITLE"})
+    assert response.status_code == 409
+
+def test_async_reviews(client):
+    response = client.post("/async/books/", json={
+        "title": "Reviewed Book",
+        "author": "Author",
+        "year": 2024,
+        "description": "Description"
+    })
+    book_id = response.json()["id"]
+
+    response = client.post(f"/async/books/{book_id}/reviews", json={"review": "Great read"})
+    assert response.status_code == 201
+    review_id = response.json()["id"]
+
+    response = client.get(f"/async/books/{book_id}/reviews")
+    assert [r["id"] for r in response.json()] == [review_id]
+
+    response = client.post("/async/books/999/reviews", json={"review": "Nope"})
+    assert response.status_code == 404
+
+    # Deleting the book cascades to its reviews
+    response = client.delete(f"/async/books/{book_id}")
+    assert response.status_code == 200
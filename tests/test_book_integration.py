@@ -1,15 +1,22 @@
+import json
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from app.db.db import ReplicaPool, create_db_engine
+from app.dependencies import db as db_dependencies
+from app.dependencies.db import PRIMARY_PIN_COOKIE
 from sqlalchemy.orm import sessionmaker
 from app.main import app
-from app.models.book import Base, BookInfo
+from app.services.cache_service import book_cache
+from app.models.book import Base, BookInfo, BookResponse
 from app.dependencies.services import get_db
-from app.dependencies.auth import required_admin_role
+from app.dependencies.auth import required_admin_role, required_user_role
 
 # Setup the database for testing
 SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+# Foreign keys on, as in production, so deleting a book cascades to its reviews
+engine = create_db_engine(SQLALCHEMY_DATABASE_URL, pragmas={"foreign_keys": "ON"})
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 # Dependency override to use the test database
@@ -44,6 +51,8 @@ def dependency_overrides():
 def setup_and_teardown_db():
     # Setup: Create tables
     Base.metadata.create_all(bind=engine)
+    # Book ids are reused after drop_all, so cached rows from earlier tests must go
+    book_cache.clear()
     yield
     # Teardown: Drop tables
     Base.metadata.drop_all(bind=engine)
@@ -121,4 +130,322 @@ def test_delete_book(client):
 
     # Verify the book is deleted
     response = client.get(f"/books/{book_id}")
-    assert response.status_code == 404
\ No newline at end of file
+    assert response.status_code == 404
+
+def add_books(client, count):
+    ids = []
+    for i in range(count):
+        response = client.post("/books/", json={
+            "title": f"Book Number {i}",
+            "author": "Author",
+            "year": 2020,
+            "description": "Description"
+        })
+        ids.append(response.json()["id"])
+    return ids
+
+def test_get_books_keyset_pagination(client):
+    ids = add_books(client, 5)
+
+    response = client.get("/books/", params={"limit": 2})
+    assert response.status_code == 200
+    assert [b["id"] for b in response.json()] == ids[:2]
+    cursor = response.headers["X-Next-Cursor"]
+
+    response = client.get("/books/", params={"limit": 2, "after": cursor})
+    assert [b["id"] for b in response.json()] == ids[2:4]
+
+    response = client.get("/books/", params={"limit": 2, "after": ids[3]})
+    assert [b["id"] for b in response.json()] == ids[4:]
+    assert "X-Next-Cursor" not in response.headers
+
+def test_get_books_ndjson_stream(client):
+    ids = add_books(client, 3)
+
+    response = client.get("/books/", params={"stream": True, "after": ids[0]})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [b["id"] for b in lines] == ids[1:]
+
+def test_bulk_import_json_array(client):
+    client.post("/books/", json={
+        "title": "Existing Book",
+        "author": "Author",
+        "year": 2020,
+        "description": "Description"
+    })
+
+    response = client.post("/books/bulk", json=[
+        {"title": "Bulk Book One", "author": "Author", "year": 2020, "description": "Description"},
+        {"title": "existing book", "author": "Author", "year": 2020, "description": "Description"},
+        {"title": "Bulk Book Two", "author": "Author", "year": 2021, "description": "Description"},
+        {"title": "BULK BOOK ONE", "author": "Author", "year": 2020, "description": "Description"},
+        {"title": "No", "author": "Author", "year": 2020, "description": "Description"},
+    ])
+    assert response.status_code == 200
+    report = response.json()
+    assert (report["created"], report["conflicts"], report["invalid"]) == (2, 2, 1)
+    assert [r["status"] for r in report["results"]] == ["created", "conflict", "created", "conflict", "invalid"]
+
+    response = client.get(f"/books/{report['results'][2]['id']}")
+    assert response.json()["title"] == "Bulk Book Two"
+
+def test_bulk_import_ndjson(client):
+    lines = [
+        json.dumps({"title": "NDJSON Book", "author": "Author", "year": 2020, "description": "Description"}),
+        "not json",
+    ]
+    response = client.post("/books/bulk", content="\n".join(lines), headers={"Content-Type": "application/x-ndjson"})
+    assert response.status_code == 200
+    assert [r["status"] for r in response.json()["results"]] == ["created", "invalid"]
+
+def test_bulk_import_rejects_non_array(client):
+    response = client.post("/books/bulk", json={"title": "Not a list"})
+    assert response.status_code == 400
+
+def test_get_book_etag_and_not_modified(client):
+    response = client.post("/books/", json={
+        "title": "Tagged Book",
+        "author": "Author",
+        "year": 2020,
+        "description": "Description"
+    })
+    book_id = response.json()["id"]
+
+    response = client.get(f"/books/{book_id}")
+    etag = response.headers["ETag"]
+    response = client.get(f"/books/{book_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+
+    client.put(f"/books/{book_id}", json={
+        "title": "Retagged Book",
+        "author": "Author",
+        "year": 2020,
+        "description": "Description"
+    })
+    response = client.get(f"/books/{book_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+def test_get_books_etag_changes_on_write(client):
+    add_books(client, 2)
+
+    response = client.get("/books/")
+    etag = response.headers["ETag"]
+    assert client.get("/books/", headers={"If-None-Match": etag}).status_code == 304
+    # A different page is a different representation
+    assert client.get("/books/", params={"limit": 1}, headers={"If-None-Match": etag}).status_code == 200
+
+    client.post("/books/", json={
+        "title": "Another Book",
+        "author": "Author",
+        "year": 2020,
+        "description": "Description"
+    })
+    assert client.get("/books/", headers={"If-None-Match": etag}).status_code == 200
+
+def test_get_reviews_etag_changes_on_new_review(client):
+    app.dependency_overrides[required_user_role] = mock_required_admin_role
+    book_id = add_books(client, 1)[0]
+    client.post(f"/books/{book_id}/reviews", json={"review": "First review"})
+
+    response = client.get(f"/books/{book_id}/reviews")
+    etag = response.headers["ETag"]
+    assert client.get(f"/books/{book_id}/reviews", headers={"If-None-Match": etag}).status_code == 304
+
+    client.post(f"/books/{book_id}/reviews", json={"review": "Second review"})
+    response = client.get(f"/books/{book_id}/reviews", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert len(response.json()) == 2
+
+def test_search_books_ranks_title_matches_first(client):
+    client.post("/books/", json={"title": "Cooking Without Fire", "author": "Chef Author", "year": 2020,
+                                 "description": "A book about python snakes and campfire cooking"})
+    python_book = client.post("/books/", json={"title": "Python Recipes", "author": "Code Author", "year": 2021,
+                                               "description": "Practical programming recipes"}).json()
+
+    response = client.get("/books/search", params={"q": "python"})
+    assert response.status_code == 200
+    results = response.json()
+    assert [r["title"] for r in results] == ["Python Recipes", "Cooking Without Fire"]
+    assert "<b>Python</b>" in results[0]["snippet"]
+
+    # The index follows updates and deletes through its triggers
+    client.put(f"/books/{python_book['id']}", json={"title": "Rust Recipes", "author": "Code Author", "year": 2021,
+                                                   "description": "Practical programming recipes"})
+    assert [r["title"] for r in client.get("/books/search", params={"q": "python"}).json()] == ["Cooking Without Fire"]
+    client.delete(f"/books/{python_book['id']}")
+    assert client.get("/books/search", params={"q": "rust"}).json() == []
+
+def test_search_snippet_escapes_book_text(client):
+    client.post("/books/", json={"title": "Python <script>alert(1)</script>", "author": "Some Author", "year": 2020,
+                                 "description": "Markup & tags in a title"})
+
+    snippet = client.get("/books/search", params={"q": "python"}).json()[0]["snippet"]
+    assert "<script>" not in snippet
+    assert snippet.startswith("<b>Python</b> &lt;script&gt;")
+
+def test_search_books_treats_operators_literally(client):
+    client.post("/books/", json={"title": "Fish and Chips", "author": "Some Author", "year": 2020,
+                                 "description": "A classic British dish"})
+
+    assert client.get("/books/search", params={"q": 'fish AND "chips'}).status_code == 200
+    assert client.get("/books/search", params={"q": "   "}).status_code == 400
+
+def test_get_reviews_keyset_pagination_and_total_count(client):
+    app.dependency_overrides[required_user_role] = mock_required_admin_role
+    book_id, other_book_id = add_books(client, 2)
+    for i in range(5):
+        client.post(f"/books/{book_id}/reviews", json={"review": f"Review {i}"})
+    client.post(f"/books/{other_book_id}/reviews", json={"review": "Elsewhere"})
+
+    first = client.get(f"/books/{book_id}/reviews", params={"limit": 3})
+    assert first.status_code == 200
+    assert [r["review"] for r in first.json()] == ["Review 0", "Review 1", "Review 2"]
+    assert first.headers["X-Total-Count"] == "5"
+
+    second = client.get(f"/books/{book_id}/reviews", params={"limit": 3, "after": first.headers["X-Next-Cursor"]})
+    assert [r["review"] for r in second.json()] == ["Review 3", "Review 4"]
+    assert "X-Next-Cursor" not in second.headers
+
+    # The counter follows deletes
+    client.delete(f"/books/{book_id}/reviews/{second.json()[0]['id']}")
+    assert client.get(f"/books/{book_id}/reviews").headers["X-Total-Count"] == "4"
+
+def test_get_books_include_reviews_and_count(client):
+    app.dependency_overrides[required_user_role] = mock_required_admin_role
+    first_id, second_id = add_books(client, 2)
+    for i in range(3):
+        client.post(f"/books/{first_id}/reviews", json={"review": f"Review {i}"})
+
+    response = client.get("/books/", params={"include": "reviews,review_count", "reviews_limit": 2})
+    assert response.status_code == 200
+    first, second = response.json()
+    assert first["review_count"] == 3
+    assert [r["review"] for r in first["reviews"]] == ["Review 0", "Review 1"]
+    assert second["review_count"] == 0 and second["reviews"] == []
+
+    # Plain listings keep their shape, and a new review changes the included listing's ETag
+    assert "reviews" not in client.get("/books/").json()[0]
+    etag = response.headers["ETag"]
+    client.post(f"/books/{second_id}/reviews", json={"review": "Late review"})
+    assert client.get("/books/", params={"include": "reviews,review_count", "reviews_limit": 2},
+                      headers={"If-None-Match": etag}).status_code == 200
+
+def test_get_books_include_rejects_unknown_option(client):
+    assert client.get("/books/", params={"include": "authors"}).status_code == 400
+
+def test_get_books_fast_path_matches_response_model(client):
+    ids = add_books(client, 3)
+
+    response = client.get("/books/")
+
+    assert response.headers["content-type"] == "application/json"
+    expected = [BookResponse(id=book_id, title=f"Book Number {i}", author="Author", year=2020,
+                             description="Description").model_dump() for i, book_id in enumerate(ids)]
+    assert response.json() == expected
+    assert list(response.json()[0]) == list(BookResponse.model_fields)
+
+def test_get_books_sparse_fieldset(client):
+    ids = add_books(client, 2)
+
+    response = client.get("/books/", params={"fields": "title"})
+    assert response.status_code == 200
+    assert response.json() == [{"title": "Book Number 0", "id": ids[0]}, {"title": "Book Number 1", "id": ids[1]}]
+
+    book = client.get(f"/books/{ids[0]}", params={"fields": "id,year"})
+    assert book.json() == {"year": 2020, "id": ids[0]}
+    # A different representation of the same row gets its own ETag
+    assert book.headers["ETag"] != client.get(f"/books/{ids[0]}").headers["ETag"]
+
+    assert client.get("/books/", params={"fields": "title,version"}).status_code == 400
+    assert client.get(f"/books/{ids[0]}", params={"fields": "secret"}).status_code == 400
+
+def test_patch_book_changes_only_given_fields(client):
+    first_id, second_id = add_books(client, 2)
+    client.get(f"/books/{first_id}")  # warm the book cache
+
+    response = client.patch(f"/books/{first_id}", json={"author": "Patched Author"})
+    assert response.status_code == 200
+    assert response.json()["author"] == "Patched Author"
+    assert response.json()["title"] == "Book Number 0"
+    assert client.get(f"/books/{first_id}").json()["author"] == "Patched Author"
+
+    assert client.patch(f"/books/{first_id}", json={"title": "book number 1"}).status_code == 409
+    assert client.patch(f"/books/{first_id}", json={"title": None}).status_code == 422
+    assert client.patch("/books/999", json={"year": 1999}).status_code == 404
+
+def test_patch_review(client):
+    app.dependency_overrides[required_user_role] = mock_required_admin_role
+    book_id, other_book_id = add_books(client, 2)
+    review_id = client.post(f"/books/{book_id}/reviews", json={"review": "Draft"}).json()["id"]
+
+    response = client.patch(f"/books/{book_id}/reviews/{review_id}", json={"review": "Final"})
+    assert response.status_code == 200
+    assert response.json() == {"review": "Final", "id": review_id, "book_id": book_id}
+    # The review must belong to the book in the path
+    assert client.patch(f"/books/{other_book_id}/reviews/{review_id}", json={"review": "x"}).status_code == 404
+
+def test_bulk_delete_books(client):
+    app.dependency_overrides[required_user_role] = mock_required_admin_role
+    ids = add_books(client, 3)
+    client.post(f"/books/{ids[0]}/reviews", json={"review": "Gone with the book"})
+
+    response = client.delete("/books/", params={"ids": f"{ids[0]},{ids[1]},999"})
+    assert response.status_code == 200
+    assert response.json() == {"deleted": [ids[0], ids[1]], "not_found": [999]}
+    assert [book["id"] for book in client.get("/books/").json()] == [ids[2]]
+    assert client.get(f"/books/{ids[0]}/reviews").status_code == 404
+
+    assert client.delete("/books/", params={"ids": "one,two"}).status_code == 400
+
+@pytest.fixture()
+def replica(tmp_path, monkeypatch):
+    # A second SQLite file stands in for a replica; it holds different rows so reads can be told apart
+    url = f"sqlite:///{tmp_path / 'replica.db'}"
+    replica_engine = create_db_engine(url, pragmas={})
+    Base.metadata.create_all(bind=replica_engine)
+    with replica_engine.begin() as conn:
+        conn.execute(text("INSERT INTO books (title, author, year, description) VALUES "
+                          "('Replica Only Book', 'Author', 2020, 'Description')"))
+    replica_engine.dispose()
+    monkeypatch.setattr(db_dependencies, "read_replicas", ReplicaPool([url]))
+    return url
+
+def test_reads_go_to_replica_until_client_writes(client, replica):
+    assert [book["title"] for book in client.get("/books/").json()] == ["Replica Only Book"]
+
+    response = client.post("/books/", json={"title": "Primary Book", "author": "Author", "year": 2020,
+                                            "description": "Description"})
+    assert PRIMARY_PIN_COOKIE in response.cookies
+    # Read-your-writes: the client that wrote now reads from the primary
+    assert [book["title"] for book in client.get("/books/").json()] == ["Primary Book"]
+
+def test_unreachable_replica_falls_back_to_primary(client, monkeypatch, tmp_path):
+    pool = ReplicaPool([f"sqlite:///{tmp_path / 'missing' / 'replica.db'}"])
+    monkeypatch.setattr(db_dependencies, "read_replicas", pool)
+    add_books(client, 1)
+    client.cookies.clear()
+
+    assert [book["title"] for book in client.get("/books/").json()] == ["Book Number 0"]
+    assert pool.stats()[0]["healthy"] is False
+
+def test_replica_whose_query_fails_is_marked_down(client, monkeypatch, tmp_path):
+    # The file exists and connects, but has no tables
+    url = f"sqlite:///{tmp_path / 'empty.db'}"
+    empty_engine = create_db_engine(url, pragmas={})
+    with empty_engine.begin() as conn:
+        conn.execute(text("CREATE TABLE unrelated (x INTEGER)"))
+    empty_engine.dispose()
+    pool = ReplicaPool([url])
+    monkeypatch.setattr(db_dependencies, "read_replicas", pool)
+    add_books(client, 1)
+    client.cookies.clear()
+
+    with pytest.raises(OperationalError):
+        client.get("/books/")
+    assert pool.stats()[0]["healthy"] is False
+    # The next read skips the replica and is served by the primary
+    assert [book["title"] for book in client.get("/books/").json()] == ["Book Number 0"]
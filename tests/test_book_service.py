@@ -1,10 +1,15 @@
 import pytest
 from unittest.mock import Mock
 from fastapi import HTTPException
+from sqlalchemy.exc import IntegrityError
 from app.exceptions import ServiceException
-from app.services.book_service import BookService
-from app.models.book import BookInfo, Book
-from app.models.review import ReviewInfo
+from app.services.book_service import BookService, top_title_words
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import sessionmaker
+from app.models.book import Base, BookInfo, Book, count_title_words
+from app.models.review import Review, ReviewInfo
+from app.services.cache_service import InMemoryCache
+from app.services.review_service import ReviewService
 
 @pytest.fixture
 def mock_db():
@@ -14,6 +19,20 @@ def mock_db():
 def book_service(mock_db):
     return BookService(db=mock_db)
 
+@pytest.fixture
+def sqlite_db():
+    # In-memory database for methods whose logic lives in SQL rather than in Python
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    yield db
+    db.close()
+
+def add_titles(db, titles):
+    for title in titles:
+        db.add(Book(title=title, author="Author", year=2021, description="Description"))
+    db.commit()
+
 def test_get_books_returns_list(book_service, mock_db):
     # 1) Arrange
     # Mock the query so that calling .all() returns a list of Book objects
@@ -87,10 +106,25 @@ def test_add_new_book(book_service, mock_db):
     mock_db.refresh.assert_called_once()
     assert result.title == book_data.title
 
+def test_add_book_concurrent_duplicate_returns_conflict(book_service, mock_db):
+    book_data = BookInfo(title="Racy Book", author="Test Author", year=2021, description="Test Description")
+
+    # The pre-check finds nothing, but a concurrent insert trips the unique lower(title) index on commit
+    mock_db.query.return_value.filter.return_value.first.return_value = None
+    mock_db.commit.side_effect = IntegrityError("INSERT", {}, Exception("UNIQUE constraint failed"))
+
+    with pytest.raises(ServiceException) as exc_info:
+        book_service.add_book(book_data)
+
+    assert exc_info.value.status_code == 409
+    mock_db.rollback.assert_called_once()
+    mock_db.refresh.assert_not_called()
+
 def test_update_book(book_service, mock_db):
     book_id = 1
     existing_book = Mock()
     existing_book.id = book_id
+    existing_book.title = "Old Book"
     updated_data = BookInfo(title="Updated Book", author="Updated Author", year=2023, description="Updated Description")
     
     # side_effect usage:
@@ -106,21 +140,21 @@ def test_update_book(book_service, mock_db):
 
 def test_delete_book(book_service, mock_db):
     book_id = 1
-    existing_book = Mock()
-    existing_book.id = book_id
-    
-    mock_db.query.return_value.filter.return_value.first.return_value = existing_book
+    # DELETE ... RETURNING id, title reports the deleted row
+    mock_db.execute.return_value.all.return_value = [(book_id, "Old Book")]
     
     result = book_service.delete_book(book_id)
     
-    mock_db.delete.assert_called_once_with(existing_book)
+    # The book is never loaded; the delete is a single statement
+    mock_db.query.assert_not_called()
+    mock_db.delete.assert_not_called()
     mock_db.commit.assert_called_once()
     assert result is True
 
 def test_delete_nonexistent_book(book_service, mock_db):
     book_id = 1
     
-    mock_db.query.return_value.filter.return_value.first.return_value = None
+    mock_db.execute.return_value.all.return_value = []
     
     
     result = book_service.delete_book(book_id)
@@ -133,55 +167,115 @@ def test_delete_nonexistent_book(book_service, mock_db):
     mock_db.commit.assert_not_called()
 
 
-def test_count_longest_titles_one_longest_return1(book_service, mock_db):
+def test_get_book_read_through_cache(mock_db):
+    book_service = BookService(db=mock_db, cache=InMemoryCache())
+    mock_db.query.return_value.filter.return_value.first.return_value = Book(
+        id=1, title="Cached Book", author="Author", year=2021, description="Desc")
+
+    first = book_service.get_book(1)
+    second = book_service.get_book(1)
+
+    assert first.title == second.title == "Cached Book"
+    # The second lookup is answered by the cache
+    mock_db.query.assert_called_once_with(Book)
+
+def test_update_book_invalidates_cache(mock_db):
+    cache = InMemoryCache()
+    cache.set("book:1", {"id": 1, "title": "Stale", "author": "Author", "year": 2021, "description": "Desc"})
+    book_service = BookService(db=mock_db, cache=cache)
+    existing_book = Mock()
+    existing_book.id = 1
+    existing_book.title = "Stale"
+    mock_db.query.return_value.filter.return_value.first.side_effect = [existing_book, None]
+
+    book_service.update_book(1, BookInfo(title="Fresh Book", author="Author", year=2021, description="Description"))
+
+    assert cache.get("book:1") is None
+
+def test_delete_book_invalidates_cache(mock_db):
+    cache = InMemoryCache()
+    cache.set("book:1", {"id": 1, "title": "Stale", "author": "Author", "year": 2021, "description": "Desc"})
+    book_service = BookService(db=mock_db, cache=cache)
+    mock_db.execute.return_value.all.return_value = [(1, "Stale")]
+
+    assert book_service.delete_book(1) is True
+    assert cache.get("book:1") is None
+
+
+def test_count_longest_titles_one_longest_return1(sqlite_db):
     # 1) Arrange
-    # Prepare a mock 'books' repository that returns a specific list of Book objects
-    mock_db.query.return_value.all.return_value = [
-        Book(title="The Longest"),
-        Book(title="The Longest Title"),
-        Book(title="The Longest Title of Book"),
-    ]
+    # Word counts are stored on insert, so the statistic is computed by the database
+    book_service = BookService(sqlite_db)
+    add_titles(sqlite_db, ["The Longest", "The Longest Title", "The Longest Title of Book"])
 
     # 2) Act
     count = book_service.count_longest_book_titles()
 
     # 3) Assert
     assert count == 1
-    mock_db.query.assert_called_once()
 
 
-def test_count_longest_titles_two_longest_return2(book_service, mock_db):
+def test_count_longest_titles_two_longest_return2(sqlite_db):
     # 1) Arrange
-    mock_db.query.return_value.all.return_value = [
-        Book(title="The Longest"),
-        Book(title="The Longer Title of Book"),
-        Book(title="The Longest"),
-        Book(title="The Longest Title of Book"),
-    ]
+    book_service = BookService(sqlite_db)
+    add_titles(sqlite_db, ["The Longest", "The Longer Title of Book", "The Longest Again", "The Longest Title of Book"])
 
     # 2) Act
     count = book_service.count_longest_book_titles()
 
     # 3) Assert
     assert count == 2
-    mock_db.query.assert_called_once()
 
 
-def test_count_longest_titles_all_longest_return4(book_service, mock_db):
+def test_count_longest_titles_all_longest_return4(sqlite_db):
     # 1) Arrange
-    mock_db.query.return_value.all.return_value = [
-        Book(title="The Long Book"),
-        Book(title="The Longer Book"),
-        Book(title="The Longerer Book"),
-        Book(title="The Longest Book"),
-    ]
+    book_service = BookService(sqlite_db)
+    add_titles(sqlite_db, ["The Long Book", "The Longer Book", "The Longerer Book", "The Longest Book"])
 
     # 2) Act
     count = book_service.count_longest_book_titles()
 
     # 3) Assert
     assert count == 4
-    mock_db.query.assert_called_once()
+
+
+def test_count_longest_titles_empty_table_return0(sqlite_db):
+    assert BookService(sqlite_db).count_longest_book_titles() == 0
+
+
+def test_count_longest_titles_follows_title_updates(sqlite_db):
+    book_service = BookService(sqlite_db)
+    add_titles(sqlite_db, ["Short Title", "A Much Longer Title"])
+    short_book = sqlite_db.query(Book).filter(Book.title == "Short Title").first()
+
+    book_service.update_book(short_book.id, BookInfo(
+        title="Now The Longest Title", author="Author", year=2021, description="Description"))
+
+    assert book_service.count_longest_book_titles() == 2
+
+
+def legacy_title_word_count(s: str) -> int:
+    # The character loop count_longest_book_titles used before word counts were stored
+    count = 0
+    found = False
+    eol = len(s) - 1
+    for i in range(len(s)):
+        if i != eol and s[i].isalpha():
+            found = True
+        elif (not s[i].isalpha()) and found:
+            count += 1
+            found = False
+        elif s[i].isalpha() and i == eol:
+            count += 1
+    return count
+
+
+@pytest.mark.parametrize("title", [
+    "", "A", "ab", " a", "a ", "The Longest Title", "  Spaced   out  ", "C3PO and R2D2",
+    "Don't Panic!", "Café au lait", "1984", "x-y-z",
+])
+def test_count_title_words_matches_legacy_loop(title):
+    assert count_title_words(title) == legacy_title_word_count(title)
 
 
 def test_get_most_common_words_in_titles_return_empty_map(book_service, mock_db):
@@ -205,27 +299,187 @@ def test_get_most_common_words_in_titles_return_empty_map(book_service, mock_db)
     assert actual == expected
     mock_db.assert_not_called()
 
-def test_get_most_common_words_in_titles_sort_by_word_count(book_service, mock_db):
+def add_books_through_service(book_service, titles):
+    for title in titles:
+        book_service.add_book(BookInfo(title=title, author="Author", year=2021, description="Description"))
+
+def test_get_most_common_words_in_titles_sort_by_word_count(sqlite_db):
     # 1) Arrange
-    mock_db.query.return_value.all.return_value = [
-        Book(title="Book book book"),
-        Book(title="Title title"),
-        Book(title="Word word word word")
-    ]
-    book_service = BookService(mock_db)
+    book_service = BookService(sqlite_db)
+    add_books_through_service(book_service, ["Book book book", "Title title", "Word word word word"])
 
     # 2) Act
     actual = book_service.get_most_common_words_in_titles(2)
 
     # 3) Assert
-    # In these titles:
-    #  - "book" appears 3 times
-    #  - "word" appears 4 times
-    #  - "title" appears 2 times
-    # The top-2 by frequency: word(4), book(3)
-    # Return them in a dict: {"word": 4, "book": 3}
-    # Then check that the code returns exactly that.
+    # "word" appears 4 times, "book" 3 times and "title" 2 times, so the top 2 are word(4), book(3)
     expected = {"word": 4, "book": 3}
     assert actual == expected
+    assert list(actual) == ["word", "book"]
+
+def test_get_most_common_words_in_titles_ties_sorted_alphabetically(sqlite_db):
+    book_service = BookService(sqlite_db)
+    add_books_through_service(book_service, ["Zebra Apple", "Mango apple", "zebra Kiwi"])
+
+    assert book_service.get_most_common_words_in_titles(3) == {"apple": 2, "zebra": 2, "kiwi": 1}
+
+def test_get_most_common_words_in_titles_follows_updates_and_deletes(sqlite_db):
+    book_service = BookService(sqlite_db)
+    add_books_through_service(book_service, ["Python Basics", "Python Tricks", "Go Basics"])
+    tricks = sqlite_db.query(Book).filter(Book.title == "Python Tricks").first()
+    go = sqlite_db.query(Book).filter(Book.title == "Go Basics").first()
+
+    book_service.update_book(tricks.id, BookInfo(title="Rust Tricks", author="Author", year=2021, description="Description"))
+    book_service.delete_book(go.id)
+
+    assert book_service.get_most_common_words_in_titles(10) == {"basics": 1, "python": 1, "rust": 1, "tricks": 1}
+
+def test_get_most_common_words_in_titles_matches_full_recount(sqlite_db):
+    book_service = BookService(sqlite_db)
+    add_books_through_service(book_service, ["The Art of Python", "The Python Guide", "Modern Web Guide"])
+    book_service.add_books_bulk([{"title": "The Data Guide", "author": "Author", "year": 2021}])
+
+    titles = [book.title for book in sqlite_db.query(Book).all()]
+    assert book_service.get_most_common_words_in_titles(5) == top_title_words(titles, 5)
+
+def test_top_title_words_heap_order():
+    titles = ["b a", "c b", "a c b"]
+    assert top_title_words(titles, 2) == {"b": 3, "a": 2}
+    assert top_title_words([], 2) == {}
+
+def test_search_books_requires_every_word(sqlite_db):
+    book_service = BookService(sqlite_db)
+    add_books_through_service(book_service, ["Python Web Guide", "Python Data Guide", "Web Design"])
+
+    results = book_service.search_books("python web", limit=10)
+
+    assert [r["title"] for r in results] == ["Python Web Guide"]
+    assert results[0]["rank"] < 0
+
+def test_get_books_page_including_costs_two_queries(sqlite_db):
+    book_service = BookService(sqlite_db)
+    add_books_through_service(book_service, [f"Book Number {i}" for i in range(20)])
+    for book in sqlite_db.query(Book).all():
+        sqlite_db.add_all([Review(book_id=book.id, review=f"Review {i}") for i in range(4)])
+    sqlite_db.commit()
+    sqlite_db.expire_all()
+
+    statements = []
+    event.listen(sqlite_db.bind, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    page = book_service.get_books_page_including(20, reviews_per_book=3, review_count=True)
 
-    mock_db.query.assert_called_once()
\ No newline at end of file
+    assert len(statements) == 2
+    assert all(len(item["reviews"]) == 3 and item["review_count"] == 4 for item in page)
+
+def test_get_books_page_rows_projects_only_requested_columns(sqlite_db):
+    book_service = BookService(sqlite_db)
+    add_books_through_service(book_service, ["Python Web Guide"])
+    statements = []
+    event.listen(sqlite_db.bind, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+    rows = book_service.get_books_page_rows(10, fields=["title"])
+
+    assert rows == [{"title": "Python Web Guide", "id": 1}]
+    assert "description" not in statements[-1]
+
+def test_get_book_fields_uses_cached_row(mock_db):
+    cache = InMemoryCache()
+    cache.set("book:1", {"id": 1, "title": "Cached", "author": "Author", "year": 2021, "description": "Desc"})
+    book_service = BookService(db=mock_db, cache=cache)
+
+    assert book_service.get_book_fields(1, ["title"]) == {"title": "Cached", "id": 1}
+    mock_db.execute.assert_not_called()
+
+def test_patch_book_is_one_statement_unless_title_changes(sqlite_db):
+    book_service = BookService(sqlite_db)
+    add_books_through_service(book_service, ["Python Web Guide"])
+    statements = []
+    event.listen(sqlite_db.bind, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+    patched = book_service.patch_book(1, {"year": 1999})
+    assert patched["year"] == 1999
+    assert len(statements) == 1 and statements[0].startswith("UPDATE books")
+
+    statements.clear()
+    patched = book_service.patch_book(1, {"title": "Rust Web Guide"})
+    assert patched["title"] == "Rust Web Guide"
+    assert sqlite_db.get(Book, 1).title_word_count == 3
+    assert book_service.get_most_common_words_in_titles(10) == {"guide": 1, "rust": 1, "web": 1}
+
+@pytest.fixture
+def two_sessions(tmp_path):
+    # Two connections to one file, for writes that race each other
+    engine = create_engine(f"sqlite:///{tmp_path / 'books.db'}")
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    first, second = Session(), Session()
+    yield first, second
+    first.close()
+    second.close()
+
+def test_patch_book_title_conflicts_with_a_concurrent_rename(two_sessions, monkeypatch):
+    first, second = two_sessions
+    book_service = BookService(first)
+    add_books_through_service(book_service, ["Python Web Guide"])
+    read_title = first.scalar
+
+    def rename_after_read(statement):
+        # Another request renames the book between the old-title read and the UPDATE
+        old_title = read_title(statement)
+        BookService(second).patch_book(1, {"title": "Go Web Guide"})
+        return old_title
+    monkeypatch.setattr(first, "scalar", rename_after_read)
+
+    with pytest.raises(ServiceException) as exc_info:
+        book_service.patch_book(1, {"title": "Rust Web Guide"})
+
+    assert exc_info.value.status_code == 409
+    assert book_service.get_book_fields(1)["title"] == "Go Web Guide"
+    assert book_service.get_most_common_words_in_titles(10) == {"go": 1, "guide": 1, "web": 1}
+
+def test_update_book_conflicts_with_a_concurrent_rename(two_sessions, monkeypatch):
+    first, second = two_sessions
+    book_service = BookService(first)
+    add_books_through_service(book_service, ["Python Web Guide"])
+    load_row = book_service._get_book_row
+
+    def rename_after_load(book_id):
+        book = load_row(book_id)
+        BookService(second).patch_book(book_id, {"title": "Go Web Guide"})
+        return book
+    monkeypatch.setattr(book_service, "_get_book_row", rename_after_load)
+
+    with pytest.raises(ServiceException) as exc_info:
+        book_service.update_book(1, BookInfo(title="Rust Web Guide", author="Author", year=2021, description="Description"))
+
+    assert exc_info.value.status_code == 409
+    assert book_service.get_book_fields(1)["title"] == "Go Web Guide"
+    assert book_service.get_most_common_words_in_titles(10) == {"go": 1, "guide": 1, "web": 1}
+
+def test_delete_books_cascades_to_reviews_in_the_database(sqlite_db):
+    sqlite_db.execute(text("PRAGMA foreign_keys=ON"))
+    book_service = BookService(sqlite_db)
+    add_books_through_service(book_service, ["Python Basics", "Python Tricks", "Go Basics"])
+    sqlite_db.add_all([Review(book_id=book_id, review=f"Review {i}") for book_id in (1, 2, 3) for i in range(50)])
+    sqlite_db.commit()
+    statements = []
+    event.listen(sqlite_db.bind, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+    assert book_service.delete_books([1, 2, 99]) == [1, 2]
+
+    assert not any(statement.startswith(("SELECT reviews", "DELETE FROM reviews")) for statement in statements)
+    assert sqlite_db.query(Review).filter(Review.book_id.in_([1, 2])).count() == 0
+    assert sqlite_db.query(Review).count() == 50
+    assert book_service.get_most_common_words_in_titles(10) == {"basics": 1, "go": 1}
+
+def test_add_review_checks_the_database_not_the_book_cache(sqlite_db):
+    cache = InMemoryCache()
+    book_id = BookService(sqlite_db, cache).add_book(
+        BookInfo(title="Python Web Guide", author="Author", year=2021, description="Description")).id
+    BookService(sqlite_db, cache).get_book(book_id)
+    # Deleted by another worker: this process's cache still has the book
+    sqlite_db.execute(text("DELETE FROM books WHERE id = :id"), {"id": book_id})
+    sqlite_db.commit()
+
+    assert BookService(sqlite_db, cache).get_book(book_id) is not None
+    assert ReviewService(sqlite_db).add_review(book_id, ReviewInfo(review="Great read")) is None
@@ -0,0 +1,49 @@
+from unittest.mock import patch
+from app.services.cache_service import InMemoryCache, RedisCache
+
+def test_get_returns_cached_value():
+    cache = InMemoryCache(max_size=10, ttl_seconds=60)
+    cache.set("book:1", {"id": 1})
+
+    assert cache.get("book:1") == {"id": 1}
+    assert cache.get("book:2") is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+def test_entries_expire_after_ttl():
+    cache = InMemoryCache(max_size=10, ttl_seconds=60)
+    with patch("app.services.cache_service.time.monotonic", return_value=1000.0):
+        cache.set("book:1", {"id": 1})
+    with patch("app.services.cache_service.time.monotonic", return_value=1061.0):
+        assert cache.get("book:1") is None
+
+def test_least_recently_used_entry_is_evicted():
+    cache = InMemoryCache(max_size=2, ttl_seconds=60)
+    cache.set("book:1", {"id": 1})
+    cache.set("book:2", {"id": 2})
+    cache.get("book:1")
+    cache.set("book:3", {"id": 3})
+
+    assert cache.get("book:2") is None
+    assert cache.get("book:1") == {"id": 1}
+    assert cache.stats()["evictions"] == 1
+
+def test_delete_removes_entries():
+    cache = InMemoryCache(max_size=10, ttl_seconds=60)
+    cache.set("book:1", {"id": 1})
+    cache.set("book:2", {"id": 2})
+    cache.delete("book:1", "book:2")
+
+    assert cache.get("book:1") is None
+    assert cache.get("book:2") is None
+
+def test_unreachable_redis_behaves_as_an_empty_cache():
+    # Nothing listens on port 1, so every command fails to connect
+    cache = RedisCache(url="redis://127.0.0.1:1/0")
+
+    cache.set("book:1", {"id": 1})
+    assert cache.get("book:1") is None
+    cache.delete("book:1")
+
+    stats = cache.stats()
+    assert (stats["misses"], stats["errors"], stats["evictions"]) == (1, 3, None)
@@ -0,0 +1,116 @@
+import time
+import pytest
+from unittest.mock import Mock, patch
+from fastapi.security import HTTPAuthorizationCredentials
+from app.exceptions import ServiceException
+from app.services.cognito_service import CognitoService, JwksCache, TokenCache, get_cognito_service
+
+JWKS_URL = "https://cognito-idp.test.amazonaws.com/pool/.well-known/jwks.json"
+
+def jwks_response(*kids, status_code=200):
+    response = Mock()
+    response.status_code = status_code
+    response.json.return_value = {"keys": [{"kid": kid, "kty": "RSA"} for kid in kids]}
+    return response
+
+@pytest.fixture
+def mock_get():
+    with patch("app.services.cognito_service.requests.get") as mock_get:
+        yield mock_get
+
+def test_keys_are_fetched_once(mock_get):
+    mock_get.return_value = jwks_response("key1", "key2")
+    cache = JwksCache(JWKS_URL)
+
+    assert cache.get_key("key1")["kid"] == "key1"
+    assert cache.get_key("key2")["kid"] == "key2"
+    assert cache.get_key("key1")["kid"] == "key1"
+
+    mock_get.assert_called_once()
+
+def test_unknown_kid_forces_refetch(mock_get):
+    mock_get.side_effect = [jwks_response("key1"), jwks_response("key1", "key2")]
+    cache = JwksCache(JWKS_URL, min_refetch_seconds=0)
+
+    cache.get_key("key1")
+    version = cache.version
+    key = cache.get_key("key2")
+
+    assert key["kid"] == "key2"
+    assert mock_get.call_count == 2
+    assert cache.version == version + 1
+
+def test_unknown_kid_refetch_is_rate_limited(mock_get):
+    mock_get.return_value = jwks_response("key1")
+    cache = JwksCache(JWKS_URL, min_refetch_seconds=60)
+
+    cache.get_key("key1")
+    assert cache.get_key("forged") is None
+    assert cache.get_key("forged") is None
+
+    mock_get.assert_called_once()
+
+def test_fetch_failure_raises_service_exception(mock_get):
+    mock_get.return_value = jwks_response(status_code=503)
+    cache = JwksCache(JWKS_URL)
+
+    with pytest.raises(ServiceException) as exc_info:
+        cache.get_key("key1")
+
+    assert exc_info.value.status_code == 500
+
+def test_cognito_service_is_shared_and_lazy(mock_get):
+    service = get_cognito_service()
+
+    assert get_cognito_service() is service
+    mock_get.assert_not_called()
+
+def test_token_cache_hit_and_miss():
+    cache = TokenCache()
+    claims = {"sub": "user1", "exp": time.time() + 60}
+
+    assert cache.get("token", jwks_version=1) is None
+    cache.put("token", claims, jwks_version=1)
+
+    assert cache.get("token", jwks_version=1) == claims
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+def test_token_cache_entry_expires_with_token():
+    cache = TokenCache()
+    cache.put("token", {"exp": time.time() - 1}, jwks_version=1)
+
+    assert cache.get("token", jwks_version=1) is None
+    assert cache.stats()["size"] == 0
+
+def test_token_cache_flushed_on_jwks_rotation():
+    cache = TokenCache()
+    cache.put("token", {"exp": time.time() + 60}, jwks_version=1)
+
+    assert cache.get("token", jwks_version=2) is None
+
+def test_token_cache_evicts_least_recently_used():
+    cache = TokenCache(max_size=2)
+    exp = time.time() + 60
+    cache.put("a", {"exp": exp}, jwks_version=1)
+    cache.put("b", {"exp": exp}, jwks_version=1)
+    cache.get("a", jwks_version=1)
+    cache.put("c", {"exp": exp}, jwks_version=1)
+
+    assert cache.get("b", jwks_version=1) is None
+    assert cache.get("a", jwks_version=1) is not None
+    assert cache.get("c", jwks_version=1) is not None
+
+def test_validate_token_skips_verification_for_repeat_token(mock_get):
+    mock_get.return_value = jwks_response("key1")
+    service = CognitoService()
+    auth = HTTPAuthorizationCredentials(scheme="Bearer", credentials="header.payload.signature")
+    claims = {"sub": "user1", "cognito:groups": ["Users"], "exp": time.time() + 60}
+
+    with patch("app.services.cognito_service.jwt.get_unverified_header", return_value={"kid": "key1"}), \
+         patch("app.services.cognito_service.jwt.decode", return_value=claims) as mock_decode:
+        assert service.validate_token(auth) == claims
+        assert service.validate_token(auth) == claims
+
+    mock_decode.assert_called_once()
+    assert service.token_cache.stats()["hits"] == 1
@@ -0,0 +1,71 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.pool import NullPool, QueuePool, StaticPool
+from app.db.db import ReplicaPool, create_db_engine
+
+def pragma(engine, name):
+    with engine.connect() as conn:
+        return conn.execute(text(f"PRAGMA {name}")).scalar()
+
+def test_sqlite_profile_pragmas_applied(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'profile.db'}", pragmas={
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -2000,
+        "busy_timeout": 1234,
+    })
+
+    assert pragma(engine, "journal_mode") == "wal"
+    # synchronous=NORMAL is reported as 1
+    assert pragma(engine, "synchronous") == 1
+    assert pragma(engine, "cache_size") == -2000
+    assert pragma(engine, "busy_timeout") == 1234
+    assert isinstance(engine.pool, QueuePool)
+
+def test_sqlite_rollback_journal_uses_no_pool(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'journal.db'}", pragmas={"journal_mode": "DELETE"})
+
+    assert pragma(engine, "journal_mode") == "delete"
+    assert isinstance(engine.pool, NullPool)
+
+def test_sqlite_in_memory_shares_one_connection():
+    engine = create_db_engine("sqlite://", pragmas={})
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE t (x INTEGER)"))
+
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT count(*) FROM t")).scalar() == 0
+    assert isinstance(engine.pool, StaticPool)
+
+def test_replica_pool_round_robin_skips_replicas_marked_down(tmp_path):
+    pool = ReplicaPool([f"sqlite:///{tmp_path / name}" for name in ("a.db", "b.db", "c.db")], retry_seconds=60)
+
+    assert pool.candidates() == [0, 1, 2]
+    assert pool.candidates() == [1, 2, 0]
+    pool.mark_down(2)
+    assert pool.candidates() == [0, 1]
+    assert [replica["healthy"] for replica in pool.stats()] == [True, True, False]
+
+def test_replica_sessions_are_read_only(tmp_path):
+    url = f"sqlite:///{tmp_path / 'replica.db'}"
+    assert pragma(create_db_engine(url, pragmas={"journal_mode": "DELETE"}), "journal_mode") == "delete"
+    pool = ReplicaPool([url])
+    db = pool.session(0)
+
+    assert db.info["replica"].endswith("replica.db")
+    assert db.execute(text("PRAGMA query_only")).scalar() == 1
+    # Opening the replica did not switch it to WAL, which would have written to the file
+    assert db.execute(text("PRAGMA journal_mode")).scalar() == "delete"
+    with pytest.raises(OperationalError):
+        db.execute(text("CREATE TABLE t (x INTEGER)"))
+    db.close()
+
+def test_missing_replica_file_is_not_created(tmp_path):
+    pool = ReplicaPool([f"sqlite:///{tmp_path / 'missing.db'}"])
+    db = pool.session(0)
+
+    with pytest.raises(OperationalError):
+        db.connection()
+    db.close()
+    assert not (tmp_path / "missing.db").exists()
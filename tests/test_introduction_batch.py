@@ -0,0 +1,157 @@
+import asyncio
+import httpx
+import openai
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, Mock
+from sqlalchemy.orm import sessionmaker
+from app.db.db import create_db_engine
+from app.models.book import Base, Book
+from app.models.book_introduction import BookIntroduction, IntroductionBatchRequest
+from app.services.introduction_batch import IntroductionBatchRunner, RateLimiter, TokenBucket, retry_delay
+from app.services.introduction_service import IntroductionService
+
+def make_session_factory(books: int = 5):
+    engine = create_db_engine("sqlite://", pragmas={"foreign_keys": "ON"})
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(bind=engine)
+    with session_factory() as db:
+        db.add_all([Book(title=f"Book Number {i}", author="Author" if i % 2 else "Other Author", year=2021,
+                         description="Description") for i in range(books)])
+        db.commit()
+    return session_factory
+
+def rate_limit_error(headers: dict) -> openai.RateLimitError:
+    request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+    return openai.RateLimitError("Rate limit reached", response=httpx.Response(429, headers=headers, request=request),
+                                 body=None)
+
+def fake_client(failures: int = 0):
+    # The first `failures` calls are rejected with a 429 asking for a 10 ms wait
+    client = Mock()
+    client.with_options.return_value = client
+    calls = 0
+
+    async def create(**kwargs):
+        nonlocal calls
+        calls += 1
+        if calls <= failures:
+            raise rate_limit_error({"retry-after-ms": "10"})
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=f"Introduction {calls}"))])
+    client.chat.completions.create = AsyncMock(side_effect=create)
+    return client
+
+def run_job(runner: IntroductionBatchRunner, batch: IntroductionBatchRequest):
+    async def run():
+        job = runner.submit(batch)
+        await job.task
+        return job
+    return asyncio.run(run())
+
+def test_batch_generates_and_stores_every_selected_book():
+    session_factory = make_session_factory()
+    client = fake_client(failures=2)
+    runner = IntroductionBatchRunner(client, session_factory, limiter=RateLimiter(rpm=10000, tpm=10 ** 8),
+                                     concurrency=3, write_size=2)
+
+    job = run_job(runner, IntroductionBatchRequest(book_ids=[1, 2, 3, 99]))
+
+    status = job.to_dict()
+    assert status["status"] == "completed"
+    assert (status["total"], status["generated"], status["stored"], status["failed"]) == (3, 3, 3, 0)
+    assert status["not_found"] == [99]
+    # The two 429s were retried rather than counted as failures
+    assert client.chat.completions.create.call_count == 5
+    client.with_options.assert_called_once_with(max_retries=0)
+    with session_factory() as db:
+        assert sorted(book_id for (book_id,) in db.query(BookIntroduction.book_id)) == [1, 2, 3]
+
+def test_filter_and_missing_only_skip_stored_introductions():
+    session_factory = make_session_factory()
+    runner = IntroductionBatchRunner(fake_client(), session_factory, limiter=RateLimiter(rpm=10000, tpm=10 ** 8))
+
+    first = run_job(runner, IntroductionBatchRequest(book_ids=[2]))
+    second = run_job(runner, IntroductionBatchRequest(author="Author"))
+
+    assert first.generated == 1
+    assert (second.total, second.skipped, second.generated) == (2, 1, 1)
+    with session_factory() as db:
+        assert db.query(BookIntroduction).count() == 2
+
+def test_calls_that_keep_failing_are_reported_per_book():
+    session_factory = make_session_factory(books=1)
+    runner = IntroductionBatchRunner(fake_client(failures=10), session_factory,
+                                     limiter=RateLimiter(rpm=10000, tpm=10 ** 8), max_attempts=2)
+
+    job = run_job(runner, IntroductionBatchRequest())
+
+    assert (job.status, job.failed, job.stored) == ("completed", 1, 0)
+    assert "Rate limit reached" in job.errors[1]
+
+def test_token_bucket_refills_at_its_per_minute_rate():
+    now = 0.0
+    bucket = TokenBucket(per_minute=600, clock=lambda: now)
+
+    bucket.take(600)
+    assert bucket.wait_time(10) == 1.0
+    now = 0.5
+    assert bucket.wait_time(10) == 0.5
+    # A request larger than the bucket waits for a full bucket instead of forever
+    assert bucket.wait_time(6000) == 59.5
+
+def test_retry_delay_prefers_the_server_hint():
+    assert retry_delay(rate_limit_error({"retry-after": "2"}), attempt=0) == 2.0
+    assert retry_delay(rate_limit_error({"retry-after-ms": "250"}), attempt=0) == 0.25
+    assert 0 <= retry_delay(rate_limit_error({}), attempt=3, base=1, maximum=60) <= 8
+
+def test_regenerating_replaces_stored_introductions():
+    session_factory = make_session_factory(books=2)
+    runner = IntroductionBatchRunner(fake_client(), session_factory, limiter=RateLimiter(rpm=10000, tpm=10 ** 8))
+
+    run_job(runner, IntroductionBatchRequest(book_ids=[1]))
+    again = run_job(runner, IntroductionBatchRequest(book_ids=[1], missing_only=False))
+
+    assert (again.generated, again.stored) == (1, 1)
+    with session_factory() as db:
+        assert [row.introduction for row in db.query(BookIntroduction)] == ["Introduction 2"]
+
+def test_rows_of_deleted_books_are_not_counted_as_stored():
+    session_factory = make_session_factory(books=2)
+    with session_factory() as db:
+        books = db.query(Book).order_by(Book.id).all()
+        db.expunge_all()
+        db.execute(Book.__table__.delete().where(Book.id == 2))
+        db.commit()
+        service = IntroductionService(db, client=fake_client())
+
+        assert service.store_many([(books[0], "First"), (books[1], "Orphan")]) == 1
+        assert db.query(BookIntroduction).count() == 1
+
+def test_failed_write_stops_the_other_workers(monkeypatch):
+    session_factory = make_session_factory(books=10)
+    client = fake_client()
+    runner = IntroductionBatchRunner(client, session_factory, limiter=RateLimiter(rpm=10000, tpm=10 ** 8),
+                                     concurrency=3, write_size=1)
+
+    store_many = IntroductionService.store_many
+    writes = 0
+
+    def fail_first_write(self, introductions):
+        nonlocal writes
+        writes += 1
+        if writes == 1:
+            raise RuntimeError("disk I/O error")
+        return store_many(self, introductions)
+    monkeypatch.setattr(IntroductionService, "store_many", fail_first_write)
+
+    async def run():
+        job = runner.submit(IntroductionBatchRequest())
+        await job.task
+        calls = client.chat.completions.create.call_count
+        # Give any worker still running after the job ended the chance to make another call
+        await asyncio.sleep(0.05)
+        return job, calls
+
+    job, calls = asyncio.run(run())
+
+    assert (job.status, job.error) == ("failed", "disk I/O error")
+    assert client.chat.completions.create.call_count == calls < 10
@@ -0,0 +1,186 @@
+import asyncio
+import pytest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, Mock
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+from app.db.db import create_db_engine
+from app.dependencies.sse import sse_deltas
+from app.models.book import Base, Book, BookInfo
+from app.models.book_introduction import BookIntroduction
+from app.services.book_service import BookService
+from app.services.introduction_service import IntroductionService
+
+@pytest.fixture
+def sqlite_db():
+    engine = create_db_engine("sqlite://", pragmas={"foreign_keys": "ON"})
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    yield db
+    db.close()
+
+@pytest.fixture
+def fake_client():
+    # Stands in for openai.AsyncOpenAI: every call returns a differently numbered introduction
+    client = Mock()
+    client.chat.completions.create = AsyncMock()
+    client.chat.completions.create.side_effect = lambda **kwargs: SimpleNamespace(choices=[
+        SimpleNamespace(message=SimpleNamespace(content=f"Introduction {client.chat.completions.create.call_count}"))
+    ])
+    return client
+
+@pytest.fixture
+def book(sqlite_db):
+    return BookService(sqlite_db).add_book(
+        BookInfo(title="Python Web Guide", author="Author", year=2021, description="Description"))
+
+def test_second_request_is_served_from_the_cache(sqlite_db, fake_client, book):
+    service = IntroductionService(sqlite_db, client=fake_client)
+
+    assert asyncio.run(service.introduce(book)) == ("Introduction 1", False)
+    assert asyncio.run(service.introduce(book)) == ("Introduction 1", True)
+    assert fake_client.chat.completions.create.call_count == 1
+
+def test_book_update_invalidates_the_cached_introduction(sqlite_db, fake_client, book):
+    service = IntroductionService(sqlite_db, client=fake_client)
+    asyncio.run(service.introduce(book))
+
+    BookService(sqlite_db).patch_book(book.id, {"description": "A new description"})
+
+    assert sqlite_db.query(BookIntroduction).count() == 0
+    sqlite_db.refresh(book)
+    assert asyncio.run(service.introduce(book)) == ("Introduction 2", False)
+
+def test_prompt_version_is_part_of_the_key(sqlite_db, fake_client, book):
+    asyncio.run(IntroductionService(sqlite_db, client=fake_client).introduce(book))
+
+    second_version = IntroductionService(sqlite_db, client=fake_client, prompt_version="2")
+    assert asyncio.run(second_version.introduce(book)) == ("Introduction 2", False)
+
+def test_only_a_missing_table_reads_as_an_empty_cache(sqlite_db, fake_client, book, monkeypatch):
+    service = IntroductionService(sqlite_db, client=fake_client)
+    sqlite_db.execute(text("DROP TABLE book_introductions"))
+
+    assert service.get_cached(book) is None
+    assert service.cached_keys([service.cache_key(book)]) == set()
+
+    def locked(*args, **kwargs):
+        raise OperationalError("SELECT", {}, Exception("database is locked"))
+    monkeypatch.setattr(sqlite_db, "scalar", locked)
+    monkeypatch.setattr(sqlite_db, "scalars", locked)
+    with pytest.raises(OperationalError):
+        service.get_cached(book)
+    with pytest.raises(OperationalError):
+        service.cached_keys([service.cache_key(book)])
+
+def test_deleting_the_book_deletes_its_introductions(sqlite_db, fake_client, book):
+    asyncio.run(IntroductionService(sqlite_db, client=fake_client).introduce(book))
+
+    BookService(sqlite_db).delete_book(book.id)
+
+    assert sqlite_db.query(BookIntroduction).count() == 0
+
+def test_concurrent_generations_share_the_event_loop(sqlite_db, book):
+    # Each call waits on the network rather than holding a thread, so ten run in about one call's time
+    client = Mock()
+
+    async def slow_completion(**kwargs):
+        await asyncio.sleep(0.2)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="Introduction"))])
+    client.chat.completions.create = slow_completion
+    service = IntroductionService(sqlite_db, client=client)
+
+    async def generate_many():
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        await asyncio.gather(*(service.generate(book) for _ in range(10)))
+        return loop.time() - start
+
+    assert asyncio.run(generate_many()) < 1.0
+
+class FakeStream:
+    """Stands in for openai.AsyncStream: yields one chunk per piece and records whether it was closed."""
+    def __init__(self, pieces):
+        self.pieces = pieces
+        self.closed = False
+
+    async def __aiter__(self):
+        for piece in self.pieces:
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=piece))])
+
+    async def close(self):
+        self.closed = True
+
+def streaming_client(stream):
+    client = Mock()
+    client.chat.completions.create = AsyncMock(return_value=stream)
+    return client
+
+def test_completed_stream_is_stored(sqlite_db, book):
+    stream = FakeStream(["An ", "introduction", None])
+    service = IntroductionService(sqlite_db, client=streaming_client(stream))
+
+    async def collect():
+        return [delta async for delta in service.generate_stream(book)]
+
+    assert asyncio.run(collect()) == ["An ", "introduction"]
+    assert stream.closed
+    assert service.get_cached(book) == "An introduction"
+
+def test_abandoned_stream_is_closed_and_not_stored(sqlite_db, book):
+    stream = FakeStream(["An ", "introduction"])
+    service = IntroductionService(sqlite_db, client=streaming_client(stream))
+
+    async def read_first_delta():
+        deltas = service.generate_stream(book)
+        first = await deltas.__anext__()
+        await deltas.aclose()
+        return first
+
+    assert asyncio.run(read_first_delta()) == "An "
+    assert stream.closed
+    assert service.get_cached(book) is None
+
+def test_sse_stops_when_the_client_disconnects(sqlite_db, book):
+    stream = FakeStream(["An ", "introduction"])
+    service = IntroductionService(sqlite_db, client=streaming_client(stream))
+    request = Mock()
+    request.is_disconnected = AsyncMock(side_effect=[False, True])
+
+    async def collect():
+        return [event async for event in sse_deltas(request, service.generate_stream(book), {"book_id": book.id})]
+
+    assert asyncio.run(collect()) == [b'data: {"delta":"An "}\n\n']
+    assert stream.closed
+    assert service.get_cached(book) is None
+
+def test_concurrent_misses_share_one_generation(sqlite_db, book):
+    client = Mock()
+
+    async def slow_completion(**kwargs):
+        await asyncio.sleep(0.05)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="Introduction"))])
+    client.chat.completions.create = AsyncMock(side_effect=slow_completion)
+    service = IntroductionService(sqlite_db, client=client)
+
+    async def introduce_many():
+        return await asyncio.gather(*(service.introduce(book) for _ in range(5)))
+
+    assert asyncio.run(introduce_many()) == [("Introduction", False)] * 5
+    assert client.chat.completions.create.call_count == 1
+
+def test_concurrent_streams_share_one_generation(sqlite_db, book):
+    stream = FakeStream(["An ", "introduction"])
+    client = streaming_client(stream)
+    service = IntroductionService(sqlite_db, client=client)
+
+    async def collect():
+        return "".join([delta async for delta in service.shared_stream(book)])
+
+    async def stream_many():
+        return await asyncio.gather(*(collect() for _ in range(3)))
+
+    assert asyncio.run(stream_many()) == ["An introduction"] * 3
+    assert client.chat.completions.create.call_count == 1
+    assert service.get_cached(book) == "An introduction"
@@ -0,0 +1,74 @@
+import asyncio
+from sqlalchemy.orm import sessionmaker
+from app.db.db import create_db_engine
+from app.models.book import Base, Book
+from app.models.review import Review, ReviewInfo
+from app.services.review_batcher import ReviewWriteBatcher
+
+def make_session_factory():
+    engine = create_db_engine("sqlite://", pragmas={"foreign_keys": "ON"})
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(bind=engine)
+    with session_factory() as db:
+        db.add_all([Book(title=f"Book Number {i}", author="Author", year=2021, description="Description")
+                    for i in range(2)])
+        db.commit()
+    return session_factory
+
+def test_concurrent_reviews_share_one_transaction():
+    session_factory = make_session_factory()
+
+    async def submit_all():
+        batcher = ReviewWriteBatcher(session_factory, max_delay_ms=50)
+        await batcher.start()
+        results = await asyncio.gather(
+            batcher.add_review(1, ReviewInfo(review="First")),
+            batcher.add_review(99, ReviewInfo(review="No such book")),
+            batcher.add_review(2, ReviewInfo(review="Second")),
+        )
+        await batcher.stop()
+        return batcher, results
+
+    batcher, (first, missing, second) = asyncio.run(submit_all())
+
+    assert first["book_id"] == 1 and first["review"] == "First"
+    assert second["book_id"] == 2 and second["id"] == first["id"] + 1
+    # Only the caller with the unknown book is rejected
+    assert missing is None
+    assert batcher.stats()["batches"] == 1
+    with session_factory() as db:
+        assert db.query(Review).count() == 2
+
+def test_batches_are_capped_and_flushed_on_stop():
+    session_factory = make_session_factory()
+
+    async def submit_all():
+        batcher = ReviewWriteBatcher(session_factory, max_delay_ms=50, max_batch_size=2)
+        await batcher.start()
+        results = await asyncio.gather(*(batcher.add_review(1, ReviewInfo(review=f"Review {i}")) for i in range(5)))
+        await batcher.stop()
+        return batcher, results
+
+    batcher, results = asyncio.run(submit_all())
+
+    assert [result["review"] for result in results] == [f"Review {i}" for i in range(5)]
+    assert batcher.stats()["batches"] == 3
+
+def test_stop_writes_the_batch_still_being_collected():
+    session_factory = make_session_factory()
+
+    async def stop_while_collecting():
+        batcher = ReviewWriteBatcher(session_factory, max_delay_ms=5000)
+        await batcher.start()
+        pending = [asyncio.create_task(batcher.add_review(1, ReviewInfo(review=f"Review {i}"))) for i in range(2)]
+        # Let the background task dequeue both and start waiting for more
+        await asyncio.sleep(0.05)
+        await asyncio.wait_for(batcher.stop(), timeout=1)
+        return batcher, await asyncio.wait_for(asyncio.gather(*pending), timeout=1)
+
+    batcher, results = asyncio.run(stop_while_collecting())
+
+    assert [result["review"] for result in results] == ["Review 0", "Review 1"]
+    assert batcher.stats()["batches"] == 1
+    with session_factory() as db:
+        assert db.query(Review).count() == 2
@@ -0,0 +1,123 @@
+import asyncio
+import pytest
+from app.services.single_flight import SingleFlight, StreamFlight
+
+def test_concurrent_calls_with_the_same_key_share_one_call():
+    flights = SingleFlight()
+    calls = []
+
+    async def fetch(key):
+        calls.append(key)
+        await asyncio.sleep(0.05)
+        return f"result {key}"
+
+    async def run():
+        return await asyncio.gather(*(flights.do(key, lambda key=key: fetch(key)) for key in ["a"] * 5 + ["b"] * 2))
+
+    assert asyncio.run(run()) == ["result a"] * 5 + ["result b"] * 2
+    assert sorted(calls) == ["a", "b"]
+    assert flights.stats() == {"in_flight": 0, "calls": 2, "coalesced": 5, "waiters": {}}
+
+def test_waiters_are_counted_per_key_while_in_flight():
+    flights = SingleFlight()
+    release = None
+
+    async def run():
+        nonlocal release
+        release = asyncio.Event()
+
+        async def fetch():
+            await release.wait()
+            return "done"
+        waiters = [asyncio.create_task(flights.do("key", fetch)) for _ in range(3)]
+        await asyncio.sleep(0)
+        in_flight = flights.stats()
+        release.set()
+        await asyncio.gather(*waiters)
+        return in_flight
+
+    stats = asyncio.run(run())
+    assert stats["in_flight"] == 1
+    assert stats["waiters"] == {"key": 3}
+
+def test_exceptions_are_shared_and_the_key_is_forgotten():
+    flights = SingleFlight()
+    attempts = 0
+
+    async def failing():
+        nonlocal attempts
+        attempts += 1
+        await asyncio.sleep(0.01)
+        raise RuntimeError("rate limited")
+
+    async def run():
+        return await asyncio.gather(*(flights.do("key", failing) for _ in range(3)), return_exceptions=True)
+
+    assert [str(result) for result in asyncio.run(run())] == ["rate limited"] * 3
+    with pytest.raises(RuntimeError):
+        asyncio.run(flights.do("key", failing))
+    assert attempts == 2
+
+def test_cancelled_caller_does_not_cancel_the_call_for_the_others():
+    flights = SingleFlight()
+
+    async def fetch():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def run():
+        leader = asyncio.create_task(flights.do("key", fetch))
+        follower = asyncio.create_task(flights.do("key", fetch))
+        await asyncio.sleep(0)
+        leader.cancel()
+        return await follower
+
+    assert asyncio.run(run()) == "done"
+
+async def ticking_source(chunks, closed: list, delay: float = 0.01):
+    try:
+        for chunk in chunks:
+            await asyncio.sleep(delay)
+            yield chunk
+    finally:
+        closed.append(True)
+
+def test_concurrent_subscribers_share_one_stream():
+    flights = StreamFlight()
+    started = []
+    closed = []
+
+    def source():
+        started.append(True)
+        return ticking_source(["a", "b", "c"], closed)
+
+    async def collect(delay: float = 0):
+        await asyncio.sleep(delay)
+        return [chunk async for chunk in flights.subscribe("key", source)]
+
+    async def run():
+        # The second subscriber joins after the first chunk and replays it
+        return await asyncio.gather(collect(), collect(delay=0.015))
+
+    assert asyncio.run(run()) == [["a", "b", "c"], ["a", "b", "c"]]
+    assert started == [True] and closed == [True]
+    assert flights.stats() == {"in_flight": 0, "calls": 1, "coalesced": 1, "waiters": {}}
+
+def test_stream_is_cancelled_once_every_subscriber_leaves():
+    flights = StreamFlight()
+    closed = []
+
+    async def run():
+        subscriptions = [flights.subscribe("key", lambda: ticking_source(["a", "b", "c"], closed)) for _ in range(2)]
+        firsts = [await subscription.__anext__() for subscription in subscriptions]
+        await subscriptions[0].aclose()
+        # One subscriber left; the stream keeps going for the other
+        assert await subscriptions[1].__anext__() == "b"
+        assert closed == []
+        await subscriptions[1].aclose()
+        await asyncio.sleep(0.01)
+        return firsts[0]
+
+    assert asyncio.run(run()) == "a"
+    assert closed == [True]
+    assert flights.stats()["in_flight"] == 0